@@ -14,14 +14,15 @@
 
 import os
 
-import google.auth
 from google.adk.agents import Agent
 from . import prompt
 from .sub_agents.simplification.agent import simplification_agent
 from .sub_agents.workflow_diagram.agent import workflow_diagram_agent
+from .utils.agent_metrics import instrument_agent
+from .utils.rate_limit import schedule_gemini
 
-_, project_id = google.auth.default()
-os.environ.setdefault("GOOGLE_CLOUD_PROJECT", project_id)
+# Without GOOGLE_CLOUD_PROJECT, the Gemini client resolves the project from the
+# default credentials on its first call rather than at import time.
 os.environ.setdefault("GOOGLE_CLOUD_LOCATION", "global")
 os.environ.setdefault("GOOGLE_GENAI_USE_VERTEXAI", "True")
 
@@ -50,3 +51,8 @@ root_agent = Agent(
         workflow_diagram_agent,
     ],
 )
+
+# 各エージェントのモデル呼び出しのトークン数とレイテンシを記録する
+instrument_agent(root_agent)
+# Geminiの呼び出しはプロセス共通のレート制限スケジューラーを経由させる
+schedule_gemini()
@@ -13,47 +13,178 @@
 # limitations under the License.
 
 # mypy: disable-error-code="attr-defined"
-import copy
+import atexit
 import datetime
+import functools
 import json
 import logging
 import os
-from collections.abc import Mapping, Sequence
+import threading
+from collections.abc import Iterator, Mapping, Sequence
 from typing import Any
 
 import google.auth
 import vertexai
-from google.cloud import logging as google_cloud_logging
 from opentelemetry import trace
 from opentelemetry.sdk.trace import TracerProvider, export
 from vertexai import agent_engines
 from vertexai.preview.reasoning_engines import AdkApp
 
 from app.agent import root_agent
+from app.utils.agent_metrics import agent_metrics
+from app.utils.cache import AnalysisCache, agent_fingerprint
 from app.utils.gcs import create_bucket_if_not_exists
+from app.utils.log_writer import BatchedLogWriter
+from app.utils.mermaid import DIAGRAM_STATS
+from app.utils.rate_limit import model_call_scheduler
+from app.utils.sessions import BoundedSessionService, SqliteSessionService
 from app.utils.tracing import CloudTraceLoggingSpanExporter
 from app.utils.typing import Feedback
 
+# Feedback is written to Cloud Logging in batches by a background thread.
+FEEDBACK_BATCH_SIZE = 50
+FEEDBACK_FLUSH_INTERVAL = 2.0
+FEEDBACK_QUEUE_SIZE = 1000
+# How long register_feedback waits for queue space before dropping an entry.
+FEEDBACK_ENQUEUE_TIMEOUT = 1.0
+
 
 class AgentEngineApp(AdkApp):
-    def set_up(self) -> None:
-        """Set up logging and tracing for the agent engine app."""
+    def set_up(
+        self, telemetry: bool = True, cache: AnalysisCache | None = None
+    ) -> None:
+        """
+        Set up logging and tracing for the agent engine app.
+
+        Google Cloud clients are created on first use rather than here, so
+        that a cold start does not wait on credential lookups.
+
+        :param telemetry: Export spans to Cloud Trace and Cloud Logging; local
+            runs against a stub model turn this off
+        :param cache: Cache of streamed answers (default: the on-disk cache,
+            versioned by the agent's fingerprint); runs against a stub model
+            pass one without a disk tier, so that canned answers are never
+            replayed to real queries
+        """
         super().set_up()
-        logging_client = google_cloud_logging.Client()
-        self.logger = logging_client.logger(__name__)
-        provider = TracerProvider()
-        processor = export.BatchSpanProcessor(
-            CloudTraceLoggingSpanExporter(
-                project_id=os.environ.get("GOOGLE_CLOUD_PROJECT")
+        # A repeated set_up replaces the writer; flush the old one and keep a
+        # single exit hook, so that hooks do not pile up for the process.
+        previous = self.__dict__.get("feedback_writer")
+        if previous is not None:
+            atexit.unregister(previous.close)
+            previous.close()
+        self.feedback_writer = BatchedLogWriter(
+            lambda: self.logger,
+            max_batch_size=FEEDBACK_BATCH_SIZE,
+            flush_interval=FEEDBACK_FLUSH_INTERVAL,
+            max_queue_size=FEEDBACK_QUEUE_SIZE,
+            name="feedback-writer",
+        )
+        atexit.register(self.feedback_writer.close)
+        if telemetry:
+            provider = TracerProvider()
+            processor = export.BatchSpanProcessor(
+                CloudTraceLoggingSpanExporter(
+                    project_id=os.environ.get("GOOGLE_CLOUD_PROJECT")
+                )
             )
+            provider.add_span_processor(processor)
+            trace.set_tracer_provider(provider)
+        self.analysis_cache = cache or AnalysisCache(
+            version=agent_fingerprint(self._tmpl_attrs.get("agent"))
         )
-        provider.add_span_processor(processor)
-        trace.set_tracer_provider(provider)
+        # Caps the queries a worker runs at once; 0 leaves it unbounded.
+        worker_concurrency = int(os.environ.get("WORKER_CONCURRENCY", "0"))
+        self.request_slots = (
+            threading.BoundedSemaphore(worker_concurrency)
+            if worker_concurrency > 0
+            else None
+        )
+
+    @functools.cached_property
+    def logger(self) -> Any:
+        from google.cloud import logging as google_cloud_logging
+
+        return google_cloud_logging.Client().logger(__name__)
+
+    def stream_query(
+        self,
+        *,
+        message: str | dict[str, Any],
+        user_id: str,
+        session_id: str | None = None,
+        **kwargs: Any,
+    ) -> Iterator[dict[str, Any]]:
+        """Streams responses, replaying cached events for repeated articles.
+
+        Only single-turn queries with a plain text message are cached, since
+        the answer for an existing session also depends on its history.
+        """
+        # The base class sets up lazily, but the cache and slots are needed first.
+        if not self._tmpl_attrs.get("runner"):
+            self.set_up()
+        cache_key = message if session_id is None and isinstance(message, str) else None
+        if cache_key is not None:
+            cached = self.analysis_cache.get(cache_key, namespace="stream_query")
+            if cached is not None:
+                yield from cached["events"]
+                return
+
+        events = []
+        if self.request_slots is not None:
+            self.request_slots.acquire()
+        try:
+            for event in super().stream_query(
+                message=message, user_id=user_id, session_id=session_id, **kwargs
+            ):
+                events.append(event)
+                yield event
+        finally:
+            if self.request_slots is not None:
+                self.request_slots.release()
+
+        if cache_key is not None and events:
+            self.analysis_cache.put(
+                cache_key, {"events": events}, namespace="stream_query"
+            )
 
     def register_feedback(self, feedback: dict[str, Any]) -> None:
-        """Collect and log feedback."""
+        """Collect and queue feedback for a batched write to Cloud Logging.
+
+        Validation errors are raised immediately. When the queue is full the
+        call waits up to FEEDBACK_ENQUEUE_TIMEOUT seconds for space and then
+        drops the entry, which is counted in get_feedback_stats().
+        """
         feedback_obj = Feedback.model_validate(feedback)
-        self.logger.log_struct(feedback_obj.model_dump(), severity="INFO")
+        if not self.feedback_writer.write(
+            feedback_obj.model_dump(), timeout=FEEDBACK_ENQUEUE_TIMEOUT
+        ):
+            logging.warning(
+                f"Feedback queue full, dropped feedback for {feedback_obj.invocation_id}"
+            )
+
+    def flush_feedback(self, timeout: float = 30.0) -> bool:
+        """Write all queued feedback and wait until it is committed."""
+        return self.feedback_writer.flush(timeout)
+
+    def get_feedback_stats(self) -> dict[str, int]:
+        """Returns the feedback queue depth and write/drop counters."""
+        return {
+            "queue_depth": self.feedback_writer.queue_depth,
+            **self.feedback_writer.stats,
+        }
+
+    def get_diagram_stats(self) -> dict[str, int]:
+        """Returns how many diagrams were valid, repaired locally or re-prompted."""
+        return dict(DIAGRAM_STATS)
+
+    def get_agent_metrics(self) -> dict[str, dict[str, float]]:
+        """Returns per-agent model call tokens and latency percentiles."""
+        return agent_metrics.summary()
+
+    def get_scheduler_stats(self) -> dict[str, float]:
+        """Returns model call retries, hedges and queue wait percentiles."""
+        return model_call_scheduler.summary()
 
     def register_operations(self) -> Mapping[str, Sequence]:
         """Registers the operations of the Agent.
@@ -61,20 +192,35 @@ class AgentEngineApp(AdkApp):
         Extends the base operations to include feedback registration functionality.
         """
         operations = super().register_operations()
-        operations[""] = operations[""] + ["register_feedback"]
+        operations[""] = operations[""] + [
+            "register_feedback",
+            "flush_feedback",
+            "get_feedback_stats",
+            "get_diagram_stats",
+            "get_agent_metrics",
+            "get_scheduler_stats",
+        ]
         return operations
 
     def clone(self) -> "AgentEngineApp":
-        """Returns a clone of the ADK application."""
+        """
+        Returns a clone of the ADK application.
+
+        The agent tree is a read-only definition, so clones share it instead
+        of deep-copying every sub-agent, prompt and tool. Only per-instance
+        state is copied: each clone gets its own template attributes and
+        environment variables, and ``set_up`` creates its own runner, services
+        and clients.
+        """
         template_attributes = self._tmpl_attrs
         return self.__class__(
-            agent=copy.deepcopy(template_attributes.get("agent")),
+            agent=template_attributes.get("agent"),
             enable_tracing=template_attributes.get("enable_tracing"),
             session_service_builder=template_attributes.get("session_service_builder"),
             artifact_service_builder=template_attributes.get(
                 "artifact_service_builder"
             ),
-            env_vars=template_attributes.get("env_vars"),
+            env_vars=dict(template_attributes.get("env_vars") or {}),
         )
 
 
@@ -85,8 +231,25 @@ def deploy_agent_engine_app(
     requirements_file: str = ".requirements.txt",
     extra_packages: list[str] = ["./app"],
     env_vars: dict[str, str] = {},
+    pipeline: bool = False,
+    max_sessions: int | None = None,
+    session_db: str | None = None,
+    num_workers: int = 1,
+    worker_concurrency: int | None = None,
 ) -> agent_engines.AgentEngine:
-    """Deploy the agent engine app to Vertex AI."""
+    """Deploy the agent engine app to Vertex AI.
+
+    Args:
+        num_workers: Worker processes per instance (NUM_WORKERS).
+        worker_concurrency: Maximum queries a worker runs at once
+            (WORKER_CONCURRENCY); None leaves it unbounded. Use
+            ``python -m app.calibration`` to pick both values.
+        max_sessions: Keep sessions in worker memory, evicting the least
+            recently used beyond this count, instead of the managed session
+            service.
+        session_db: Keep sessions in this worker-local SQLite database
+            instead of the managed session service.
+    """
 
     staging_bucket = f"gs://{project}-agent-engine"
 
@@ -99,10 +262,27 @@ def deploy_agent_engine_app(
     with open(requirements_file) as f:
         requirements = f.read().strip().split("\n")
 
-    agent_engine = AgentEngineApp(agent=root_agent)
+    # The pipeline runs the sub-agents directly, without LLM routing hops
+    if pipeline:
+        from app.pipeline import pipeline_agent as agent
+    else:
+        agent = root_agent
+    session_service_builder = None
+    if session_db:
+        session_service_builder = functools.partial(SqliteSessionService, session_db)
+    elif max_sessions:
+        session_service_builder = functools.partial(
+            BoundedSessionService, max_sessions=max_sessions
+        )
+    agent_engine = AgentEngineApp(
+        agent=agent, session_service_builder=session_service_builder
+    )
 
-    # Set worker parallelism to 1
-    env_vars["NUM_WORKERS"] = "1"
+    # Set worker parallelism
+    env_vars = dict(env_vars)
+    env_vars["NUM_WORKERS"] = str(num_workers)
+    if worker_concurrency is not None:
+        env_vars["WORKER_CONCURRENCY"] = str(worker_concurrency)
 
     # Common configuration for both create and update operations
     agent_config = {
@@ -170,6 +350,41 @@ if __name__ == "__main__":
         default=["./app"],
         help="Additional packages to include",
     )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Deploy the deterministic pipeline instead of the LLM-routed agent",
+    )
+    parser.add_argument(
+        "--max-sessions",
+        type=int,
+        default=None,
+        help="Keep at most this many sessions in worker memory (LRU) "
+        "instead of using the managed session service",
+    )
+    parser.add_argument(
+        "--session-db",
+        default=None,
+        help="Keep sessions in this worker-local SQLite database "
+        "instead of using the managed session service",
+    )
+    parser.add_argument(
+        "--num-workers",
+        type=int,
+        default=1,
+        help="Worker processes per instance (defaults to 1)",
+    )
+    parser.add_argument(
+        "--worker-concurrency",
+        type=int,
+        default=None,
+        help="Maximum concurrent queries per worker (defaults to unbounded)",
+    )
+    parser.add_argument(
+        "--calibrate",
+        action="store_true",
+        help="Pick worker settings from a local run against a stubbed model",
+    )
     parser.add_argument(
         "--set-env-vars",
         help="Comma-separated list of environment variables in KEY=VALUE format",
@@ -186,6 +401,14 @@ if __name__ == "__main__":
     if not args.project:
         _, args.project = google.auth.default()
 
+    if args.calibrate:
+        from app.calibration import calibrate
+
+        calibration = calibrate()
+        logging.info(f"Calibration: {calibration}")
+        args.num_workers = calibration["recommended"]["num_workers"]
+        args.worker_concurrency = calibration["recommended"]["worker_concurrency"]
+
     print("""
     ╔═══════════════════════════════════════════════════════════╗
     ║                                                           ║
@@ -201,4 +424,9 @@ if __name__ == "__main__":
         requirements_file=args.requirements_file,
         extra_packages=args.extra_packages,
         env_vars=env_vars,
+        pipeline=args.pipeline,
+        max_sessions=args.max_sessions,
+        session_db=args.session_db,
+        num_workers=args.num_workers,
+        worker_concurrency=args.worker_concurrency,
     )
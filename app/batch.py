@@ -0,0 +1,378 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Offline batch analysis of legal articles stored as JSONL.
+
+Each input line is a JSON object with an ``id`` and a ``text`` field. Results
+are appended to the output JSONL as soon as each article finishes, and the ids
+of finished articles are recorded in a checkpoint file so that an interrupted
+run resumes where it stopped. Failed articles are written as error records and
+retried on the next run, which first drops the records of unfinished articles
+from the output so that every article keeps a single record::
+
+    uv run python -m app.batch articles.jsonl results.jsonl --concurrency 8
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections.abc import Iterator
+from dataclasses import asdict
+from typing import Any
+
+from google.adk.runners import Runner
+from google.adk.sessions import BaseSessionService
+from google.genai import types
+
+from .incremental import IncrementalAnalyzer
+from .pipeline import collect_result, count_model_calls
+from .utils.agent_metrics import AgentMetrics, agent_metrics
+from .utils.rate_limit import ModelCallScheduler, model_call_scheduler
+from .utils.statute import Article, iter_articles
+
+APP_NAME = "legal_flow_batch"
+
+
+def read_items(
+    path: str, text_field: str = "text", split_articles: bool = False
+) -> Iterator[dict[str, Any]]:
+    """Yields ``{"id", "text"}`` items from a JSONL file, skipping blank lines.
+
+    Items without an ``id`` are identified by their line number. With
+    ``split_articles``, each record is split into its 条 and every article
+    becomes its own item with id ``<id>#<article>``, such as ``act#第六条``,
+    so inserting or deleting an article does not change the ids of the
+    others, which checkpoints and incremental diffs rely on.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            item_id = str(record.get("id", line_number))
+            if not split_articles:
+                yield {"id": item_id, "text": record[text_field]}
+                continue
+            seen: dict[str, int] = {}
+            for article in iter_articles(record[text_field]):
+                key = article_key(article)
+                seen[key] = seen.get(key, 0) + 1
+                if seen[key] > 1:
+                    key = f"{key}({seen[key]})"
+                yield {
+                    "id": f"{item_id}#{key}",
+                    "article": article.number,
+                    "text": article.text,
+                }
+
+
+def article_key(article: Article) -> str:
+    """Identifies an article within its law by its heading, not its position.
+
+    Articles of the 附則 are prefixed with it, since they restart at 第一条,
+    and text before the first heading is keyed 前文. A key that still repeats,
+    such as the 附則 of several amending acts, gets its occurrence appended.
+    """
+    if article.number is None:
+        return "前文"
+    if article.supplementary and article.number != "附則":
+        return f"附則{article.number}"
+    return article.number
+
+
+def load_checkpoint(path: str) -> set[str]:
+    """Returns the ids already completed by a previous run."""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def drop_unfinished(path: str, done: set[str]) -> int:
+    """Rewrites the output without the records of ids missing from ``done``.
+
+    These are error records of failed articles, or results written just
+    before an interrupted run could checkpoint them; both are analyzed again.
+
+    Returns:
+        The number of records dropped.
+    """
+    if not os.path.exists(path):
+        return 0
+    dropped = 0
+    temp_path = f"{path}.tmp"
+    with (
+        open(path, encoding="utf-8") as f,
+        open(temp_path, "w", encoding="utf-8") as out,
+    ):
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                item_id = json.loads(line).get("id")
+            except ValueError:
+                # A line cut short by an interrupted write.
+                item_id = None
+            if item_id in done:
+                out.write(line)
+            else:
+                dropped += 1
+    if dropped:
+        os.replace(temp_path, path)
+    else:
+        os.remove(temp_path)
+    return dropped
+
+
+class BatchAnalyzer:
+    """Drives an agent over many articles with bounded concurrency."""
+
+    def __init__(
+        self,
+        runner: Runner,
+        session_service: BaseSessionService,
+        concurrency: int = 4,
+        user_id: str = "batch_user",
+        split_articles: bool = False,
+        metrics: AgentMetrics | None = None,
+        scheduler: ModelCallScheduler | None = None,
+        incremental: IncrementalAnalyzer | None = None,
+    ) -> None:
+        """
+        Initialize the analyzer.
+
+        :param runner: Runner wrapping the agent to execute
+        :param session_service: The session service used by ``runner``
+        :param concurrency: Maximum number of articles analyzed at once
+        :param user_id: User id under which batch sessions are created
+        :param split_articles: Analyze each 条 of a record separately
+        :param metrics: Model call metrics of the agent, summarized per agent
+            at the end of each run
+        :param scheduler: Scheduler of the agent's model calls, whose retries
+            and queue waits are reported at the end of each run
+        :param incremental: Re-analyze articles through this analyzer instead
+            of ``runner``, sending only the 項 and 号 not analyzed before
+        """
+        self.runner = runner
+        self.session_service = session_service
+        self.concurrency = concurrency
+        self.user_id = user_id
+        self.split_articles = split_articles
+        self.metrics = metrics
+        self.scheduler = scheduler
+        self.incremental = incremental
+
+    async def analyze(self, item: dict[str, Any]) -> dict[str, Any]:
+        """Runs the agent on one article and returns its result record."""
+        if self.incremental is not None:
+            return await self.analyze_incremental(item)
+        session = self.session_service.create_session(
+            app_name=self.runner.app_name, user_id=self.user_id
+        )
+        message = types.Content(
+            role="user", parts=[types.Part.from_text(text=item["text"])]
+        )
+        start = time.perf_counter()
+        try:
+            events = [
+                event
+                async for event in self.runner.run_async(
+                    user_id=self.user_id, session_id=session.id, new_message=message
+                )
+            ]
+        finally:
+            # Batch sessions are never revisited; drop them to bound memory.
+            self.session_service.delete_session(
+                app_name=self.runner.app_name,
+                user_id=self.user_id,
+                session_id=session.id,
+            )
+        latency = time.perf_counter() - start
+
+        text_by_author: dict[str, str] = {}
+        for event in events:
+            if event.content and event.content.parts:
+                for part in event.content.parts:
+                    if part.text:
+                        text_by_author[event.author] = (
+                            text_by_author.get(event.author, "") + part.text + "\n"
+                        )
+        structured = collect_result(events)
+        return {
+            "id": item["id"],
+            "article": item.get("article"),
+            "result": "".join(text_by_author.values()),
+            "simplified": structured.simplified and structured.simplified.model_dump(),
+            "diagram": structured.diagram and structured.diagram.model_dump(),
+            "model_calls": count_model_calls(events),
+            "latency_s": round(latency, 3),
+        }
+
+    async def analyze_incremental(self, item: dict[str, Any]) -> dict[str, Any]:
+        """Re-analyzes the changed units of one article; see ``analyze``."""
+        assert self.incremental is not None
+        start = time.perf_counter()
+        structured, report = await self.incremental.analyze(item["id"], item["text"])
+        latency = time.perf_counter() - start
+        units = asdict(report)
+        return {
+            "id": item["id"],
+            "article": item.get("article"),
+            "simplified": structured.simplified and structured.simplified.model_dump(),
+            "diagram": structured.diagram and structured.diagram.model_dump(),
+            "model_calls": units.pop("model_calls"),
+            "units": units,
+            "latency_s": round(latency, 3),
+        }
+
+    async def run(
+        self, input_path: str, output_path: str, checkpoint_path: str
+    ) -> dict[str, Any]:
+        """
+        Analyze every article in ``input_path`` not yet in the checkpoint.
+
+        :param input_path: JSONL file with the articles to analyze
+        :param output_path: JSONL file the results are appended to, after
+            dropping the records of articles missing from the checkpoint
+        :param checkpoint_path: File listing the ids of finished articles
+        :return: Summary counts and throughput of this run, the per-agent
+            model call percentiles when ``metrics`` is set, the scheduler
+            stats when ``scheduler`` is set and the units reused and sent
+            when ``incremental`` is set
+        """
+        done = load_checkpoint(checkpoint_path)
+        dropped = drop_unfinished(output_path, done)
+        if dropped:
+            logging.info(f"Dropped {dropped} unfinished records from {output_path}")
+        semaphore = asyncio.Semaphore(self.concurrency)
+        write_lock = asyncio.Lock()
+        summary = {"completed": 0, "failed": 0, "skipped": 0}
+
+        with (
+            open(output_path, "a", encoding="utf-8") as output,
+            open(checkpoint_path, "a", encoding="utf-8") as checkpoint,
+        ):
+
+            async def process(item: dict[str, Any]) -> None:
+                async with semaphore:
+                    try:
+                        record = await self.analyze(item)
+                    except Exception as e:
+                        logging.exception(f"Failed to analyze item {item['id']}")
+                        record = {"id": item["id"], "error": str(e)}
+                async with write_lock:
+                    output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    output.flush()
+                    if "error" in record:
+                        summary["failed"] += 1
+                        return
+                    # Only checkpoint once the result is on disk.
+                    checkpoint.write(item["id"] + "\n")
+                    checkpoint.flush()
+                    summary["completed"] += 1
+                    print(f"[{item['id']}] {record['latency_s']:.2f}s")
+
+            start = time.perf_counter()
+            tasks: set[asyncio.Task] = set()
+            for item in read_items(input_path, split_articles=self.split_articles):
+                if item["id"] in done:
+                    summary["skipped"] += 1
+                    continue
+                # Keep at most a few pending tasks per worker so huge inputs
+                # are streamed rather than loaded into memory at once.
+                while len(tasks) >= self.concurrency * 2:
+                    _, tasks = await asyncio.wait(
+                        tasks, return_when=asyncio.FIRST_COMPLETED
+                    )
+                tasks.add(asyncio.create_task(process(item)))
+            if tasks:
+                await asyncio.wait(tasks)
+            elapsed = time.perf_counter() - start
+
+        processed = summary["completed"] + summary["failed"]
+        result: dict[str, Any] = {
+            **summary,
+            "elapsed_s": round(elapsed, 3),
+            "items_per_s": round(processed / elapsed, 3) if elapsed else 0.0,
+        }
+        if self.metrics is not None:
+            result["agents"] = self.metrics.summary()
+        if self.scheduler is not None:
+            result["scheduler"] = self.scheduler.summary()
+        if self.incremental is not None:
+            result["units"] = self.incremental.summary()
+        return result
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from google.adk.sessions import InMemorySessionService
+
+    parser = argparse.ArgumentParser(description="Analyze a JSONL file of articles")
+    parser.add_argument("input", help="JSONL file with id and text fields")
+    parser.add_argument("output", help="JSONL file to append results to")
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="Checkpoint file (defaults to <output>.checkpoint)",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="Articles analyzed at once"
+    )
+    parser.add_argument(
+        "--split-articles",
+        action="store_true",
+        help="Split each record into articles and analyze them one by one",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Use the deterministic pipeline instead of the LLM-routed agent",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only send the paragraphs and items not analyzed before to the model",
+    )
+    args = parser.parse_args()
+
+    if args.incremental:
+        from .incremental import incremental_agent as agent
+    elif args.pipeline:
+        from .pipeline import pipeline_agent as agent
+    else:
+        from .agent import root_agent as agent
+
+    session_service = InMemorySessionService()
+    runner = Runner(agent=agent, session_service=session_service, app_name=APP_NAME)
+    analyzer = BatchAnalyzer(
+        runner,
+        session_service,
+        concurrency=args.concurrency,
+        split_articles=args.split_articles,
+        metrics=agent_metrics,
+        scheduler=model_call_scheduler,
+        incremental=IncrementalAnalyzer(runner, session_service)
+        if args.incremental
+        else None,
+    )
+    summary = asyncio.run(
+        analyzer.run(
+            args.input, args.output, args.checkpoint or f"{args.output}.checkpoint"
+        )
+    )
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,185 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Local calibration of Agent Engine worker parallelism.
+
+Runs ``AgentEngineApp`` in-process, with the root agent's Gemini calls answered
+by a stub model that waits as long as a Gemini call would. It measures the
+throughput at increasing numbers of concurrent requests and the memory a
+worker needs, then recommends ``NUM_WORKERS`` and ``WORKER_CONCURRENCY`` for
+deployment::
+
+    uv run python -m app.calibration --model-latency 2.0 --memory-limit-mb 4096
+"""
+
+import itertools
+import os
+import resource
+import sys
+import time
+from collections.abc import Sequence
+from concurrent import futures
+from typing import Any
+
+from .agent import root_agent
+from .agent_engine_app import AgentEngineApp
+from .utils.cache import AnalysisCache
+from .utils.fake_llm import use_fake_llm
+
+CALIBRATION_MESSAGE = (
+    "第三条　認証業務を行おうとする者は、総務大臣の認定を受けなければならない。"
+)
+
+# A concurrency level must improve throughput by this factor to be worth it.
+MIN_THROUGHPUT_GAIN = 1.1
+# Share of the instance memory budget that workers may use.
+MEMORY_HEADROOM = 0.8
+
+
+def peak_rss_mb() -> float:
+    """Returns the peak resident set size of this process in MiB."""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KiB on Linux.
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+def measure_throughput(app: AgentEngineApp, concurrency: int, requests: int) -> float:
+    """Sends ``requests`` queries with ``concurrency`` in flight; returns req/s."""
+
+    def query(index: int) -> None:
+        # Distinct messages keep the analysis cache out of the measurement.
+        message = f"{CALIBRATION_MESSAGE}（{concurrency}-{index}）"  # noqa: RUF001
+        for _ in app.stream_query(message=message, user_id=f"calibration-{index}"):
+            pass
+
+    start = time.perf_counter()
+    with futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(query, range(requests)))
+    return requests / (time.perf_counter() - start)
+
+
+def recommend(
+    throughput: dict[int, float],
+    rss_mb_per_worker: float,
+    memory_limit_mb: float,
+    cpus: int,
+) -> dict[str, int]:
+    """
+    Derive deployment settings from calibration measurements.
+
+    The per-worker concurrency is the last level that still improved
+    throughput by at least MIN_THROUGHPUT_GAIN. The worker count is bounded
+    by the CPUs and by how many workers fit in the memory budget.
+
+    :param throughput: Requests per second for each concurrency level
+    :param rss_mb_per_worker: Resident memory of one warmed-up worker
+    :param memory_limit_mb: Memory available to one deployed instance
+    :param cpus: CPUs available to one deployed instance
+    :return: Recommended NUM_WORKERS and WORKER_CONCURRENCY
+    """
+    levels = sorted(throughput)
+    concurrency = levels[0]
+    for previous, level in itertools.pairwise(levels):
+        if throughput[level] < throughput[previous] * MIN_THROUGHPUT_GAIN:
+            break
+        concurrency = level
+
+    fits_in_memory = int(memory_limit_mb * MEMORY_HEADROOM // rss_mb_per_worker)
+    return {
+        "num_workers": max(1, min(cpus, fits_in_memory)),
+        "worker_concurrency": concurrency,
+    }
+
+
+def calibrate(
+    model_latency: float = 1.0,
+    levels: Sequence[int] = (1, 2, 4, 8, 16, 32),
+    requests_per_level: int | None = None,
+    memory_limit_mb: float = 4096,
+    cpus: int | None = None,
+) -> dict[str, Any]:
+    """
+    Measure a stubbed AgentEngineApp and recommend worker settings.
+
+    :param model_latency: Seconds each stub model call waits
+    :param levels: Concurrent request counts to measure
+    :param requests_per_level: Requests per level (default: twice the level)
+    :param memory_limit_mb: Memory available to one deployed instance
+    :param cpus: CPUs available to one deployed instance (default: local CPUs)
+    :return: The measurements and the recommended settings
+    """
+    app = AgentEngineApp(agent=root_agent)
+    # Spans of stubbed calls are not worth exporting to Cloud Trace, and their
+    # canned answers must not reach the on-disk cache shared with real runs.
+    app.set_up(telemetry=False, cache=AnalysisCache(cache_dir=None))
+    with use_fake_llm(latency=model_latency):
+        measure_throughput(app, concurrency=1, requests=1)
+        rss_mb = peak_rss_mb()
+
+        throughput = {
+            level: measure_throughput(
+                app,
+                concurrency=level,
+                requests=requests_per_level or max(4, 2 * level),
+            )
+            for level in levels
+        }
+    return {
+        "model_latency_s": model_latency,
+        "throughput_rps": {level: round(rps, 2) for level, rps in throughput.items()},
+        "rss_mb_per_worker": round(rss_mb, 1),
+        "recommended": recommend(
+            throughput, rss_mb, memory_limit_mb, cpus or os.cpu_count() or 1
+        ),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(
+        description="Recommend Agent Engine worker settings from a local run"
+    )
+    parser.add_argument(
+        "--model-latency",
+        type=float,
+        default=1.0,
+        help="Seconds each stubbed model call takes (use observed Gemini latency)",
+    )
+    parser.add_argument(
+        "--levels",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8, 16, 32],
+        help="Concurrent request counts to measure",
+    )
+    parser.add_argument(
+        "--memory-limit-mb",
+        type=float,
+        default=4096,
+        help="Memory available to one deployed instance",
+    )
+    parser.add_argument(
+        "--cpus", type=int, default=None, help="CPUs of one deployed instance"
+    )
+    args = parser.parse_args()
+
+    report = calibrate(
+        model_latency=args.model_latency,
+        levels=args.levels,
+        memory_limit_mb=args.memory_limit_mb,
+        cpus=args.cpus,
+    )
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,452 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Incremental re-analysis of amended articles.
+
+An amendment usually rewrites a single 項 or 号, yet the pipeline analyzes
+whole articles. Here an article is split into units, the body of each 項 and
+each 号, and the simplification and diagram fragment of every unit are cached
+under the unit's text, the 柱書 it completes and its article heading. A new
+version of an article is diffed against the previously analyzed one; the
+changed units are sent to the model, together with unchanged units whose
+cached result is gone, and the results of all units are merged back into one
+``LegalFlowResult`` whose Mermaid graph chains the unit fragments in statute
+order.
+"""
+
+import difflib
+import hashlib
+import logging
+from dataclasses import dataclass, field
+from typing import Any
+
+from google.adk.agents import Agent, BaseAgent, ParallelAgent
+from google.adk.runners import Runner
+from google.adk.sessions import BaseSessionService
+from google.genai import types
+
+from .pipeline import count_model_calls
+from .sub_agents.simplification import prompt as simplification_prompt
+from .sub_agents.simplification.agent import simplification_agent
+from .sub_agents.workflow_diagram import prompt as workflow_diagram_prompt
+from .sub_agents.workflow_diagram.agent import (
+    build_workflow_diagram,
+    workflow_diagram_agent,
+)
+from .utils.agent_metrics import instrument_agent
+from .utils.article_index import REFERENCE_SOURCE_KEY, reference_expander
+from .utils.cache import AnalysisCache, agent_fingerprint, normalize_legal_text
+from .utils.mermaid import (
+    MermaidSyntaxError,
+    format_flowchart,
+    merge_flowcharts,
+    parse_flowchart,
+    repair_flowchart,
+)
+from .utils.rate_limit import schedule_gemini
+from .utils.statute import iter_articles
+from .utils.typing import (
+    GlossaryTerm,
+    LegalFlowResult,
+    SimplifiedText,
+    UnitSimplifications,
+    UnitWorkflows,
+)
+
+APP_NAME = "legal_flow_incremental"
+UNIT_SIMPLIFICATIONS_KEY = "unit_simplifications"
+UNIT_WORKFLOWS_KEY = "unit_workflows"
+# Cache namespaces of per-unit results and of the units each article had.
+UNIT_NAMESPACE = "incremental_unit"
+VERSION_NAMESPACE = "incremental_version"
+
+
+@dataclass(frozen=True)
+class Unit:
+    """The body of a 項 or a single 号: the smallest part analyzed on its own."""
+
+    id: str
+    label: str
+    text: str
+    # For a 号, the body of its 項, which it usually only completes.
+    context: str = ""
+    # Number and caption of the article the unit belongs to.
+    heading: str = ""
+
+    @property
+    def key(self) -> str:
+        """Identifies the unit's text regardless of cosmetic differences."""
+        return hashlib.sha256(normalize_legal_text(self.text).encode()).hexdigest()
+
+    @property
+    def cache_key(self) -> str:
+        """Identifies everything the unit's analysis depends on.
+
+        The same 号 reads differently under another 柱書 or in another
+        article, so its result is only reused when both are unchanged.
+        """
+        context = hashlib.sha256(normalize_legal_text(self.context).encode())
+        return "\0".join([self.key, context.hexdigest(), self.heading])
+
+
+def split_units(text: str) -> list[Unit]:
+    """Splits the articles in ``text`` into their 項 and 号.
+
+    Args:
+        text: One or more articles.
+
+    Returns:
+        The units in statute order, with ids ``u1``, ``u2``, ... that are
+        also valid Mermaid node ids.
+    """
+    units: list[Unit] = []
+    for article in iter_articles(text):
+        heading = (article.number or "") + (article.caption or "")
+        for paragraph in article.paragraphs:
+            position = f"{heading}第{paragraph.number}項"
+            if paragraph.text:
+                units.append(
+                    Unit(
+                        f"u{len(units) + 1}",
+                        position,
+                        paragraph.text,
+                        heading=heading,
+                    )
+                )
+            for item in paragraph.items:
+                units.append(
+                    Unit(
+                        f"u{len(units) + 1}",
+                        f"{position}第{item.number}号",
+                        item.text,
+                        context=paragraph.text,
+                        heading=heading,
+                    )
+                )
+    return units
+
+
+@dataclass
+class UnitDiff:
+    """How the units of an article changed since it was last analyzed."""
+
+    unchanged: list[Unit] = field(default_factory=list)
+    # Units that are new or were rewritten.
+    changed: list[Unit] = field(default_factory=list)
+    # Units of the previous version that no longer appear.
+    removed: int = 0
+
+
+def diff_units(previous: list[str], units: list[Unit]) -> UnitDiff:
+    """Diffs ``units`` against the unit keys of the previous version.
+
+    Args:
+        previous: ``Unit.key`` of each unit of the previous version, in order.
+        units: The units of the new version.
+
+    Returns:
+        The unchanged, changed and removed units.
+    """
+    diff = UnitDiff()
+    matcher = difflib.SequenceMatcher(
+        a=previous, b=[unit.key for unit in units], autojunk=False
+    )
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            diff.unchanged.extend(units[j1:j2])
+            continue
+        diff.changed.extend(units[j1:j2])
+        diff.removed += i2 - i1
+    return diff
+
+
+def format_units(units: list[Unit]) -> str:
+    """Writes the units sent to the model, each under its id and position."""
+    lines = ["以下は改正された項・号です。"]
+    for unit in units:
+        lines.append("")
+        lines.append(f"[{unit.id}] {unit.label}")
+        if unit.context:
+            lines.append(f"（柱書）{unit.context}")  # noqa: RUF001
+        lines.append(unit.text)
+    return "\n".join(lines)
+
+
+def read_unit_results(state: dict[str, Any]) -> dict[str, dict[str, Any]]:
+    """Pairs the outputs of both steps per unit id.
+
+    Units missing from either output, and units whose diagram cannot be
+    repaired, are left out so that they are analyzed again next time.
+
+    Args:
+        state: Session state, or the accumulated state deltas of a run.
+
+    Returns:
+        Per unit id, ``{"simplified": ..., "workflow": ...}`` as cached.
+    """
+    simplified = UnitSimplifications.model_validate(
+        state.get(UNIT_SIMPLIFICATIONS_KEY) or {"units": []}
+    )
+    workflows = UnitWorkflows.model_validate(
+        state.get(UNIT_WORKFLOWS_KEY) or {"units": []}
+    )
+    fragments: dict[str, dict[str, Any]] = {}
+    for workflow in workflows.units:
+        workflow.mermaid_code = workflow.mermaid_code.strip()
+        if workflow.mermaid_code:
+            try:
+                workflow.mermaid_code = repair_flowchart(workflow.mermaid_code).code
+            except MermaidSyntaxError as e:
+                logging.warning(f"Dropping diagram of unit {workflow.unit_id}: {e}")
+                continue
+        fragments[workflow.unit_id] = workflow.model_dump(exclude={"unit_id"})
+
+    results = {}
+    for unit in simplified.units:
+        if unit.unit_id in fragments:
+            results[unit.unit_id] = {
+                "simplified": unit.model_dump(exclude={"unit_id"}),
+                "workflow": fragments[unit.unit_id],
+            }
+    return results
+
+
+def merge_unit_results(
+    units: list[Unit], results: dict[str, dict[str, Any] | None]
+) -> LegalFlowResult:
+    """Merges per-unit results into the result of the whole article.
+
+    Args:
+        units: The units of the article, in statute order.
+        results: Per unit id, the cached result, or None if it is missing.
+
+    Returns:
+        The simplified paragraphs of every unit in order with a glossary
+        deduplicated by term, and one diagram joining the unit fragments.
+    """
+    paragraphs: list[str] = []
+    glossary: dict[str, GlossaryTerm] = {}
+    actors: list[str] = []
+    fragments = []
+    for unit in units:
+        result = results.get(unit.id)
+        if result is None:
+            continue
+        paragraphs.extend(result["simplified"]["paragraphs"])
+        for term in result["simplified"]["glossary"]:
+            glossary.setdefault(term["term"], GlossaryTerm.model_validate(term))
+        workflow = result["workflow"]
+        if workflow["mermaid_code"]:
+            fragments.append((unit.id, parse_flowchart(workflow["mermaid_code"])))
+            actors.extend(actor for actor in workflow["actors"] if actor not in actors)
+
+    diagram = None
+    chart = merge_flowcharts(fragments)
+    if chart.nodes:
+        code = format_flowchart(chart)
+        diagram = build_workflow_diagram(repair_flowchart(code), actors)
+    return LegalFlowResult(
+        simplified=SimplifiedText(
+            paragraphs=paragraphs, glossary=list(glossary.values())
+        )
+        if paragraphs
+        else None,
+        diagram=diagram,
+    )
+
+
+def build_incremental_agent() -> BaseAgent:
+    """Builds the agent that analyzes a batch of units in one call per step.
+
+    Like the pipeline, both steps reuse the names and models of
+    ``simplification_agent`` and ``workflow_diagram_agent``, run side by side
+    and cannot transfer, and the references of the analyzed articles are
+    added to the simplification request. Each answers with one schema-validated result per
+    unit; the diagram step returns Mermaid code instead of calling its tool,
+    since ADK agents with an output schema cannot use tools.
+
+    Returns:
+        The root agent, whose steps store their outputs under
+        ``UNIT_SIMPLIFICATIONS_KEY`` and ``UNIT_WORKFLOWS_KEY``.
+    """
+    simplification_step = Agent(
+        name=simplification_agent.name,
+        model=simplification_agent.model,
+        description=simplification_agent.description,
+        instruction=simplification_prompt.SIMPLIFICATION_TASK_PROMPT
+        + simplification_prompt.SIMPLIFICATION_UNIT_PROMPT,
+        output_schema=UnitSimplifications,
+        output_key=UNIT_SIMPLIFICATIONS_KEY,
+        before_model_callback=reference_expander.before_model,
+        disallow_transfer_to_parent=True,
+        disallow_transfer_to_peers=True,
+    )
+    workflow_diagram_step = Agent(
+        name=workflow_diagram_agent.name,
+        model=workflow_diagram_agent.model,
+        description=workflow_diagram_agent.description,
+        instruction=workflow_diagram_prompt.WORKFLOW_DIAGRAM_UNIT_PROMPT,
+        output_schema=UnitWorkflows,
+        output_key=UNIT_WORKFLOWS_KEY,
+        disallow_transfer_to_parent=True,
+        disallow_transfer_to_peers=True,
+    )
+    schedule_gemini()
+    return instrument_agent(
+        ParallelAgent(
+            name="legal_flow_unit_analysis",
+            description="Simplifies and diagrams amended paragraphs and items",
+            sub_agents=[simplification_step, workflow_diagram_step],
+        )
+    )
+
+
+incremental_agent = build_incremental_agent()
+
+
+@dataclass
+class IncrementalReport:
+    """What re-analyzing one article reused and what it sent to the model."""
+
+    units: int = 0
+    reused: int = 0
+    analyzed: int = 0
+    changed: int = 0
+    removed: int = 0
+    model_calls: dict[str, int] = field(default_factory=dict)
+
+
+class IncrementalAnalyzer:
+    """Re-analyzes articles, sending only changed units and cache misses."""
+
+    def __init__(
+        self,
+        runner: Runner,
+        session_service: BaseSessionService,
+        cache: AnalysisCache | None = None,
+        user_id: str = "incremental_user",
+    ) -> None:
+        """
+        Initialize the analyzer.
+
+        :param runner: Runner wrapping an agent built by
+            ``build_incremental_agent``
+        :param session_service: The session service used by ``runner``
+        :param cache: Where unit results and article versions are kept
+            (default: the on-disk cache, versioned by the agent's fingerprint)
+        :param user_id: User id under which analysis sessions are created
+        """
+        self.runner = runner
+        self.session_service = session_service
+        self.cache = cache or AnalysisCache(version=agent_fingerprint(runner.agent))
+        self.user_id = user_id
+        self.stats = {"articles": 0, "units": 0, "reused": 0, "analyzed": 0}
+
+    async def run_units(
+        self, units: list[Unit], source: str = ""
+    ) -> tuple[dict[str, dict[str, Any]], dict[str, int]]:
+        """Sends ``units`` to the model in one invocation.
+
+        Args:
+            units: The units to analyze.
+            source: The articles the units belong to, whose references to
+                other provisions are added to the simplification request as
+                in a full analysis.
+
+        Returns:
+            The results per unit id, as read by ``read_unit_results``, and the
+            model calls per agent.
+        """
+        session = self.session_service.create_session(
+            app_name=self.runner.app_name,
+            user_id=self.user_id,
+            state={REFERENCE_SOURCE_KEY: source} if source else None,
+        )
+        message = types.Content(
+            role="user", parts=[types.Part.from_text(text=format_units(units))]
+        )
+        try:
+            events = [
+                event
+                async for event in self.runner.run_async(
+                    user_id=self.user_id, session_id=session.id, new_message=message
+                )
+            ]
+        finally:
+            self.session_service.delete_session(
+                app_name=self.runner.app_name,
+                user_id=self.user_id,
+                session_id=session.id,
+            )
+        state: dict[str, Any] = {}
+        for event in events:
+            if not event.partial and event.actions:
+                state.update(event.actions.state_delta)
+        return read_unit_results(state), count_model_calls(events)
+
+    async def analyze(
+        self, article_id: str, text: str
+    ) -> tuple[LegalFlowResult, IncrementalReport]:
+        """
+        Analyze a new version of an article, reusing unchanged units.
+
+        :param article_id: Stable id of the article across amendments, under
+            which its units are remembered for the next diff
+        :param text: The article as amended
+        :return: The merged result and what was reused and sent
+        """
+        units = split_units(text)
+        previous = self.cache.get(article_id, VERSION_NAMESPACE)
+        diff = diff_units(previous["units"] if previous else [], units)
+        results: dict[str, dict[str, Any] | None] = {
+            unit.id: self.cache.get(unit.cache_key, UNIT_NAMESPACE)
+            for unit in diff.unchanged
+        }
+        # Changed units are sent, plus unchanged ones whose results were
+        # evicted, produced by an older agent or completed another 柱書.
+        missing = [unit for unit in units if results.get(unit.id) is None]
+        report = IncrementalReport(
+            units=len(units),
+            reused=len(units) - len(missing),
+            analyzed=len(missing),
+            changed=len(diff.changed),
+            removed=diff.removed,
+        )
+
+        if missing:
+            fresh, report.model_calls = await self.run_units(missing, text)
+            for unit in missing:
+                result = fresh.get(unit.id)
+                if result is None:
+                    logging.warning(f"No result for {unit.label} of {article_id}")
+                    continue
+                self.cache.put(unit.cache_key, result, UNIT_NAMESPACE)
+                results[unit.id] = result
+        self.cache.put(
+            article_id, {"units": [unit.key for unit in units]}, VERSION_NAMESPACE
+        )
+
+        self.stats["articles"] += 1
+        for name in ("units", "reused", "analyzed"):
+            self.stats[name] += getattr(report, name)
+        return merge_unit_results(units, results), report
+
+    def summary(self) -> dict[str, float]:
+        """Returns the unit counters and the share of units sent to the model."""
+        summary: dict[str, float] = dict(self.stats)
+        units = self.stats["units"]
+        summary["analyzed_ratio"] = (
+            round(self.stats["analyzed"] / units, 3) if units else 0.0
+        )
+        return summary
@@ -0,0 +1,198 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Local HTTP stand-in for a deployed Agent Engine.
+
+Serves ``AgentEngineApp`` in-process behind the same REST contract as Agent
+Engine: ``POST .../reasoningEngines/<id>:streamQuery?alt=sse`` streams one JSON
+event per line, and ``POST .../reasoningEngines/<id>:query`` calls a registered
+operation such as ``get_agent_metrics``. Any project, location and engine id
+are accepted and the ``Authorization`` header is ignored, so the load tests can
+target it unchanged. With ``--fake-model-latency``, Gemini calls are answered
+by the scripted ``FakeLlm``, no Google Cloud model quota is used, no spans
+are exported to Cloud Trace and answers are cached in memory only, so that
+they are never replayed by a real server on the same machine::
+
+    uv run python -m app.local_server --port 8080 --fake-model-latency 1.0
+"""
+
+import contextlib
+import json
+import logging
+import re
+from collections.abc import Iterable, Mapping, Sequence
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Protocol
+
+from .agent import root_agent
+from .agent_engine_app import AgentEngineApp
+from .utils.cache import AnalysisCache, json_default
+from .utils.fake_llm import use_fake_llm
+
+ENGINE_PATH_RE = re.compile(
+    r"^/v1(?:beta1)?/projects/[^/]+/locations/[^/]+/reasoningEngines/[^/:]+"
+    r":(?P<method>streamQuery|query)$"
+)
+
+
+class ServedApp(Protocol):
+    """What the server needs from the app; ``AgentEngineApp`` provides it."""
+
+    def stream_query(self, *, message: str, user_id: str) -> Iterable[Any]: ...
+
+    def register_operations(self) -> Mapping[str, Sequence]: ...
+
+
+class AgentEngineHandler(BaseHTTPRequestHandler):
+    """Handles Agent Engine REST calls with the server's ``AgentEngineApp``."""
+
+    # Keep-alive connections, as Locust and the Agent Engine client reuse them.
+    protocol_version = "HTTP/1.1"
+    server: "AgentEngineServer"
+
+    def do_POST(self) -> None:
+        match = ENGINE_PATH_RE.match(self.path.split("?", 1)[0])
+        if match is None:
+            self.send_json(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            self.send_json(HTTPStatus.BAD_REQUEST, {"error": f"Invalid body: {e}"})
+            return
+
+        if match["method"] == "streamQuery":
+            self.stream_query(body.get("input") or {})
+        else:
+            self.query(body.get("class_method") or "query", body.get("input") or {})
+
+    def stream_query(self, arguments: dict[str, Any]) -> None:
+        if "message" not in arguments or "user_id" not in arguments:
+            self.send_json(
+                HTTPStatus.BAD_REQUEST, {"error": "input needs message and user_id"}
+            )
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for event in self.server.app.stream_query(**arguments):
+                self.write_chunk(
+                    json.dumps(event, ensure_ascii=False, default=json_default) + "\n"
+                )
+        except Exception as e:
+            # The status line is already sent; report the error in the stream.
+            logging.exception("stream_query failed")
+            self.write_chunk(json.dumps({"error": str(e)}) + "\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def query(self, class_method: str, arguments: dict[str, Any]) -> None:
+        if class_method not in self.server.operations:
+            self.send_json(
+                HTTPStatus.BAD_REQUEST,
+                {"error": f"Unknown class_method {class_method}"},
+            )
+            return
+        try:
+            output = getattr(self.server.app, class_method)(**arguments)
+        except Exception as e:
+            logging.exception(f"{class_method} failed")
+            self.send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)})
+            return
+        self.send_json(HTTPStatus.OK, {"output": output})
+
+    def write_chunk(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def send_json(self, status: HTTPStatus, value: dict[str, Any]) -> None:
+        data = json.dumps(value, ensure_ascii=False, default=json_default).encode(
+            "utf-8"
+        )
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logging.debug(format, *args)
+
+
+class AgentEngineServer(ThreadingHTTPServer):
+    """Serves one set-up ``AgentEngineApp``, one thread per request."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], app: ServedApp) -> None:
+        """
+        Initialize the server.
+
+        :param address: Host and port to listen on
+        :param app: The application to serve; ``set_up`` must have been called
+        """
+        super().__init__(address, AgentEngineHandler)
+        self.app = app
+        # Unary operations; streaming ones are only served by :streamQuery.
+        self.operations = set(app.register_operations()[""])
+
+
+def serve(
+    host: str = "127.0.0.1", port: int = 8080, fake_model_latency: float | None = None
+) -> None:
+    """
+    Serve ``root_agent`` until interrupted.
+
+    :param host: Interface to listen on
+    :param port: Port to listen on
+    :param fake_model_latency: Answer Gemini calls with ``FakeLlm`` after this
+        many seconds instead of calling Vertex AI, skip exporting spans and
+        keep the answers out of the on-disk cache
+    """
+    app = AgentEngineApp(agent=root_agent)
+    if fake_model_latency is None:
+        app.set_up()
+    else:
+        app.set_up(telemetry=False, cache=AnalysisCache(cache_dir=None))
+    with contextlib.ExitStack() as stack:
+        if fake_model_latency is not None:
+            stack.enter_context(use_fake_llm(latency=fake_model_latency))
+        server = stack.enter_context(AgentEngineServer((host, port), app))
+        logging.info(f"Serving Agent Engine REST API on http://{host}:{port}")
+        with contextlib.suppress(KeyboardInterrupt):
+            server.serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Serve the agent behind the Agent Engine REST API locally"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    parser.add_argument(
+        "--fake-model-latency",
+        type=float,
+        default=None,
+        help="Answer model calls with the scripted fake after this many seconds",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    serve(args.host, args.port, args.fake_model_latency)
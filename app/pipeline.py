@@ -0,0 +1,282 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Deterministic orchestration of the legal-flow sub-agents.
+
+``root_agent`` lets the model decide when to transfer between agents, which
+costs a full model call per hop. The pipeline built here runs the two
+sub-agents directly through ADK workflow agents and assembles their outputs
+without any routing model calls.
+"""
+
+import asyncio
+import time
+from collections.abc import AsyncGenerator, Iterable
+from dataclasses import dataclass, field
+from typing import Any
+
+from google.adk.agents import Agent, BaseAgent, ParallelAgent, SequentialAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from .sub_agents.simplification import prompt as simplification_prompt
+from .sub_agents.simplification.agent import simplification_agent
+from .sub_agents.workflow_diagram import prompt as workflow_diagram_prompt
+from .sub_agents.workflow_diagram.agent import (
+    WORKFLOW_DIAGRAM_KEY,
+    generate_diagram_with_image,
+    workflow_diagram_agent,
+)
+from .utils.agent_metrics import instrument_agent
+from .utils.article_index import reference_expander
+from .utils.rate_limit import schedule_gemini
+from .utils.typing import LegalFlowResult, SimplifiedText, WorkflowDiagram
+
+SIMPLIFIED_TEXT_KEY = "simplified_text"
+RESULT_KEY = "legal_flow_result"
+
+
+def build_result(state: dict[str, Any], simplified_text: str = "") -> LegalFlowResult:
+    """Builds the structured result from session state.
+
+    Args:
+        state: Session state, or the accumulated state deltas of a run.
+        simplified_text: Free text of the simplification agent, split into
+            paragraphs when the state has no schema-validated output for it.
+
+    Returns:
+        The validated result; parts that were not produced are None.
+    """
+    simplified = state.get(SIMPLIFIED_TEXT_KEY)
+    if simplified is None and simplified_text.strip():
+        simplified = SimplifiedText(
+            paragraphs=[p.strip() for p in simplified_text.split("\n\n") if p.strip()],
+            glossary=[],
+        )
+    diagram = state.get(WORKFLOW_DIAGRAM_KEY)
+    return LegalFlowResult(
+        simplified=SimplifiedText.model_validate(simplified) if simplified else None,
+        diagram=WorkflowDiagram.model_validate(diagram) if diagram else None,
+    )
+
+
+class ResultAssemblerAgent(BaseAgent):
+    """Collects the sub-agent outputs from session state into one result."""
+
+    async def _run_async_impl(
+        self, ctx: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        result = build_result(ctx.session.state)
+        yield Event(
+            invocation_id=ctx.invocation_id,
+            author=self.name,
+            branch=ctx.branch,
+            actions=EventActions(state_delta={RESULT_KEY: result.model_dump()}),
+        )
+
+
+def build_pipeline_agent(parallel: bool = True) -> BaseAgent:
+    """Builds a workflow agent that runs both sub-agents without routing hops.
+
+    The step agents reuse the names, models and task prompts of
+    ``simplification_agent`` and ``workflow_diagram_agent`` but drop the
+    transfer checklists and cannot transfer, so each step is exactly the model
+    calls needed for its own task. Model calls go through the shared
+    ``model_call_scheduler`` and are recorded per agent in
+    ``agent_metrics``. Like ``simplification_agent``, the simplification step
+    is given the provisions the article refers to. Simplification replies with a
+    ``SimplifiedText`` validated against its schema, and the diagram step
+    stores the ``WorkflowDiagram`` returned by its tool in session state.
+
+    Args:
+        parallel: Run both steps concurrently on the raw article. When False,
+            the diagram step runs after simplification and sees its output.
+
+    Returns:
+        The root agent of the pipeline.
+    """
+    simplification_step = Agent(
+        name=simplification_agent.name,
+        model=simplification_agent.model,
+        description=simplification_agent.description,
+        instruction=simplification_prompt.SIMPLIFICATION_TASK_PROMPT
+        + simplification_prompt.SIMPLIFICATION_OUTPUT_PROMPT,
+        output_schema=SimplifiedText,
+        output_key=SIMPLIFIED_TEXT_KEY,
+        before_model_callback=reference_expander.before_model,
+        disallow_transfer_to_parent=True,
+        disallow_transfer_to_peers=True,
+    )
+    workflow_diagram_step = Agent(
+        name=workflow_diagram_agent.name,
+        model=workflow_diagram_agent.model,
+        description=workflow_diagram_agent.description,
+        instruction=workflow_diagram_prompt.WORKFLOW_DIAGRAM_TASK_PROMPT,
+        tools=[generate_diagram_with_image],
+        disallow_transfer_to_parent=True,
+        disallow_transfer_to_peers=True,
+    )
+
+    if parallel:
+        analysis: BaseAgent = ParallelAgent(
+            name="legal_flow_analysis",
+            sub_agents=[simplification_step, workflow_diagram_step],
+        )
+    else:
+        analysis = SequentialAgent(
+            name="legal_flow_analysis",
+            sub_agents=[simplification_step, workflow_diagram_step],
+        )
+
+    schedule_gemini()
+    return instrument_agent(
+        SequentialAgent(
+            name="legal_flow_pipeline",
+            description="Runs simplification and workflow diagram agents directly",
+            sub_agents=[analysis, ResultAssemblerAgent(name="legal_flow_assembler")],
+        )
+    )
+
+
+pipeline_agent = build_pipeline_agent()
+
+
+@dataclass
+class OrchestrationReport:
+    """Model calls and wall time spent answering one request."""
+
+    wall_time_s: float = 0.0
+    model_calls: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total_model_calls(self) -> int:
+        return sum(self.model_calls.values())
+
+
+def count_model_calls(events: Iterable[Event]) -> dict[str, int]:
+    """Counts completed model responses per agent.
+
+    Every model call ends in exactly one non-partial event with a ``model``
+    role content, whether it carries text, a tool call or a transfer.
+
+    Args:
+        events: The events of one invocation.
+
+    Returns:
+        A mapping of agent name to number of model calls.
+    """
+    calls: dict[str, int] = {}
+    for event in events:
+        if event.partial or not event.content or event.content.role != "model":
+            continue
+        calls[event.author] = calls.get(event.author, 0) + 1
+    return calls
+
+
+def collect_result(events: Iterable[Event]) -> LegalFlowResult:
+    """Reads the structured result of one invocation from its events.
+
+    Works for both the pipeline, whose assembler emits the whole result, and
+    the LLM-routed ``root_agent``, whose diagram tool writes the diagram to
+    state while the simplified text is only available as free text.
+
+    Args:
+        events: The events of one invocation.
+
+    Returns:
+        The validated result.
+    """
+    state: dict[str, Any] = {}
+    simplified_text = ""
+    for event in events:
+        if event.partial:
+            continue
+        if event.actions:
+            state.update(event.actions.state_delta)
+        if event.author == simplification_agent.name and event.content:
+            simplified_text += "".join(
+                part.text for part in event.content.parts or [] if part.text
+            )
+    if RESULT_KEY in state:
+        return LegalFlowResult.model_validate(state[RESULT_KEY])
+    return build_result(state, simplified_text)
+
+
+async def run_with_report(
+    agent: BaseAgent, message: str, user_id: str = "benchmark_user"
+) -> OrchestrationReport:
+    """Runs ``agent`` once on ``message`` and reports its orchestration cost."""
+    session_service = InMemorySessionService()
+    runner = Runner(
+        agent=agent, session_service=session_service, app_name="legal_flow_report"
+    )
+    session = session_service.create_session(
+        user_id=user_id, app_name="legal_flow_report"
+    )
+    content = types.Content(role="user", parts=[types.Part.from_text(text=message)])
+
+    start = time.perf_counter()
+    events = [
+        event
+        async for event in runner.run_async(
+            user_id=user_id, session_id=session.id, new_message=content
+        )
+    ]
+    return OrchestrationReport(
+        wall_time_s=time.perf_counter() - start, model_calls=count_model_calls(events)
+    )
+
+
+async def compare_orchestration(
+    message: str, routing_agent: BaseAgent, pipeline: BaseAgent | None = None
+) -> dict[str, float]:
+    """Measures the model calls and wall time the pipeline saves on a request.
+
+    Args:
+        message: The legal article to analyze.
+        routing_agent: The LLM-routed agent, normally ``root_agent``.
+        pipeline: The pipeline agent; defaults to ``pipeline_agent``.
+
+    Returns:
+        Calls and wall time of both modes and the difference between them.
+    """
+    routing = await run_with_report(routing_agent, message)
+    direct = await run_with_report(pipeline or pipeline_agent, message)
+    return {
+        "routing_model_calls": routing.total_model_calls,
+        "pipeline_model_calls": direct.total_model_calls,
+        "saved_model_calls": routing.total_model_calls - direct.total_model_calls,
+        "routing_wall_time_s": routing.wall_time_s,
+        "pipeline_wall_time_s": direct.wall_time_s,
+        "saved_wall_time_s": routing.wall_time_s - direct.wall_time_s,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from .agent import root_agent
+
+    parser = argparse.ArgumentParser(
+        description="Compare LLM-routed and pipeline orchestration on one article"
+    )
+    parser.add_argument("text", help="Legal article to analyze")
+    args = parser.parse_args()
+
+    report = asyncio.run(compare_orchestration(args.text, root_agent))
+    print(json.dumps(report, indent=2))
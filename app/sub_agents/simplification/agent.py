@@ -1,4 +1,6 @@
 from google.adk.agents.llm_agent import Agent
+
+from ...utils.article_index import reference_expander
 from . import prompt
 
 simplification_agent = Agent(
@@ -6,4 +8,6 @@ simplification_agent = Agent(
     model='gemini-2.0-flash',
     description="Simplifies legal articles into plain language",
     instruction=prompt.SIMPLIFICATION_AGENT_PROMPT,
+    # 条文が参照する他の条文だけを索引から引いてリクエストに添える
+    before_model_callback=reference_expander.before_model,
 )
\ No newline at end of file
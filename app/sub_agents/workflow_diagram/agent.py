@@ -1,6 +1,20 @@
+# ruff: noqa: RUF001, RUF002, RUF003
+
 from google.adk.agents.llm_agent import Agent
+from google.adk.tools import ToolContext
+
+from ...utils.mermaid import (
+    DIAGRAM_STATS,
+    MermaidSyntaxError,
+    RepairResult,
+    repair_flowchart,
+)
+from ...utils.typing import WorkflowDiagram, WorkflowEdge, WorkflowStep
 from . import prompt
 
+# 検証済みのフロー図（WorkflowDiagram）を保存するセッションstateのキー
+WORKFLOW_DIAGRAM_KEY = "workflow_diagram"
+
 
 def generate_mermaid_image_url(mermaid_code: str) -> str:
     """MermaidコードをMermaid Live Editorの画像URLに変換"""
@@ -21,10 +35,67 @@ def generate_mermaid_image_url(mermaid_code: str) -> str:
     return f"https://mermaid.live/edit#{base64_data}"
 
 
-def generate_diagram_with_image(mermaid_code: str) -> dict:
-    """Mermaidコードと画像URLを返す"""
-    image_url = generate_mermaid_image_url(mermaid_code)
-    return image_url 
+def build_workflow_diagram(result: RepairResult, actors: list[str]) -> WorkflowDiagram:
+    """検証済みのフロー図から関係者・ステップ・遷移を取り出す"""
+    steps = [
+        WorkflowStep(
+            id=node.id,
+            label=node.label,
+            # ラベルに名前が含まれる関係者をそのステップの担当とみなす
+            actor=next((actor for actor in actors if actor in node.label), ""),
+            kind="decision" if node.shape == "diamond" else "action",
+        )
+        for node in result.chart.nodes.values()
+    ]
+    edges = [
+        WorkflowEdge(source=edge.source, target=edge.target, label=edge.label)
+        for edge in result.chart.edges
+    ]
+    return WorkflowDiagram(
+        actors=actors,
+        steps=steps,
+        edges=edges,
+        mermaid_code=result.code,
+        image_url=generate_mermaid_image_url(result.code),
+    )
+
+
+def generate_diagram_with_image(
+    mermaid_code: str,
+    # ADKの関数宣言は `list[str] | None` を解釈できないため必須の引数にする
+    actors: list[str],
+    tool_context: ToolContext | None = None,
+) -> dict:
+    """Mermaidコードを検証し、フロー図の構造と画像URLを返す
+
+    ラベルの引用符やsubgraphの閉じ忘れなど修復できる誤りはその場で直す。
+    修復できない場合だけエラーを返し、モデルに書き直させる。
+
+    Args:
+        mermaid_code: `flowchart TD` から始まるフロー図のMermaidコード
+        actors: フロー図に登場する関係者（申請者、行政機関、事業者等）
+
+    Returns:
+        status が "success" なら actors, steps, edges, mermaid_code, image_url を、
+        "error" なら修正すべき箇所を error に含む辞書
+    """
+    try:
+        result = repair_flowchart(mermaid_code)
+    except MermaidSyntaxError as e:
+        DIAGRAM_STATS["reprompted"] += 1
+        return {
+            "status": "error",
+            "error": (
+                f"Mermaidコードを解析できません（{e}）。"
+                "該当箇所を修正して、もう一度 generate_diagram_with_image を"
+                "呼び出してください。"
+            ),
+        }
+    DIAGRAM_STATS["repaired" if result.repairs else "valid"] += 1
+    diagram = build_workflow_diagram(result, actors)
+    if tool_context is not None:
+        tool_context.state[WORKFLOW_DIAGRAM_KEY] = diagram.model_dump()
+    return {"status": "success", **diagram.model_dump()}
 
 
 workflow_diagram_agent = Agent(
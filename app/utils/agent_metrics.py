@@ -0,0 +1,269 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Per-agent accounting of model calls.
+
+``instrument_agent`` adds model callbacks to every LLM agent of a tree. Each
+model call is timed and its tokens and agent transfers are counted; the
+numbers are set as attributes on the ``call_llm`` span that ADK opens around
+the call, so they reach Cloud Logging through the span exporter, and are
+collected in an in-process ``AgentMetrics`` that reports percentiles per agent.
+"""
+
+import json
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Any
+
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+from opentelemetry import trace
+
+TRANSFER_FUNCTION = "transfer_to_agent"
+# Calls whose response has not been seen yet, e.g. after a model error.
+MAX_PENDING_CALLS = 1024
+
+
+@dataclass
+class ModelCall:
+    """Cost and timing of one model call made on behalf of an agent."""
+
+    agent: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    latency_s: float = 0.0
+    time_to_first_token_s: float = 0.0
+    transfers: int = 0
+    tokens_estimated: bool = False
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Returns the nearest-rank ``q``-th percentile of ``values``."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimates Gemini tokens: ~4 ASCII or ~1.5 Japanese chars each."""
+    ascii_chars = sum(1 for char in text if char.isascii())
+    return math.ceil(ascii_chars / 4 + (len(text) - ascii_chars) / 1.5)
+
+
+def content_text(contents: list[types.Content]) -> str:
+    texts = []
+    for content in contents:
+        for part in content.parts or []:
+            if part.text:
+                texts.append(part.text)
+            elif part.function_call:
+                texts.append(json.dumps(part.function_call.args, ensure_ascii=False))
+            elif part.function_response:
+                texts.append(
+                    json.dumps(part.function_response.response, ensure_ascii=False)
+                )
+    return "\n".join(texts)
+
+
+class AgentMetrics:
+    """Thread-safe in-process store of model calls, summarized per agent."""
+
+    def __init__(self, max_calls_per_agent: int = 10000) -> None:
+        """
+        Initialize the store.
+
+        :param max_calls_per_agent: Most recent calls kept for each agent
+        """
+        self.max_calls_per_agent = max_calls_per_agent
+        self._calls: dict[str, deque[ModelCall]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, call: ModelCall) -> None:
+        with self._lock:
+            self._calls.setdefault(
+                call.agent, deque(maxlen=self.max_calls_per_agent)
+            ).append(call)
+
+    def update(self, call: ModelCall, **values: Any) -> None:
+        """Updates a recorded call in place, e.g. as a streamed response grows."""
+        with self._lock:
+            for name, value in values.items():
+                setattr(call, name, value)
+
+    def calls(self, agent: str) -> list[ModelCall]:
+        with self._lock:
+            return list(self._calls.get(agent, ()))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._calls.clear()
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        Summarize the recorded calls of every agent.
+
+        :return: Per agent, the call, token and transfer totals and the
+            p50/p95/p99 of latency and time to first token in seconds
+        """
+        with self._lock:
+            calls = {agent: list(recorded) for agent, recorded in self._calls.items()}
+        summary: dict[str, dict[str, float]] = {}
+        for agent, recorded in calls.items():
+            latencies = [call.latency_s for call in recorded]
+            first_tokens = [call.time_to_first_token_s for call in recorded]
+            summary[agent] = {
+                "calls": len(recorded),
+                "input_tokens": sum(call.input_tokens for call in recorded),
+                "output_tokens": sum(call.output_tokens for call in recorded),
+                "transfers": sum(call.transfers for call in recorded),
+            }
+            for name, values in (("latency", latencies), ("ttft", first_tokens)):
+                for q in (50, 95, 99):
+                    summary[agent][f"{name}_p{q}_s"] = round(percentile(values, q), 4)
+        return summary
+
+
+agent_metrics = AgentMetrics()
+
+
+@dataclass
+class _PendingCall:
+    start: float
+    input_text: str
+    call: ModelCall | None = None
+    output_text: str = ""
+    first_token_at: float | None = None
+    transfers: int = 0
+
+
+class ModelCallRecorder:
+    """Model callbacks that time each call and record it in ``AgentMetrics``."""
+
+    def __init__(self, metrics: AgentMetrics) -> None:
+        self.metrics = metrics
+        self._pending: OrderedDict[tuple[str, str], _PendingCall] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def before_model(
+        self, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> None:
+        system_instruction = getattr(llm_request.config, "system_instruction", None)
+        input_text = content_text(llm_request.contents)
+        if isinstance(system_instruction, str):
+            input_text = system_instruction + "\n" + input_text
+        # One agent makes its model calls one after another within an invocation.
+        key = (callback_context.invocation_id, callback_context.agent_name)
+        with self._lock:
+            self._pending[key] = _PendingCall(time.perf_counter(), input_text)
+            self._pending.move_to_end(key)
+            while len(self._pending) > MAX_PENDING_CALLS:
+                self._pending.popitem(last=False)
+
+    def after_model(
+        self, callback_context: CallbackContext, llm_response: LlmResponse
+    ) -> None:
+        now = time.perf_counter()
+        key = (callback_context.invocation_id, callback_context.agent_name)
+        with self._lock:
+            pending = self._pending.get(key)
+        if pending is None:
+            return
+        if pending.first_token_at is None:
+            pending.first_token_at = now
+        if llm_response.partial:
+            return
+
+        # A streamed call ends in several complete responses (the merged text,
+        # then function calls), which all add to the same recorded call.
+        contents = [llm_response.content] if llm_response.content else []
+        pending.output_text += content_text(contents)
+        pending.transfers += sum(
+            1
+            for content in contents
+            for part in content.parts or []
+            if part.function_call and part.function_call.name == TRANSFER_FUNCTION
+        )
+        usage = getattr(llm_response, "usage_metadata", None)
+        # Fields of ModelCall, also passed to AgentMetrics.update.
+        values: dict[str, Any] = {
+            "input_tokens": usage.prompt_token_count or 0
+            if usage
+            else estimate_tokens(pending.input_text),
+            "output_tokens": usage.candidates_token_count or 0
+            if usage
+            else estimate_tokens(pending.output_text),
+            "tokens_estimated": usage is None,
+            "latency_s": now - pending.start,
+            "time_to_first_token_s": pending.first_token_at - pending.start,
+            "transfers": pending.transfers,
+        }
+        if pending.call is None:
+            pending.call = ModelCall(agent=callback_context.agent_name, **values)
+            self.metrics.record(pending.call)
+        else:
+            self.metrics.update(pending.call, **values)
+
+        trace.get_current_span().set_attributes(
+            {
+                "gen_ai.agent.name": callback_context.agent_name,
+                "gen_ai.usage.input_tokens": values["input_tokens"],
+                "gen_ai.usage.output_tokens": values["output_tokens"],
+                "legal_flow.tokens_estimated": values["tokens_estimated"],
+                "legal_flow.latency_ms": round(values["latency_s"] * 1000, 1),
+                "legal_flow.time_to_first_token_ms": round(
+                    values["time_to_first_token_s"] * 1000, 1
+                ),
+                "legal_flow.transfers": values["transfers"],
+            }
+        )
+
+
+def instrument_agent(
+    agent: BaseAgent, metrics: AgentMetrics | None = None
+) -> BaseAgent:
+    """
+    Record the model calls of every LLM agent in ``agent``'s tree.
+
+    Existing model callbacks are kept and run first. Agents that are already
+    instrumented are left alone, so shared sub-agents are counted once.
+
+    :param agent: Root of the agent tree
+    :param metrics: Where calls are recorded (default: ``agent_metrics``)
+    :return: The same agent, for use in expressions
+    """
+    recorder = ModelCallRecorder(metrics or agent_metrics)
+    stack = [agent]
+    while stack:
+        node = stack.pop()
+        stack.extend(node.sub_agents)
+        if not isinstance(node, LlmAgent) or any(
+            isinstance(getattr(callback, "__self__", None), ModelCallRecorder)
+            for callback in node.canonical_before_model_callbacks
+        ):
+            continue
+        node.before_model_callback = [
+            *node.canonical_before_model_callbacks,
+            recorder.before_model,
+        ]
+        node.after_model_callback = [
+            *node.canonical_after_model_callbacks,
+            recorder.after_model,
+        ]
+    return agent
@@ -0,0 +1,371 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A precomputed index of a law's provisions and a cross-reference resolver.
+
+Articles refer to each other as 前条, 次条 or 第五条第二項第一号. Rather than
+having users paste long ranges of a law for context, the law is indexed once
+into a compact file: a sorted table of fixed-size records, one per article,
+項 and 号, followed by their UTF-8 text. The file is memory-mapped and
+searched in place, so opening it is instant and a lookup is a binary search
+of a few record reads. ``ReferenceExpander`` appends only the provisions an
+article actually refers to to the request of ``simplification_agent``::
+
+    uv run python -m app.utils.article_index law.txt law.idx
+    LEGAL_FLOW_ARTICLE_INDEX=law.idx make playground
+"""
+
+import functools
+import hashlib
+import logging
+import mmap
+import os
+import re
+import struct
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest
+from google.genai import types
+
+from .statute import Article, iter_articles, parse_number
+
+ARTICLE_INDEX_ENV = "LEGAL_FLOW_ARTICLE_INDEX"
+# Session state key of the articles whose references are expanded, for
+# requests that carry only parts of them, such as amended 項 and 号.
+REFERENCE_SOURCE_KEY = "reference_source"
+MAGIC = b"LFAIDX01"
+HEADER = struct.Struct("<8sI")
+# article, article branch (の二), 項, 号, 号 branch, text offset, text length.
+# 項 and 号 are 0 in the record of a whole article or 項.
+RECORD = struct.Struct("<7I")
+
+# (article, article branch, 項, 号, 号 branch)
+ProvisionKey = tuple[int, int, int, int, int]
+
+_NUMERAL = r"[〇一二三四五六七八九十百千0-9０-９]+"  # noqa: RUF001
+# 前条, 次条 or 第N条(のM), optionally narrowed to a 項 and a 号. References
+# qualified by a law name (法第三条, 令第二条) point into another law.
+REFERENCE_RE = re.compile(
+    rf"(?<![法令則])(?:(?P<relative>[前次])条|第(?P<article>{_NUMERAL})条"
+    rf"(?:の(?P<branch>{_NUMERAL}))?)"
+    rf"(?:第(?P<paragraph>{_NUMERAL})項)?"
+    rf"(?:第(?P<item>{_NUMERAL})号(?:の(?P<item_branch>{_NUMERAL}))?)?"
+)
+
+
+def parse_branched(number: str) -> tuple[int, int]:
+    """Parses a number such as 三 or 三の二 into (3, 0) or (3, 2)."""
+    main, _, branch = number.partition("の")
+    return parse_number(main), parse_number(branch.split("の")[0]) if branch else 0
+
+
+def article_key(article: Article) -> tuple[int, int] | None:
+    """Returns the (number, branch) of a main-provision article, else None."""
+    if article.number is None or article.supplementary:
+        return None
+    return parse_branched(article.number.removeprefix("第").replace("条", "", 1))
+
+
+def format_key(key: ProvisionKey) -> str:
+    """Writes a key as a label such as 第5条の2第1項第3号."""
+    article, branch, paragraph, item, item_branch = key
+    label = f"第{article}条" + (f"の{branch}" if branch else "")
+    if paragraph:
+        label += f"第{paragraph}項"
+    if item:
+        label += f"第{item}号" + (f"の{item_branch}" if item_branch else "")
+    return label
+
+
+def build_index(source: str | Iterable[str]) -> bytes:
+    """
+    Index the main provisions of a law.
+
+    Supplementary provisions (附則) are left out, since their article numbers
+    repeat those of the main provisions.
+
+    :param source: The law's text, or an iterable of its lines
+    :return: The index, as written by ``write_index``
+    """
+    entries: dict[ProvisionKey, str] = {}
+    for article in iter_articles(source):
+        key = article_key(article)
+        if key is None:
+            continue
+        number, branch = key
+        entries[(number, branch, 0, 0, 0)] = article.text
+        for paragraph in article.paragraphs:
+            entries[(number, branch, paragraph.number, 0, 0)] = "\n".join(
+                [paragraph.text]
+                + [f"{item.number}　{item.text}" for item in paragraph.items]
+            )
+            for item in paragraph.items:
+                item_number, item_branch = parse_branched(item.number)
+                entries[
+                    (number, branch, paragraph.number, item_number, item_branch)
+                ] = item.text
+
+    records, blob = [], bytearray()
+    for provision in sorted(entries):
+        data = entries[provision].encode("utf-8")
+        records.append(RECORD.pack(*provision, len(blob), len(data)))
+        blob += data
+    return HEADER.pack(MAGIC, len(records)) + b"".join(records) + bytes(blob)
+
+
+def write_index(source: str | Iterable[str], path: str) -> int:
+    """Builds the index of a law into ``path``; returns the number of records."""
+    data = build_index(source)
+    with open(path, "wb") as f:
+        f.write(data)
+    return HEADER.unpack_from(data)[1]
+
+
+class ArticleIndex:
+    """Read-only lookups in an index built by ``build_index``."""
+
+    def __init__(self, buffer: bytes | mmap.mmap) -> None:
+        magic, self.count = HEADER.unpack_from(buffer)
+        if magic != MAGIC:
+            raise ValueError("Not an article index")
+        self._buffer = buffer
+        self._blob = HEADER.size + self.count * RECORD.size
+
+    @classmethod
+    def open(cls, path: str) -> "ArticleIndex":
+        """Memory-maps the index file at ``path``."""
+        with open(path, "rb") as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    @classmethod
+    def from_text(cls, source: str | Iterable[str]) -> "ArticleIndex":
+        """Indexes a law in memory, e.g. for one batch record."""
+        return cls(build_index(source))
+
+    def close(self) -> None:
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+
+    @functools.cached_property
+    def fingerprint(self) -> str:
+        """A hash of the index contents, which changes whenever it is rebuilt."""
+        return hashlib.sha256(self._buffer).hexdigest()
+
+    def _record(self, position: int) -> tuple[int, ...]:
+        return RECORD.unpack_from(self._buffer, HEADER.size + position * RECORD.size)
+
+    def _bisect(self, key: ProvisionKey) -> int:
+        """Returns the position of the first record not below ``key``."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._record(middle)[:5] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def lookup(self, key: ProvisionKey) -> str | None:
+        """Returns the text of the provision ``key``, or None if it is absent."""
+        position = self._bisect(key)
+        if position == self.count:
+            return None
+        record = self._record(position)
+        if record[:5] != key:
+            return None
+        start = self._blob + record[5]
+        return bytes(self._buffer[start : start + record[6]]).decode("utf-8")
+
+    def neighbor(self, article: tuple[int, int], step: int) -> tuple[int, int] | None:
+        """Returns the article before (``step`` -1) or after (+1) ``article``."""
+        position = self._bisect((*article, 0, 0, 0))
+        if step < 0:
+            positions = range(position - 1, -1, -1)
+        else:
+            # Skip the article itself, if it is indexed.
+            listed = position < self.count and self._record(position)[:2] == article
+            positions = range(position + listed, self.count)
+        for candidate in positions:
+            record = self._record(candidate)
+            if record[2] == 0:
+                return record[0], record[1]
+        return None
+
+
+@dataclass
+class Reference:
+    """A provision referred to by an article, with its text from the index."""
+
+    key: ProvisionKey
+    text: str
+
+    @property
+    def label(self) -> str:
+        return format_key(self.key)
+
+
+def resolve_references(
+    text: str, index: ArticleIndex, max_chars: int = 4000
+) -> list[Reference]:
+    """
+    Look up the provisions ``text`` refers to outside of itself.
+
+    References into the articles of ``text`` itself, such as 前項 or a
+    range of pasted articles, need no expansion and are skipped, as are
+    relative references (前条, 次条) of text without an article heading.
+
+    :param text: One or more articles, as sent to the model
+    :param index: The index of the law ``text`` belongs to
+    :param max_chars: Most characters of referenced text returned in total
+    :return: The referenced provisions in order of first reference
+    """
+    articles = list(iter_articles(text))
+    pasted = {key for key in map(article_key, articles) if key is not None}
+    references: list[Reference] = []
+    seen: set[ProvisionKey] = set()
+    budget = max_chars
+    for article in articles:
+        current = article_key(article)
+        for match in REFERENCE_RE.finditer("\n".join(article.lines)):
+            if match.group("relative"):
+                if current is None:
+                    continue
+                target = index.neighbor(current, -1 if match["relative"] == "前" else 1)
+                if target is None:
+                    continue
+            else:
+                target = (
+                    parse_number(match["article"]),
+                    parse_number(match["branch"]) if match["branch"] else 0,
+                )
+            if target in pasted:
+                continue
+            key = (
+                *target,
+                parse_number(match["paragraph"]) if match["paragraph"] else 0,
+                parse_number(match["item"]) if match["item"] else 0,
+                parse_number(match["item_branch"]) if match["item_branch"] else 0,
+            )
+            if key in seen:
+                continue
+            seen.add(key)
+            referenced = index.lookup(key)
+            if referenced is None or len(referenced) > budget:
+                continue
+            budget -= len(referenced)
+            references.append(Reference(key, referenced))
+    return references
+
+
+def format_references(references: list[Reference]) -> str:
+    """Writes referenced provisions as context for the model."""
+    lines = ["参照されている条文（内容を理解するためだけに使ってください）:"]  # noqa: RUF001
+    for reference in references:
+        lines.append(f"[{reference.label}] {reference.text}")
+    return "\n".join(lines)
+
+
+class ReferenceExpander:
+    """A model callback that adds the provisions an article refers to."""
+
+    def __init__(self, index: ArticleIndex | None = None) -> None:
+        """
+        Initialize the expander.
+
+        :param index: Index of the law being analyzed (default: the file
+            named by ``LEGAL_FLOW_ARTICLE_INDEX``, opened on first use;
+            without it, requests are left unchanged)
+        """
+        self.index = index
+        self._loaded = index is not None
+
+    def get_index(self) -> ArticleIndex | None:
+        if not self._loaded:
+            self._loaded = True
+            path = os.environ.get(ARTICLE_INDEX_ENV)
+            if path:
+                try:
+                    self.index = ArticleIndex.open(path)
+                except (OSError, ValueError) as e:
+                    logging.warning(f"Unable to open article index {path}: {e}")
+        return self.index
+
+    def fingerprint(self) -> str:
+        """
+        Identify the index that requests are expanded with.
+
+        Analyses depend on the referenced provisions added to the request, so
+        ``agent_fingerprint`` mixes this into the version of cached results.
+
+        :return: The fingerprint of the index, or "" without one
+        """
+        index = self.get_index()
+        return index.fingerprint if index is not None else ""
+
+    def before_model(
+        self, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> None:
+        index = self.get_index()
+        if index is None:
+            return
+        # Expand the latest message of the user; replies of other agents are
+        # passed on as "For context:" user messages and are left alone.
+        for position in range(len(llm_request.contents) - 1, -1, -1):
+            content = llm_request.contents[position]
+            first = (content.parts or [types.Part()])[0].text or ""
+            if (
+                content.role == "user"
+                and first
+                and not first.startswith("For context:")
+            ):
+                break
+        else:
+            return
+        text = callback_context.state.get(REFERENCE_SOURCE_KEY) or "".join(
+            part.text or "" for part in content.parts or []
+        )
+        references = resolve_references(text, index)
+        if not references:
+            return
+        # Contents share parts with the session's events, which stay unchanged.
+        llm_request.contents[position] = types.Content(
+            role=content.role,
+            parts=[
+                *(content.parts or []),
+                types.Part.from_text(text=format_references(references)),
+            ],
+        )
+
+
+reference_expander = ReferenceExpander()
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Index the articles of a law")
+    parser.add_argument("law", help="Text file with the law")
+    parser.add_argument("index", help="Index file to write")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with open(args.law, encoding="utf-8") as f:
+        count = write_index(f, args.index)
+    print(
+        f"Indexed {count} provisions into {args.index} "
+        f"({os.path.getsize(args.index)} bytes) in {time.perf_counter() - start:.2f}s"
+    )
@@ -0,0 +1,306 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any
+
+from google.adk.models.registry import LLMRegistry
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "legal-flow-ai-cache")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_legal_text(text: str) -> str:
+    """Normalizes an article so that cosmetic differences share a cache entry.
+
+    NFKC folds full-width digits and the ideographic space into their ASCII
+    forms, and runs of whitespace collapse to a single space.
+
+    Args:
+        text: The raw article text as pasted by the user.
+
+    Returns:
+        The normalized text used for cache keys.
+    """
+    text = unicodedata.normalize("NFKC", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def json_default(value: Any) -> Any:
+    """``json.dumps`` fallback for dumped ADK events, which hold sets."""
+    if isinstance(value, set | frozenset):
+        return sorted(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def agent_fingerprint(agent: Any) -> str:
+    """Returns a stable hash of an agent tree's prompts, models and tools.
+
+    Any change to the instruction, model or tool set of the agent or one of
+    its sub-agents yields a different fingerprint, which invalidates results
+    cached under the previous version, as does serving a model name with
+    another class, such as a stub installed by ``use_fake_llm``. So does a
+    change of the context that
+    model callbacks add to requests, such as the article index of
+    ``ReferenceExpander``, which such callbacks report through the
+    ``fingerprint()`` method of the object they are bound to.
+
+    Args:
+        agent: The root ADK agent.
+
+    Returns:
+        A hex digest identifying the agent configuration.
+    """
+
+    def context(node: Any) -> list[str]:
+        callbacks = getattr(node, "before_model_callback", None) or []
+        if not isinstance(callbacks, list):
+            callbacks = [callbacks]
+        owners: list[Any] = [
+            getattr(callback, "__self__", None) for callback in callbacks
+        ]
+        return [
+            owner.fingerprint()
+            for owner in owners
+            if callable(getattr(owner, "fingerprint", None))
+        ]
+
+    def model_class(model: Any) -> str:
+        # The class a model name resolves to, so that results of a stub or
+        # wrapped model installed in the registry never pass for Gemini's.
+        if not model:
+            return ""
+        if isinstance(model, str):
+            try:
+                cls = LLMRegistry.resolve(model)
+            except ValueError:
+                return ""
+        else:
+            cls = type(model)
+        return f"{cls.__module__}.{cls.__qualname__}"
+
+    def describe(node: Any) -> dict[str, Any]:
+        model = getattr(node, "model", "")
+        instruction = getattr(node, "instruction", "")
+        description = {
+            "name": getattr(node, "name", ""),
+            "model": getattr(model, "model", model) if model else "",
+            "model_class": model_class(model),
+            "instruction": instruction
+            if isinstance(instruction, str)
+            else getattr(instruction, "__qualname__", repr(instruction)),
+            "tools": [
+                getattr(tool, "__name__", None) or getattr(tool, "name", repr(tool))
+                for tool in getattr(node, "tools", None) or []
+            ],
+            "sub_agents": [
+                describe(sub_agent)
+                for sub_agent in getattr(node, "sub_agents", None) or []
+            ],
+        }
+        # Only present when set, so other fingerprints stay as they were.
+        fingerprints = context(node)
+        if any(fingerprints):
+            description["context"] = fingerprints
+        return description
+
+    payload = json.dumps(describe(agent), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class AnalysisCache:
+    """
+    A two-tier, content-addressed cache for legal-article analyses.
+
+    Entries are keyed on the normalized article text plus the fingerprint of the
+    agent tree that produced them. Recently used entries are kept in an
+    in-memory LRU; every entry is also written to a directory on disk, which is
+    trimmed back to ``max_disk_bytes`` by evicting the least recently used files.
+    """
+
+    def __init__(
+        self,
+        version: str = "",
+        cache_dir: str | None = DEFAULT_CACHE_DIR,
+        max_memory_entries: int = 128,
+        max_disk_bytes: int = 64 * 1024 * 1024,
+    ) -> None:
+        """
+        Initialize the cache.
+
+        :param version: Agent fingerprint mixed into every key
+        :param cache_dir: Directory for the on-disk tier, or None to disable it
+        :param max_memory_entries: Maximum number of entries held in memory
+        :param max_disk_bytes: Maximum total size of the on-disk tier
+        """
+        self.version = version
+        self.cache_dir = cache_dir
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._memory: OrderedDict[str, dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes: int | None = None
+
+    def key(self, text: str, namespace: str = "") -> str:
+        """Returns the content address of ``text`` for this cache version."""
+        material = "\0".join([namespace, self.version, normalize_legal_text(text)])
+        return hashlib.sha256(material.encode()).hexdigest()
+
+    def get(self, text: str, namespace: str = "") -> dict[str, Any] | None:
+        """
+        Look up a cached analysis.
+
+        :param text: The article text
+        :param namespace: Separates entries written by different entry points
+        :return: The cached value, or None on a miss
+        """
+        key = self.key(text, namespace)
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return value
+
+            value = self._read_disk(key)
+            if value is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["disk_hits"] += 1
+            self._remember(key, value)
+            return value
+
+    def put(self, text: str, value: dict[str, Any], namespace: str = "") -> None:
+        """
+        Store an analysis in both tiers.
+
+        :param text: The article text
+        :param value: A JSON-serializable analysis result
+        :param namespace: Separates entries written by different entry points
+        """
+        key = self.key(text, namespace)
+        with self._lock:
+            self._remember(key, value)
+            self._write_disk(key, value)
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            for path, _, _ in self._disk_entries():
+                self._unlink(path)
+            self._disk_bytes = 0
+
+    def _remember(self, key: str, value: dict[str, Any]) -> None:
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        assert self.cache_dir is not None
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> dict[str, Any] | None:
+        if self.cache_dir is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                value = json.load(f)
+            # Bump the mtime so disk eviction approximates LRU order.
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Discarding unreadable cache entry {path}: {e}")
+            self._unlink(path)
+            return None
+        return value
+
+    def _write_disk(self, key: str, value: dict[str, Any]) -> None:
+        if self.cache_dir is None:
+            return
+        path = self._path(key)
+        try:
+            data = json.dumps(value, ensure_ascii=False, default=json_default).encode(
+                "utf-8"
+            )
+        except (TypeError, ValueError) as e:
+            # The entry stays in memory; only the disk tier needs JSON.
+            logging.warning(f"Not writing cache entry {path} to disk: {e}")
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            # Sized before writing, as a first scan would count the new file.
+            current = self._current_disk_bytes()
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Unable to write cache entry {path}: {e}")
+            return
+        self._disk_bytes = current + len(data) - previous
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict_disk()
+
+    def _current_disk_bytes(self) -> int:
+        if self._disk_bytes is None:
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+        return self._disk_bytes
+
+    def _disk_entries(self) -> list[tuple[str, int, float]]:
+        if self.cache_dir is None or not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict_disk(self) -> None:
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_disk_bytes:
+                break
+            self._unlink(path)
+            total -= size
+        self._disk_bytes = total
+
+    @staticmethod
+    def _unlink(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,279 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A deterministic stand-in for Gemini used by calibration, tests and benchmarks.
+
+``FakeLlm`` answers after a configurable delay with canned responses: plain
+text, tool calls and agent transfers, scripted per agent. It is registered for
+``fake-*`` model names, and ``use_fake_llm`` temporarily resolves the Gemini
+model names used by ``root_agent`` and the pipeline to it, so the real agent
+definitions run end to end without any network traffic or quota usage.
+"""
+
+import asyncio
+import contextlib
+import json
+import re
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncGenerator, Iterator
+from dataclasses import dataclass
+from typing import Any
+
+import pydantic
+from google.adk.models import Gemini, LLMRegistry
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import errors, types
+
+from .rate_limit import GEMINI_MODEL, scheduled
+
+TRANSFER_FUNCTION = "transfer_to_agent"
+# ADK prefixes every system instruction with the agent's identity.
+AGENT_NAME_RE = re.compile(r'Your internal name is "([^"]+)"')
+# Streamed text is split into chunks of this many characters.
+STREAM_CHUNK_CHARS = 16
+
+
+@dataclass(frozen=True)
+class FakeTurn:
+    """One canned model response.
+
+    ``structured`` replaces ``text`` when the request carries a response
+    schema. Tool calls and transfers to tools the agent does not have, such
+    as transfers from pipeline steps, are dropped.
+    """
+
+    text: str = ""
+    function_calls: tuple[tuple[str, dict[str, Any]], ...] = ()
+    transfer_to: str | None = None
+    structured: dict[str, Any] | None = None
+
+
+SAMPLE_MERMAID = """flowchart TD
+    A[申請者が申請書を提出] --> B{総務大臣が審査}
+    B -->|適合| C[総務大臣が認定]
+    B -->|不適合| D[申請者に通知]"""
+
+SAMPLE_PARAGRAPHS = [
+    "認証業務を行うには、総務大臣の認定を受ける必要があります。",
+    "認定を受けたい人は、申請書を総務大臣に提出します。",
+]
+
+# The turns of a routed analysis: the root agent transfers to simplification,
+# then to the diagram agent, whose tool call precedes its answer.
+LEGAL_FLOW_SCRIPT: dict[str, list[FakeTurn]] = {
+    "legal_flow_agent": [
+        FakeTurn(transfer_to="simplification_agent"),
+        FakeTurn(transfer_to="workflow_diagram_agent"),
+        FakeTurn(text="平易な文章と業務フロー図を作成しました。"),
+    ],
+    "simplification_agent": [
+        FakeTurn(
+            text="\n\n".join(SAMPLE_PARAGRAPHS),
+            structured={"paragraphs": SAMPLE_PARAGRAPHS, "glossary": []},
+            transfer_to="legal_flow_agent",
+        )
+    ],
+    "workflow_diagram_agent": [
+        FakeTurn(
+            function_calls=(
+                (
+                    "generate_diagram_with_image",
+                    {"mermaid_code": SAMPLE_MERMAID, "actors": ["申請者", "総務大臣"]},
+                ),
+            )
+        ),
+        FakeTurn(
+            text=f"```mermaid\n{SAMPLE_MERMAID}\n```",
+            transfer_to="legal_flow_agent",
+        ),
+    ],
+}
+
+
+def _is_user_turn(content: types.Content) -> bool:
+    """Whether ``content`` is a message from the user, not a tool or agent reply."""
+    if content.role != "user" or not content.parts:
+        return False
+    if any(part.function_response for part in content.parts):
+        return False
+    text = content.parts[0].text or ""
+    # Replies of other agents are passed on as "For context:" user messages.
+    return not text.startswith("For context:")
+
+
+class FakeQuota:
+    """
+    A quota shared by fake models that rejects calls like Vertex AI does.
+
+    Calls over ``requests_per_minute`` in a sliding minute, and every
+    ``fail_every``-th call regardless, fail with a ``google.genai`` API error
+    of status ``code``.
+    """
+
+    def __init__(
+        self, requests_per_minute: int = 0, fail_every: int = 0, code: int = 429
+    ) -> None:
+        self.requests_per_minute = requests_per_minute
+        self.fail_every = fail_every
+        self.code = code
+        self.calls = 0
+        self.rejected = 0
+        self._admitted: deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def check(self) -> None:
+        """Admits one call or raises the API error of a throttled one."""
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            while self._admitted and self._admitted[0] <= now - 60:
+                self._admitted.popleft()
+            over_quota = (
+                self.requests_per_minute
+                and len(self._admitted) >= self.requests_per_minute
+            )
+            if not over_quota and not (
+                self.fail_every and self.calls % self.fail_every == 0
+            ):
+                self._admitted.append(now)
+                return
+            self.rejected += 1
+        error = errors.ClientError if self.code < 500 else errors.ServerError
+        raise error(self.code, {"error": {"code": self.code, "message": "Throttled"}})
+
+
+class FakeLlm(BaseLlm):
+    """
+    A model that replays canned responses after a fixed delay.
+
+    It stands in for Gemini when measuring the application's own overhead:
+    the delay simulates the I/O wait of a real model call without any network
+    traffic or quota usage. Agents named in ``script`` get their turns in
+    order, counted from the last user message; the last turn repeats once the
+    script runs out. Other agents are answered with ``text``. With a
+    ``quota``, calls it rejects fail at once with a throttling error.
+    """
+
+    model_config = pydantic.ConfigDict(arbitrary_types_allowed=True)
+
+    model: str = "fake-llm"
+    latency: float = 0.0
+    text: str = "平易な文章です。"
+    script: dict[str, list[FakeTurn]] = pydantic.Field(default_factory=dict)
+    quota: FakeQuota | None = None
+
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return [r"fake-.*"]
+
+    def next_turn(self, llm_request: LlmRequest) -> FakeTurn:
+        """Picks the scripted turn for the agent and history of ``llm_request``."""
+        match = AGENT_NAME_RE.search(str(llm_request.config.system_instruction or ""))
+        turns = self.script.get(match.group(1)) if match else None
+        if not turns:
+            return FakeTurn(text=self.text)
+        answered = 0
+        for content in reversed(llm_request.contents):
+            if _is_user_turn(content):
+                break
+            answered += content.role == "model"
+        return turns[min(answered, len(turns) - 1)]
+
+    def build_parts(self, turn: FakeTurn, llm_request: LlmRequest) -> list[types.Part]:
+        text = turn.text
+        if llm_request.config.response_schema and turn.structured is not None:
+            text = json.dumps(turn.structured, ensure_ascii=False)
+        calls = list(turn.function_calls)
+        if turn.transfer_to:
+            calls.append((TRANSFER_FUNCTION, {"agent_name": turn.transfer_to}))
+        parts = [types.Part.from_text(text=text)] if text else []
+        parts += [
+            types.Part.from_function_call(name=name, args=args)
+            for name, args in calls
+            if name in llm_request.tools_dict
+        ]
+        return parts or [types.Part.from_text(text=self.text)]
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        if self.quota is not None:
+            self.quota.check()
+        parts = self.build_parts(self.next_turn(llm_request), llm_request)
+        await asyncio.sleep(self.latency)
+        if stream:
+            # Like Gemini over SSE: partial text chunks, then the whole response.
+            text = "".join(part.text for part in parts if part.text)
+            for start in range(0, len(text), STREAM_CHUNK_CHARS):
+                yield LlmResponse(
+                    content=types.ModelContent(
+                        parts=[
+                            types.Part.from_text(
+                                text=text[start : start + STREAM_CHUNK_CHARS]
+                            )
+                        ]
+                    ),
+                    partial=True,
+                )
+        yield LlmResponse(content=types.Content(role="model", parts=parts))
+
+
+class _GeminiStandIn(FakeLlm):
+    @classmethod
+    def supported_models(cls) -> list[str]:
+        return Gemini.supported_models()
+
+
+LLMRegistry.register(FakeLlm)
+
+
+@contextlib.contextmanager
+def use_fake_llm(
+    latency: float = 0.0,
+    script: dict[str, list[FakeTurn]] | None = None,
+    quota: FakeQuota | None = None,
+) -> Iterator[None]:
+    """
+    Resolve Gemini model names to a ``FakeLlm`` while the context is active.
+
+    Agents declared with ``model="gemini-..."``, such as ``root_agent`` and its
+    sub-agents, then replay ``script`` instead of calling Vertex AI. When Gemini
+    calls go through a scheduler (see ``schedule_gemini``), the fake's do too.
+
+    :param latency: Seconds each model call waits before answering
+    :param script: Turns per agent name (default: ``LEGAL_FLOW_SCRIPT``)
+    :param quota: Quota shared by all calls, to inject throttling
+    """
+    previous = LLMRegistry.resolve(GEMINI_MODEL)
+    stand_in: type[BaseLlm] = pydantic.create_model(
+        "ScriptedGemini",
+        __base__=_GeminiStandIn,
+        latency=(float, latency),
+        script=(dict[str, list[FakeTurn]], script or LEGAL_FLOW_SCRIPT),
+        quota=(FakeQuota | None, quota),
+    )
+    scheduler = getattr(previous, "scheduler", None)
+    if scheduler is not None:
+        stand_in = scheduled(stand_in, scheduler)
+    LLMRegistry.register(stand_in)
+    LLMRegistry.resolve.cache_clear()
+    try:
+        yield
+    finally:
+        LLMRegistry.register(previous)
+        LLMRegistry.resolve.cache_clear()
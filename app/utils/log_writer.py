@@ -0,0 +1,227 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+# Cloud Logging rejects a write request above 10 MB and an entry above
+# 256 KB; the defaults leave room for labels and request overhead.
+MAX_BATCH_BYTES = 9_000_000
+MAX_ENTRY_BYTES = 250_000
+
+
+class _FlushRequest:
+    """A queued request to write pending entries, answered with the outcome."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.ok = True
+
+
+class BatchedLogWriter:
+    """
+    Writes structured log entries to Cloud Logging in batches from a
+    background thread.
+
+    Callers enqueue entries into a bounded queue and return immediately (or
+    after waiting up to a timeout when the queue is full). A daemon thread
+    commits entries through ``logger.batch()`` once ``max_batch_size`` are
+    pending, they would exceed ``max_batch_bytes``, or the oldest has waited
+    ``flush_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        logger: Any | Callable[[], Any],
+        labels: dict[str, str] | None = None,
+        severity: str = "INFO",
+        max_batch_size: int = 100,
+        flush_interval: float = 5.0,
+        max_queue_size: int = 2048,
+        max_batch_bytes: int = MAX_BATCH_BYTES,
+        max_entry_bytes: int = MAX_ENTRY_BYTES,
+        name: str = "log-writer",
+    ) -> None:
+        """
+        Initialize the writer and start its background thread.
+
+        :param logger: A Cloud Logging logger (or a compatible fake), or a
+            callable returning one that is called on the first write
+        :param labels: Labels attached to every entry
+        :param severity: Severity of every entry
+        :param max_batch_size: Maximum number of entries written per request
+        :param flush_interval: Maximum seconds an entry waits before being written
+        :param max_queue_size: Entries buffered before writers block or drop
+        :param max_batch_bytes: Maximum JSON size of the entries of a request
+        :param max_entry_bytes: Entries larger than this are dropped, since
+            Cloud Logging would reject the whole request
+        :param name: Name of the background thread
+        """
+        self._logger = logger
+        self.labels = labels
+        self.severity = severity
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_batch_bytes = max_batch_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.stats = {"entries_sent": 0, "batches_sent": 0, "entries_dropped": 0}
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._stats_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def logger(self) -> Any:
+        """The logger, created on first use when a factory was given."""
+        if callable(self._logger):
+            self._logger = self._logger()
+        return self._logger
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of entries waiting to be written."""
+        return self._queue.qsize()
+
+    @property
+    def closed(self) -> bool:
+        return not self._thread.is_alive()
+
+    def write(self, entry: dict[str, Any], timeout: float = 0) -> bool:
+        """
+        Queue an entry for writing.
+
+        :param entry: The structured payload to log
+        :param timeout: Seconds to wait for space when the queue is full
+        :return: False if the entry was dropped because the queue stayed full
+        """
+        try:
+            if timeout > 0:
+                self._queue.put(entry, timeout=timeout)
+            else:
+                self._queue.put_nowait(entry)
+        except queue.Full:
+            self._count("entries_dropped")
+            return False
+        return True
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """
+        Write all queued entries and wait until they are committed.
+
+        :param timeout: Maximum seconds to wait
+        :return: Whether the flush completed within the timeout and every
+            entry queued since the previous flush was written
+        """
+        if self.closed:
+            return True
+        deadline = time.monotonic() + timeout
+        request = _FlushRequest()
+        try:
+            self._queue.put(request, timeout=timeout)
+        except queue.Full:
+            return False
+        return request.done.wait(max(0, deadline - time.monotonic())) and request.ok
+
+    def close(self) -> None:
+        """Flush queued entries and stop the background thread."""
+        if self.closed:
+            return
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[name] += value
+
+    def _run(self) -> None:
+        """
+        Drain the queue, writing a batch whenever it reaches ``max_batch_size``
+        entries or ``max_batch_bytes``, or its oldest entry is
+        ``flush_interval`` seconds old. A queued ``_FlushRequest`` requests an
+        immediate flush and ``None`` stops the writer.
+        """
+        pending: list[dict] = []
+        pending_bytes = 0
+        deadline: float | None = None
+        # Whether an entry was dropped since the last flush request.
+        failed = False
+        while True:
+            timeout: float | None = (
+                None if deadline is None else max(0, deadline - time.monotonic())
+            )
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                failed |= not self._write_batch(pending)
+                pending, pending_bytes, deadline = [], 0, None
+                continue
+
+            if isinstance(item, dict):
+                size = self._size(item)
+                if size > self.max_entry_bytes:
+                    logging.error(f"Dropped a log entry of {size} bytes")
+                    self._count("entries_dropped")
+                    failed = True
+                    continue
+                if pending_bytes + size > self.max_batch_bytes:
+                    failed |= not self._write_batch(pending)
+                    pending, pending_bytes, deadline = [], 0, None
+                pending.append(item)
+                pending_bytes += size
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(pending) < self.max_batch_size:
+                    continue
+
+            failed |= not self._write_batch(pending)
+            pending, pending_bytes, deadline = [], 0, None
+            if item is None:
+                return
+            if isinstance(item, _FlushRequest):
+                item.ok = not failed
+                failed = False
+                item.done.set()
+
+    @staticmethod
+    def _size(entry: dict) -> int:
+        """Estimates the size of an entry in a write request."""
+        return len(json.dumps(entry, ensure_ascii=False, default=str).encode("utf-8"))
+
+    def _write_batch(self, entries: list[dict]) -> bool:
+        """
+        Write entries to Cloud Logging in a single request.
+
+        :param entries: The structured payloads to log
+        :return: Whether the entries were written
+        """
+        if not entries:
+            return True
+        try:
+            batch = self.logger.batch()
+            for entry in entries:
+                batch.log_struct(entry, labels=self.labels, severity=self.severity)
+            batch.commit()
+        except Exception:
+            logging.exception(f"Failed to write {len(entries)} log entries")
+            self._count("entries_dropped", len(entries))
+            return False
+        self._count("entries_sent", len(entries))
+        self._count("batches_sent")
+        return True
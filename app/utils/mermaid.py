@@ -0,0 +1,543 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+from dataclasses import dataclass, field
+
+
+def extract_mermaid_code(text: str) -> str | None:
+    """Returns the body of the first ```mermaid fenced block in ``text``.
+
+    Args:
+        text: Free text returned by the agents.
+
+    Returns:
+        The Mermaid code without the fence, or None if no block is present.
+    """
+    fence = "```mermaid"
+    start = text.find(fence)
+    if start == -1:
+        return None
+    start += len(fence)
+    end = text.find("```", start)
+    if end == -1:
+        return None
+    return text[start:end].strip() or None
+
+
+class MermaidSyntaxError(ValueError):
+    """Raised when Mermaid code is outside the supported flowchart subset."""
+
+    def __init__(self, message: str, line: int | None = None) -> None:
+        super().__init__(f"line {line}: {message}" if line else message)
+        self.line = line
+
+
+@dataclass
+class Node:
+    id: str
+    label: str
+    shape: str = "rect"
+
+
+@dataclass
+class Edge:
+    source: str
+    target: str
+    label: str = ""
+    style: str = "solid"
+    arrow: bool = True
+
+
+@dataclass
+class Flowchart:
+    direction: str = "TD"
+    nodes: dict[str, Node] = field(default_factory=dict)
+    edges: list[Edge] = field(default_factory=list)
+
+
+HEADER_RE = re.compile(r"^(?:graph|flowchart)(?:\s+(TD|TB|BT|LR|RL))?\s*;?$")
+NODE_ID_RE = re.compile(r"\s*(\w+)")
+# (opening delimiter, closing delimiter, shape), longest delimiters first.
+NODE_SHAPES = [
+    ("(((", ")))", "circle"),
+    ("((", "))", "circle"),
+    ("([", "])", "stadium"),
+    ("[[", "]]", "subroutine"),
+    ("[(", ")]", "cylinder"),
+    ("{{", "}}", "hexagon"),
+    ("[/", "/]", "parallelogram"),
+    ("[\\", "\\]", "parallelogram"),
+    ("[", "]", "rect"),
+    ("(", ")", "round"),
+    ("{", "}", "diamond"),
+    (">", "]", "flag"),
+]
+# "-- label -->", "== label ==>" and "-. label .->" edges.
+LABELED_EDGE_RE = re.compile(
+    r"\s*(?P<line>--|==|-\.)\s*(?P<label>[^-=.|>][^|]*?)\s*"
+    r"(?P<end>-{2,}>|={2,}>|\.-+>|-{3,}|={3,}|\.-+)"
+)
+# "-->", "---", "==>", "-.->", "-.-", optionally followed by "|label|".
+EDGE_RE = re.compile(
+    r"\s*(?P<end><?(?:-{2,}>|-{3,}|={2,}>|={3,}|-\.+->|-\.+-))"
+    r"(?:\s*\|(?P<label>[^|]*)\|)?"
+)
+# Statements that only style the diagram and are skipped when parsing.
+IGNORED_RE = re.compile(r"^(?:style|classDef|class|linkStyle|click|direction)\b")
+
+
+def _edge_kind(end: str) -> tuple[str, bool]:
+    """Returns the (style, arrow) of an edge from its closing token."""
+    style = "thick" if "=" in end else "dotted" if "." in end else "solid"
+    return style, end.endswith(">")
+
+
+def _clean_label(text: str) -> str:
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] == '"':
+        text = text[1:-1]
+    return re.sub(r"<br\s*/?>", "\n", text).strip()
+
+
+def _parse_node(
+    statement: str, pos: int, chart: Flowchart, line: int
+) -> tuple[list[str], int]:
+    """Parses ``id``, ``id[label]`` or ``a & b`` at ``pos``.
+
+    Returns:
+        The node ids and the position after them.
+    """
+    ids = []
+    while True:
+        match = NODE_ID_RE.match(statement, pos)
+        if not match:
+            raise MermaidSyntaxError(
+                f"expected a node at {statement[pos:].strip()!r}", line
+            )
+        node_id, pos = match.group(1), match.end()
+        label, shape = None, "rect"
+        for opening, closing, node_shape in NODE_SHAPES:
+            if not statement.startswith(opening, pos):
+                continue
+            start = pos + len(opening)
+            if statement.startswith('"', start):
+                # Quoted labels may contain the closing delimiter.
+                start = max(start, statement.find('"', start + 1))
+            end = statement.find(closing, start)
+            if end == -1:
+                raise MermaidSyntaxError(
+                    f"unclosed {opening!r} in node {node_id!r}", line
+                )
+            label = _clean_label(statement[pos + len(opening) : end])
+            shape, pos = node_shape, end + len(closing)
+            break
+        node = chart.nodes.get(node_id)
+        if node is None:
+            chart.nodes[node_id] = Node(node_id, label or node_id, shape)
+        elif label is not None:
+            node.label, node.shape = label, shape
+        ids.append(node_id)
+        ampersand = re.compile(r"\s*&").match(statement, pos)
+        if not ampersand:
+            return ids, pos
+        pos = ampersand.end()
+
+
+def _parse_statement(statement: str, chart: Flowchart, line: int) -> None:
+    sources, pos = _parse_node(statement, 0, chart, line)
+    while pos < len(statement.rstrip()):
+        match = LABELED_EDGE_RE.match(statement, pos) or EDGE_RE.match(statement, pos)
+        if not match:
+            raise MermaidSyntaxError(
+                f"expected an edge at {statement[pos:].strip()!r}", line
+            )
+        label = _clean_label(match.group("label") or "")
+        style, arrow = _edge_kind(match.group("end"))
+        targets, pos = _parse_node(statement, match.end(), chart, line)
+        for source in sources:
+            for target in targets:
+                chart.edges.append(Edge(source, target, label, style, arrow))
+        sources = targets
+
+
+def parse_flowchart(code: str) -> Flowchart:
+    """Parses the Mermaid flowchart subset produced by the workflow diagram agent.
+
+    Supports ``graph``/``flowchart`` headers with a direction, node shapes
+    (rectangles, rounded, stadiums, circles, decision diamonds, ...), chained
+    and ``&``-joined edges, and edge labels in both ``-->|label|`` and
+    ``-- label -->`` forms. Comments, styling statements and subgraph
+    boundaries are skipped.
+
+    Args:
+        code: Mermaid code, without the Markdown fence.
+
+    Returns:
+        The parsed flowchart.
+
+    Raises:
+        MermaidSyntaxError: If the code is not a supported flowchart.
+    """
+    lines = [
+        (number, line.split("%%", 1)[0].strip())
+        for number, line in enumerate(code.splitlines(), start=1)
+    ]
+    lines = [(number, line) for number, line in lines if line]
+    if not lines:
+        raise MermaidSyntaxError("empty diagram")
+    number, header = lines[0]
+    match = HEADER_RE.match(header)
+    if not match:
+        raise MermaidSyntaxError(
+            f"expected 'flowchart TD' or 'graph TD', got {header!r}", number
+        )
+    chart = Flowchart(direction=match.group(1) or "TD")
+    for number, line in lines[1:]:
+        for statement in line.split(";"):
+            statement = statement.strip()
+            if not statement or IGNORED_RE.match(statement):
+                continue
+            if statement == "end" or statement.startswith("subgraph"):
+                continue
+            _parse_statement(statement, chart, number)
+    return chart
+
+
+# Characters Mermaid cannot take in an unquoted node label.
+UNSAFE_LABEL_RE = re.compile(r'[()\[\]{}<>|"]')
+# Where the next edge starts; an unclosed node label is closed before it.
+EDGE_START_RE = re.compile(r"\s*(?:<?-{1,}>|<?-{2,}|<?={2,}|-\.)")
+# "A -> B" is a common slip for "A --> B".
+SINGLE_DASH_EDGE_RE = re.compile(r"\s*->")
+# Other diagram types cannot be turned into a flowchart locally.
+DIAGRAM_TYPE_RE = re.compile(
+    r"^(?:\w+Diagram(?:-v2)?|gantt|pie|journey|gitGraph|mindmap|timeline)\b"
+)
+# Node ids that end a subgraph or otherwise break the Mermaid parser.
+RESERVED_NODE_IDS = {"end", "subgraph", "graph", "flowchart"}
+
+
+# How diagrams from the model were handled: accepted as is, repaired locally,
+# or sent back to the model with the error.
+DIAGRAM_STATS = {"valid": 0, "repaired": 0, "reprompted": 0}
+
+
+@dataclass
+class RepairResult:
+    code: str
+    chart: Flowchart
+    repairs: list[str] = field(default_factory=list)
+
+
+class _FlowchartRepairer:
+    """Rewrites flowchart statements, fixing defects Mermaid would reject."""
+
+    def __init__(self) -> None:
+        self.repairs: list[str] = []
+        self.labels: dict[str, str] = {}
+        self.ids: set[str] = set()
+        self.aliases: dict[str, str] = {}
+
+    def _fresh_id(self, node_id: str) -> str:
+        suffix = 2
+        while f"{node_id}_{suffix}" in self.ids:
+            suffix += 1
+        return f"{node_id}_{suffix}"
+
+    def _resolve(self, node_id: str, label: str | None, line: int) -> str:
+        """Maps ``node_id`` to the id it is written as in the repaired code."""
+        if node_id in RESERVED_NODE_IDS and node_id not in self.aliases:
+            self.aliases[node_id] = self._fresh_id(node_id)
+            self.repairs.append(f"line {line}: renamed reserved node id {node_id!r}")
+        resolved = self.aliases.get(node_id, node_id)
+        if label is not None:
+            known = self.labels.get(resolved)
+            if known is not None and known != label:
+                # The model reused an id for a different step.
+                resolved = self.aliases[node_id] = self._fresh_id(node_id)
+                self.repairs.append(
+                    f"line {line}: renamed duplicate node id {node_id!r} to {resolved!r}"
+                )
+            self.labels[resolved] = label
+        self.ids.add(resolved)
+        return resolved
+
+    @staticmethod
+    def _continues(statement: str, pos: int) -> bool:
+        """Whether a node may end at ``pos``: the statement goes on validly."""
+        return not statement[pos:].strip() or bool(
+            re.compile(r"\s*&").match(statement, pos)
+            or LABELED_EDGE_RE.match(statement, pos)
+            or EDGE_RE.match(statement, pos)
+            or SINGLE_DASH_EDGE_RE.match(statement, pos)
+        )
+
+    def _label(
+        self,
+        statement: str,
+        start: int,
+        shape: tuple[str, str],
+        node_id: str,
+        line: int,
+    ) -> tuple[str, int]:
+        """Reads the label starting at ``start``; returns it and the end of the node.
+
+        A label that parses as written is kept, apart from quoting it when it
+        contains characters Mermaid rejects. Only when the first closing
+        delimiter does not end the node, e.g. ``(却下 (理由))``, or the label
+        would take in an edge and the next node, is it taken up to the last
+        closing delimiter before the next edge, or closed there if it has none.
+        """
+        opening, closing = shape
+        search_from = start
+        if statement.startswith('"', start):
+            quote_end = statement.find('"', start + 1)
+            search_from = start if quote_end == -1 else quote_end + 1
+        end = statement.find(closing, search_from)
+        # A label that swallowed an edge is an unclosed node followed by it.
+        swallowed = end != -1 and bool(
+            UNSAFE_LABEL_RE.search(statement, search_from, end)
+            and EDGE_START_RE.search(statement, search_from, end)
+        )
+        if end == -1 or swallowed or not self._continues(statement, end + len(closing)):
+            edge = EDGE_START_RE.search(statement, search_from)
+            limit = edge.start() if edge else len(statement)
+            end = statement.rfind(closing, search_from, limit)
+            if end == -1:
+                self.repairs.append(f"line {line}: closed {opening!r} in {node_id!r}")
+                return statement[start:limit].strip(), limit
+        label, pos = statement[start:end].strip(), end + len(closing)
+        quoted = len(label) >= 2 and label[0] == label[-1] == '"'
+        unsafe = UNSAFE_LABEL_RE.search(re.sub(r"<br\s*/?>", "", label))
+        if not quoted and unsafe:
+            label = '"' + label.replace('"', "#quot;") + '"'
+            self.repairs.append(f"line {line}: quoted label of {node_id!r}")
+        return label, pos
+
+    def _node(self, statement: str, pos: int, line: int) -> tuple[str, int]:
+        parts = []
+        while True:
+            match = NODE_ID_RE.match(statement, pos)
+            if not match:
+                raise MermaidSyntaxError(
+                    f"expected a node at {statement[pos:].strip()!r}", line
+                )
+            node_id, pos = match.group(1), match.end()
+            shape = next(
+                (
+                    (opening, closing)
+                    for opening, closing, _ in NODE_SHAPES
+                    if statement.startswith(opening, pos)
+                ),
+                None,
+            )
+            if shape is None:
+                parts.append(self._resolve(node_id, None, line))
+            else:
+                opening, closing = shape
+                label, pos = self._label(
+                    statement, pos + len(opening), shape, node_id, line
+                )
+                resolved = self._resolve(node_id, _clean_label(label), line)
+                parts.append(resolved + opening + label + closing)
+            ampersand = re.compile(r"\s*&").match(statement, pos)
+            if not ampersand:
+                return " & ".join(parts), pos
+            pos = ampersand.end()
+
+    def statement(self, statement: str, line: int) -> str:
+        text, pos = self._node(statement, 0, line)
+        parts = [text]
+        while pos < len(statement.rstrip()):
+            match = LABELED_EDGE_RE.match(statement, pos) or EDGE_RE.match(
+                statement, pos
+            )
+            if match:
+                parts.append(match.group(0).strip())
+            else:
+                match = SINGLE_DASH_EDGE_RE.match(statement, pos)
+                if not match:
+                    raise MermaidSyntaxError(
+                        f"expected an edge at {statement[pos:].strip()!r}", line
+                    )
+                parts.append("-->")
+                self.repairs.append(f"line {line}: replaced '->' with '-->'")
+            text, pos = self._node(statement, match.end(), line)
+            parts.append(text)
+        return " ".join(parts)
+
+
+def repair_flowchart(code: str) -> RepairResult:
+    """Validates a flowchart and repairs the defects models commonly make.
+
+    Fixes a missing header or Markdown fence, labels that need quoting
+    (brackets, parentheses or quotes inside Japanese labels), unclosed node
+    brackets, ``->`` edges, reserved or reused node ids, and unbalanced
+    ``subgraph``/``end`` pairs. Code without defects is returned unchanged.
+
+    Args:
+        code: Mermaid code as produced by the workflow diagram agent.
+
+    Returns:
+        The repaired code, its parsed flowchart and a description of each
+        repair.
+
+    Raises:
+        MermaidSyntaxError: If the code cannot be repaired locally and has to
+            go back to the model.
+    """
+    repairer = _FlowchartRepairer()
+    if code.lstrip().startswith("```"):
+        fenced = code.strip().splitlines()[1:]
+        if fenced and fenced[-1].startswith("```"):
+            fenced.pop()
+        code = "\n".join(fenced)
+        repairer.repairs.append("removed the Markdown fence")
+
+    lines, depth, header_seen = [], 0, False
+    for number, raw in enumerate(code.splitlines(), start=1):
+        body, has_comment, comment = raw.partition("%%")
+        stripped = body.strip()
+        if not stripped:
+            lines.append(raw.rstrip())
+            continue
+        indent = body[: len(body) - len(body.lstrip())]
+        if not header_seen:
+            header_seen = True
+            if HEADER_RE.match(stripped):
+                lines.append(raw.rstrip())
+                continue
+            if DIAGRAM_TYPE_RE.match(stripped):
+                raise MermaidSyntaxError(
+                    f"expected a flowchart, got {stripped.split()[0]!r}", number
+                )
+            lines.append("flowchart TD")
+            repairer.repairs.append(f"line {number}: added the 'flowchart TD' header")
+            if re.match(r"^(?:graph|flowchart)\b", stripped):
+                continue
+
+        statements = []
+        for statement in stripped.split(";"):
+            statement = statement.strip()
+            if not statement:
+                continue
+            if IGNORED_RE.match(statement):
+                statements.append(statement)
+            elif statement.startswith("subgraph"):
+                depth += 1
+                statements.append(statement)
+            elif statement == "end":
+                if depth == 0:
+                    repairer.repairs.append(f"line {number}: removed unmatched 'end'")
+                    continue
+                depth -= 1
+                statements.append(statement)
+            else:
+                statements.append(repairer.statement(statement, number))
+        if statements:
+            suffix = f" %%{comment}" if has_comment else ""
+            lines.append(indent + "; ".join(statements) + suffix)
+
+    if depth:
+        lines.extend("end" for _ in range(depth))
+        repairer.repairs.append(f"closed {depth} unterminated subgraph(s)")
+    if repairer.repairs:
+        code = "\n".join(lines)
+    return RepairResult(code, parse_flowchart(code), repairer.repairs)
+
+
+# The edge written for each (style, arrow) pair of a parsed edge.
+EDGE_TOKENS = {
+    ("solid", True): "-->",
+    ("solid", False): "---",
+    ("thick", True): "==>",
+    ("thick", False): "===",
+    ("dotted", True): "-.->",
+    ("dotted", False): "-.-",
+}
+
+
+def _format_label(label: str) -> str:
+    label = label.replace("\n", "<br>")
+    if UNSAFE_LABEL_RE.search(re.sub(r"<br\s*/?>", "", label)):
+        return '"' + label.replace('"', "#quot;") + '"'
+    return label
+
+
+def format_flowchart(chart: Flowchart) -> str:
+    """Writes a parsed flowchart back as Mermaid code.
+
+    Every node is declared once with its label and shape, followed by the
+    edges in their original order, so ``parse_flowchart`` reads the result
+    back into the same nodes and edges.
+
+    Args:
+        chart: The flowchart, e.g. as returned by ``parse_flowchart``.
+
+    Returns:
+        Mermaid code starting with the ``flowchart`` header.
+    """
+    delimiters: dict[str, tuple[str, str]] = {}
+    for opening, closing, shape in NODE_SHAPES:
+        delimiters.setdefault(shape, (opening, closing))
+    lines = [f"flowchart {chart.direction}"]
+    for node in chart.nodes.values():
+        opening, closing = delimiters.get(node.shape, ("[", "]"))
+        lines.append(f"    {node.id}{opening}{_format_label(node.label)}{closing}")
+    for edge in chart.edges:
+        token = EDGE_TOKENS[edge.style, edge.arrow]
+        label = f"|{_format_label(edge.label)}|" if edge.label else ""
+        lines.append(f"    {edge.source} {token}{label} {edge.target}")
+    return "\n".join(lines)
+
+
+def merge_flowcharts(fragments: list[tuple[str, Flowchart]]) -> Flowchart:
+    """Joins flowcharts of consecutive parts of a text into one flowchart.
+
+    Node ids are prefixed with the id of their fragment so that fragments
+    drawn separately cannot collide, and a dotted edge leads from the last
+    node of each fragment to the first node of the next one, following the
+    order of the text rather than a procedural step.
+
+    Args:
+        fragments: (prefix, flowchart) pairs in text order; the prefix must
+            be a valid node id.
+
+    Returns:
+        The merged flowchart, in the direction of the first fragment.
+    """
+    merged = Flowchart(direction=fragments[0][1].direction if fragments else "TD")
+    previous: str | None = None
+    for prefix, chart in fragments:
+        if not chart.nodes:
+            continue
+        for node in chart.nodes.values():
+            node_id = f"{prefix}_{node.id}"
+            merged.nodes[node_id] = Node(node_id, node.label, node.shape)
+        for edge in chart.edges:
+            merged.edges.append(
+                Edge(
+                    f"{prefix}_{edge.source}",
+                    f"{prefix}_{edge.target}",
+                    edge.label,
+                    edge.style,
+                    edge.arrow,
+                )
+            )
+        node_ids = [f"{prefix}_{node_id}" for node_id in chart.nodes]
+        if previous is not None:
+            merged.edges.append(Edge(previous, node_ids[0], style="dotted"))
+        previous = node_ids[-1]
+    return merged
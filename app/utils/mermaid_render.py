@@ -0,0 +1,390 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""In-process SVG rendering of Mermaid flowcharts.
+
+Lays out the flowchart subset understood by :func:`parse_flowchart` in layers
+(a simplified Sugiyama layout: cycle removal, longest-path layering, dummy
+nodes for long edges and barycenter ordering) and emits a standalone SVG, so
+diagrams can be shown without mermaid.live or a browser-side renderer.
+"""
+
+import functools
+import itertools
+import unicodedata
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from xml.sax.saxutils import escape
+
+from .mermaid import Edge, Flowchart, parse_flowchart
+
+FONT_SIZE = 14
+LINE_HEIGHT = 18
+PADDING_X = 14
+PADDING_Y = 10
+# Labels are wrapped to roughly this many full-width characters per line.
+MAX_LABEL_EMS = 12
+NODE_GAP = 36
+LAYER_GAP = 56
+MARGIN = 16
+ORDERING_SWEEPS = 4
+FONT_FAMILY = "'Hiragino Sans', 'Noto Sans CJK JP', 'Yu Gothic', Meiryo, sans-serif"
+
+
+def text_width(text: str) -> float:
+    """Estimates the rendered width of ``text`` in pixels."""
+    return sum(
+        FONT_SIZE if unicodedata.east_asian_width(c) in "WF" else FONT_SIZE * 0.6
+        for c in text
+    )
+
+
+def wrap_label(label: str) -> list[str]:
+    """
+    Splits a label into lines no wider than MAX_LABEL_EMS full-width
+    characters, breaking Japanese text anywhere and other text at spaces.
+    """
+    limit = MAX_LABEL_EMS * FONT_SIZE
+    lines = []
+    for paragraph in label.split("\n"):
+        line = ""
+        for char in paragraph:
+            if line and text_width(line + char) > limit:
+                head, space, tail = line.rpartition(" ")
+                if space and head and not char.isspace():
+                    lines.append(head)
+                    line = tail
+                else:
+                    lines.append(line.rstrip())
+                    line = ""
+                if char.isspace():
+                    continue
+            line += char
+        lines.append(line)
+    return lines
+
+
+@dataclass
+class _Box:
+    """A node (or a dummy point of a long edge) placed by the layout."""
+
+    id: str
+    lines: list[str] = field(default_factory=list)
+    shape: str = "rect"
+    width: float = 0.0
+    height: float = 0.0
+    layer: int = 0
+    x: float = 0.0
+    y: float = 0.0
+
+    @property
+    def dummy(self) -> bool:
+        return not self.lines
+
+
+def _size(box: _Box) -> None:
+    width: float = max(text_width(line) for line in box.lines) + 2 * PADDING_X
+    height: float = len(box.lines) * LINE_HEIGHT + 2 * PADDING_Y
+    if box.shape == "diamond":
+        width, height = width * 1.5, height * 1.5
+    elif box.shape == "circle":
+        width = height = max(width, height)
+    elif box.shape == "hexagon":
+        width += height / 2
+    box.width, box.height = width, height
+
+
+def _acyclic_edges(chart: Flowchart) -> list[tuple[str, str, Edge]]:
+    """
+    Returns (upper, lower, edge) pairs with back edges reversed, so that
+    every pair points down the layers.
+    """
+    children: dict[str, list[Edge]] = {node_id: [] for node_id in chart.nodes}
+    for outgoing in chart.edges:
+        children[outgoing.source].append(outgoing)
+    state: dict[str, int] = {}
+    oriented = []
+
+    for root in chart.nodes:
+        if root in state:
+            continue
+        # Iterative DFS: 1 = on the stack, 2 = finished.
+        state[root] = 1
+        stack: list[tuple[str, Iterator[Edge]]] = [(root, iter(children[root]))]
+        while stack:
+            node_id, pending = stack[-1]
+            edge: Edge | None = next(pending, None)
+            if edge is None:
+                state[node_id] = 2
+                stack.pop()
+                continue
+            if state.get(edge.target) == 1:
+                oriented.append((edge.target, edge.source, edge))
+                continue
+            oriented.append((edge.source, edge.target, edge))
+            if edge.target not in state:
+                state[edge.target] = 1
+                stack.append((edge.target, iter(children[edge.target])))
+    return oriented
+
+
+def _assign_layers(
+    chart: Flowchart, oriented: list[tuple[str, str, Edge]]
+) -> dict[str, int]:
+    """Places each node one layer below its lowest parent (longest path)."""
+    parents: dict[str, list[str]] = {node_id: [] for node_id in chart.nodes}
+    for upper, lower, _ in oriented:
+        if upper != lower:
+            parents[lower].append(upper)
+    layers: dict[str, int] = {}
+
+    def layer_of(node_id: str) -> int:
+        stack = [node_id]
+        while stack:
+            current = stack[-1]
+            missing = [p for p in parents[current] if p not in layers]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            layers[current] = max((layers[p] + 1 for p in parents[current]), default=0)
+        return layers[node_id]
+
+    for node_id in chart.nodes:
+        layer_of(node_id)
+    return layers
+
+
+def _order_layers(rows: list[list[_Box]], links: list[tuple[_Box, _Box]]) -> None:
+    """Reduces crossings by ordering each layer by its neighbours' barycenters."""
+    up: dict[str, list[_Box]] = {}
+    down: dict[str, list[_Box]] = {}
+    for upper, lower in links:
+        down.setdefault(upper.id, []).append(lower)
+        up.setdefault(lower.id, []).append(upper)
+
+    def sweep(layer_rows: list[list[_Box]], neighbours: dict[str, list[_Box]]) -> None:
+        for previous, row in itertools.pairwise(layer_rows):
+            position = {box.id: i for i, box in enumerate(previous)}
+            barycenter = {}
+            for i, box in enumerate(row):
+                linked = [position[n.id] for n in neighbours.get(box.id, [])]
+                barycenter[box.id] = sum(linked) / len(linked) if linked else i
+            row.sort(key=lambda box: barycenter[box.id])
+
+    for _ in range(ORDERING_SWEEPS):
+        sweep(rows, up)
+        sweep(rows[::-1], down)
+
+
+def _place(rows: list[list[_Box]], horizontal: bool) -> tuple[float, float]:
+    """
+    Assigns centre coordinates, centring every layer on the widest one.
+
+    :return: The width and height of the drawing
+    """
+
+    # Along a layer boxes are spaced by width (height when horizontal).
+    def along(box: _Box) -> float:
+        return box.height if horizontal else box.width
+
+    def across(box: _Box) -> float:
+        return box.width if horizontal else box.height
+
+    extents = [
+        sum(along(box) for box in row) + NODE_GAP * (len(row) - 1) for row in rows
+    ]
+    widest = max(extents)
+    offset: float = MARGIN
+    for row, extent in zip(rows, extents, strict=False):
+        depth = max(across(box) for box in row)
+        cursor = MARGIN + (widest - extent) / 2
+        for box in row:
+            main = cursor + along(box) / 2
+            cross = offset + depth / 2
+            box.x, box.y = (cross, main) if horizontal else (main, cross)
+            cursor += along(box) + NODE_GAP
+        offset += depth + LAYER_GAP
+    size_along = widest + 2 * MARGIN
+    size_across = offset - LAYER_GAP + MARGIN
+    return (size_across, size_along) if horizontal else (size_along, size_across)
+
+
+def _anchor(box: _Box, toward: _Box) -> tuple[float, float]:
+    """Returns where a line from ``box`` toward ``toward`` leaves its outline."""
+    if box.dummy:
+        return box.x, box.y
+    dx, dy = toward.x - box.x, toward.y - box.y
+    if dx == dy == 0:
+        return box.x, box.y
+    half_w, half_h = box.width / 2, box.height / 2
+    if box.shape == "diamond":
+        scale = 1 / (abs(dx) / half_w + abs(dy) / half_h)
+    else:
+        scale = min(
+            half_w / abs(dx) if dx else float("inf"),
+            half_h / abs(dy) if dy else float("inf"),
+        )
+    return box.x + dx * scale, box.y + dy * scale
+
+
+def _shape_svg(box: _Box) -> str:
+    x, y = box.x - box.width / 2, box.y - box.height / 2
+    w, h = box.width, box.height
+    common = 'fill="#ECECFF" stroke="#9370DB" stroke-width="1.5"'
+    if box.shape == "diamond":
+        points = f"{box.x},{y} {x + w},{box.y} {box.x},{y + h} {x},{box.y}"
+        return f'<polygon points="{points}" {common}/>'
+    if box.shape == "circle":
+        return f'<circle cx="{box.x}" cy="{box.y}" r="{w / 2}" {common}/>'
+    if box.shape == "hexagon":
+        inset = h / 4
+        points = (
+            f"{x + inset},{y} {x + w - inset},{y} {x + w},{box.y} "
+            f"{x + w - inset},{y + h} {x + inset},{y + h} {x},{box.y}"
+        )
+        return f'<polygon points="{points}" {common}/>'
+    radius = {"round": 8, "stadium": h / 2}.get(box.shape, 0)
+    return f'<rect x="{x}" y="{y}" width="{w}" height="{h}" rx="{radius}" {common}/>'
+
+
+def _text_svg(lines: list[str], x: float, y: float) -> str:
+    top = y - (len(lines) - 1) * LINE_HEIGHT / 2
+    spans = "".join(
+        f'<tspan x="{x}" y="{top + i * LINE_HEIGHT}">{escape(line)}</tspan>'
+        for i, line in enumerate(lines)
+    )
+    return f'<text text-anchor="middle" dominant-baseline="central">{spans}</text>'
+
+
+def _edge_svg(points: list[tuple[float, float]], edge: Edge) -> str:
+    path = " ".join(
+        f"{'M' if i == 0 else 'L'}{x:.1f},{y:.1f}" for i, (x, y) in enumerate(points)
+    )
+    attributes = {
+        "solid": 'stroke-width="1.5"',
+        "dotted": 'stroke-width="1.5" stroke-dasharray="4 3"',
+        "thick": 'stroke-width="3"',
+    }[edge.style]
+    marker = ' marker-end="url(#arrow)"' if edge.arrow else ""
+    svg = f'<path d="{path}" fill="none" stroke="#333" {attributes}{marker}/>'
+    if edge.label:
+        lines = wrap_label(edge.label)
+        middle = len(points) // 2
+        (x1, y1), (x2, y2) = points[middle - 1], points[middle]
+        x, y = (x1 + x2) / 2, (y1 + y2) / 2
+        width = max(text_width(line) for line in lines) + 8
+        height = len(lines) * LINE_HEIGHT + 4
+        svg += (
+            f'<rect x="{x - width / 2}" y="{y - height / 2}" width="{width}" '
+            f'height="{height}" fill="#F5F5F5" opacity="0.9"/>' + _text_svg(lines, x, y)
+        )
+    return svg
+
+
+def layout_svg(chart: Flowchart) -> str:
+    """
+    Lays out a parsed flowchart and renders it as SVG.
+
+    :param chart: The flowchart to draw
+    :return: A standalone SVG document
+    """
+    if not chart.nodes:
+        return '<svg xmlns="http://www.w3.org/2000/svg" width="0" height="0"/>'
+    boxes = {
+        node.id: _Box(node.id, wrap_label(node.label), node.shape)
+        for node in chart.nodes.values()
+    }
+    for box in boxes.values():
+        _size(box)
+    oriented = _acyclic_edges(chart)
+    layers = _assign_layers(chart, oriented)
+    for node_id, layer in layers.items():
+        boxes[node_id].layer = layer
+
+    # Split edges spanning several layers with dummy points so that they are
+    # routed between the nodes of the intermediate layers.
+    routes: list[tuple[list[_Box], Edge, bool]] = []
+    links: list[tuple[_Box, _Box]] = []
+    for upper, lower, edge in oriented:
+        chain = [boxes[upper]]
+        for layer in range(layers[upper] + 1, layers[lower]):
+            dummy = _Box(f"{upper}->{lower}#{layer}#{len(routes)}", layer=layer)
+            boxes[dummy.id] = dummy
+            chain.append(dummy)
+        chain.append(boxes[lower])
+        if upper != lower:
+            links.extend(itertools.pairwise(chain))
+        routes.append((chain, edge, upper != edge.source))
+
+    rows: list[list[_Box]] = [[] for _ in range(max(layers.values(), default=0) + 1)]
+    for box in boxes.values():
+        rows[box.layer].append(box)
+    _order_layers(rows, links)
+
+    horizontal = chart.direction in ("LR", "RL")
+    width, height = _place(rows, horizontal)
+    if chart.direction in ("BT", "RL"):
+        for box in boxes.values():
+            if horizontal:
+                box.x = width - box.x
+            else:
+                box.y = height - box.y
+
+    parts = []
+    for chain, edge, reversed_edge in routes:
+        if reversed_edge:
+            chain = chain[::-1]
+        if len(chain) == 2 and chain[0] is chain[1]:
+            # A self-loop is drawn as a small arc on the right of the node.
+            box = chain[0]
+            x, y = box.x + box.width / 2, box.y
+            points = [(x, y - 6), (x + 20, y - 12), (x + 20, y + 12), (x, y + 6)]
+        else:
+            points = [
+                _anchor(chain[0], chain[1]),
+                *((box.x, box.y) for box in chain[1:-1]),
+                _anchor(chain[-1], chain[-2]),
+            ]
+        parts.append(_edge_svg(points, edge))
+    for box in boxes.values():
+        if not box.dummy:
+            parts.append(_shape_svg(box) + _text_svg(box.lines, box.x, box.y))
+
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" '
+        f'height="{height:.0f}" viewBox="0 0 {width:.1f} {height:.1f}" '
+        f'font-family="{FONT_FAMILY}" font-size="{FONT_SIZE}">'
+        '<defs><marker id="arrow" viewBox="0 0 10 10" refX="10" refY="5" '
+        'markerWidth="8" markerHeight="8" markerUnits="userSpaceOnUse" '
+        'orient="auto-start-reverse">'
+        '<path d="M0,0 L10,5 L0,10 z" fill="#333"/></marker></defs>'
+        f'<rect width="100%" height="100%" fill="white"/>{"".join(parts)}</svg>'
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def render_mermaid_svg(code: str) -> str:
+    """
+    Renders Mermaid flowchart code to SVG, caching the result per code.
+
+    Repeated diagrams (the same article analyzed again, or a Streamlit rerun)
+    are served from the cache; ``render_mermaid_svg.cache_info()`` reports
+    its hits and misses.
+
+    :param code: Mermaid code, without the Markdown fence
+    :return: A standalone SVG document
+    :raises MermaidSyntaxError: If the code is not a supported flowchart
+    """
+    return layout_svg(parse_flowchart(code))
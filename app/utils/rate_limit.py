@@ -0,0 +1,317 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A process-wide, rate-limit-aware scheduler for model calls.
+
+``schedule_gemini`` routes every Gemini call of the process through one
+``ModelCallScheduler``. Calls wait for request and token budget in shared
+token buckets, sized to the Vertex AI quota, instead of all firing at once.
+Quota (429) and unavailable (503) errors are retried with jittered exponential
+backoff, and the backoff also holds back every other caller, so concurrent
+sessions do not retry in lockstep. Optionally, a non-streaming call that is
+still unanswered after ``hedge_after`` seconds is sent a second time and the
+first answer wins.
+"""
+
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncGenerator, Callable
+from typing import ClassVar
+
+from google.adk.models import BaseLlm, Gemini, LLMRegistry, LlmRequest, LlmResponse
+from opentelemetry import trace
+
+from .agent_metrics import content_text, estimate_tokens, percentile
+
+# Status codes that mean "try again later" rather than "this request is bad".
+RETRYABLE_CODES = (429, 503)
+# A model name that resolves to whatever class serves Gemini.
+GEMINI_MODEL = "gemini-2.0-flash"
+
+# Starts one attempt of a model call.
+CallAttempt = Callable[[], AsyncGenerator[LlmResponse, None]]
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether ``error`` is a quota or availability error worth retrying."""
+    # google.genai errors carry ``code``; google.api_core ones ``code`` too,
+    # but as an HTTP status enum whose value is the number.
+    code = getattr(error, "code", None)
+    return getattr(code, "value", code) in RETRYABLE_CODES
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket that hands out reservations.
+
+    Callers reserve capacity and are told how long to wait for it, so waiting
+    callers are served in arrival order and the bucket works across threads
+    and event loops alike.
+    """
+
+    def __init__(self, per_minute: float, burst_seconds: float = 60.0) -> None:
+        """
+        Initialize the bucket, full.
+
+        :param per_minute: Refill rate; 0 disables the limit
+        :param burst_seconds: Capacity, in seconds' worth of refill
+        """
+        self.rate = per_minute / 60
+        self.capacity = self.rate * burst_seconds
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """Takes ``amount`` now or on credit; returns seconds until it is covered."""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._level = min(
+                self.capacity, self._level + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            # Requests larger than the bucket would otherwise wait forever.
+            self._level -= min(amount, self.capacity)
+            return max(0.0, -self._level / self.rate)
+
+    def charge(self, amount: float) -> None:
+        """Takes ``amount`` without waiting, e.g. output tokens after the fact."""
+        if self.rate:
+            with self._lock:
+                self._level -= amount
+
+
+class ModelCallScheduler:
+    """Rate limits, retries and optionally hedges model calls."""
+
+    def __init__(
+        self,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        hedge_after: float | None = None,
+        burst_seconds: float = 10.0,
+        max_samples: int = 10000,
+    ) -> None:
+        """
+        Initialize the scheduler.
+
+        :param requests_per_minute: Model calls allowed per minute; 0 disables
+        :param tokens_per_minute: Input plus output tokens allowed per minute,
+            as estimated by ``estimate_tokens``; 0 disables
+        :param max_retries: Retries of a call that failed with 429 or 503
+        :param base_delay: Backoff before the first retry, doubled each time
+        :param max_delay: Upper bound of a single backoff
+        :param hedge_after: Seconds after which an unanswered non-streaming
+            call is sent again; None disables hedging
+        :param burst_seconds: How many seconds' worth of budget may be spent
+            at once; less than the quota's minute spreads bursts out
+        :param max_samples: Most recent queue waits kept for percentiles
+        """
+        self.requests = TokenBucket(requests_per_minute, burst_seconds)
+        self.tokens = TokenBucket(tokens_per_minute, burst_seconds)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_after = hedge_after
+        self.stats = {
+            "calls": 0,
+            "retries": 0,
+            "failed": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+        }
+        self._waits: deque[float] = deque(maxlen=max_samples)
+        # No call starts before this time.monotonic() value after a throttle.
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ModelCallScheduler":
+        """Builds a scheduler from GEMINI_RPM, GEMINI_TPM and GEMINI_HEDGE_AFTER."""
+        hedge_after = os.environ.get("GEMINI_HEDGE_AFTER")
+        return cls(
+            requests_per_minute=float(os.environ.get("GEMINI_RPM", "0")),
+            tokens_per_minute=float(os.environ.get("GEMINI_TPM", "0")),
+            hedge_after=float(hedge_after) if hedge_after else None,
+        )
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def backoff(self, attempt: int) -> float:
+        """Returns a full-jitter delay for retry number ``attempt`` (from 0)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    async def wait_for_budget(self, tokens: int) -> float:
+        """Waits until a call of ``tokens`` input tokens may start; returns the wait."""
+        wait = max(
+            self.requests.reserve(),
+            self.tokens.reserve(tokens),
+            self._resume_at - time.monotonic(),
+        )
+        if wait > 0:
+            await asyncio.sleep(wait)
+        with self._lock:
+            self._waits.append(max(wait, 0.0))
+        return max(wait, 0.0)
+
+    async def run(
+        self, call: CallAttempt, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        """
+        Make one model call within the budget, retrying throttled attempts.
+
+        An attempt that already yielded a response is not retried, since its
+        partial output has been passed on.
+
+        :param call: Starts one attempt of the call
+        :param llm_request: The request ``call`` sends, used to count tokens
+        :param stream: Whether ``call`` streams; streamed calls are not hedged
+        :return: The responses of the first successful attempt
+        """
+        self.count("calls")
+        input_tokens = estimate_tokens(content_text(llm_request.contents))
+        queue_wait = 0.0
+        for attempt in range(self.max_retries + 1):
+            queue_wait += await self.wait_for_budget(input_tokens)
+            trace.get_current_span().set_attribute(
+                "legal_flow.queue_wait_ms", round(queue_wait * 1000, 1)
+            )
+            yielded = False
+            try:
+                if stream or self.hedge_after is None:
+                    async for llm_response in call():
+                        yielded = True
+                        self.charge_output(llm_response)
+                        yield llm_response
+                else:
+                    for llm_response in await self.hedged(call):
+                        yielded = True
+                        self.charge_output(llm_response)
+                        yield llm_response
+                return
+            except Exception as e:
+                if yielded or not is_retryable(e) or attempt == self.max_retries:
+                    self.count("failed")
+                    raise
+                # Hold back every caller, not just this one, so that sessions
+                # throttled together do not all retry at the same moment.
+                resume_at = time.monotonic() + self.backoff(attempt)
+                with self._lock:
+                    self._resume_at = max(self._resume_at, resume_at)
+                    self.stats["retries"] += 1
+
+    async def hedged(self, call: CallAttempt) -> list[LlmResponse]:
+        """Sends the call again if it is slow and returns the first answer."""
+
+        async def attempt() -> list[LlmResponse]:
+            return [llm_response async for llm_response in call()]
+
+        first = asyncio.ensure_future(attempt())
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        if done:
+            return first.result()
+
+        self.count("hedged")
+        await self.wait_for_budget(0)
+        second = asyncio.ensure_future(attempt())
+        pending = {first, second}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.count("hedge_wins")
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+        # Both attempts failed; report the original one.
+        return first.result()
+
+    def charge_output(self, llm_response: LlmResponse) -> None:
+        if llm_response.content and not llm_response.partial:
+            self.tokens.charge(estimate_tokens(content_text([llm_response.content])))
+
+    def summary(self) -> dict[str, float]:
+        """Returns the call counters and p50/p95/p99 of the queue wait in seconds."""
+        with self._lock:
+            waits = list(self._waits)
+            summary: dict[str, float] = dict(self.stats)
+        for q in (50, 95, 99):
+            summary[f"queue_wait_p{q}_s"] = round(percentile(waits, q), 4)
+        return summary
+
+
+model_call_scheduler = ModelCallScheduler.from_env()
+
+
+def scheduled(
+    llm_class: type[BaseLlm], scheduler: ModelCallScheduler | None = None
+) -> type[BaseLlm]:
+    """
+    Derive a model class whose calls go through ``scheduler``.
+
+    :param llm_class: The model class to derive from, e.g. ``Gemini``
+    :param scheduler: Scheduler to use (default: ``model_call_scheduler``)
+    :return: A subclass that serves the same model names
+    """
+    chosen = scheduler or model_call_scheduler
+
+    class Scheduled(llm_class):
+        scheduler: ClassVar[ModelCallScheduler] = chosen
+
+        async def generate_content_async(
+            self, llm_request: LlmRequest, stream: bool = False
+        ) -> AsyncGenerator[LlmResponse, None]:
+            generate = super().generate_content_async
+            async for llm_response in self.scheduler.run(
+                lambda: generate(llm_request, stream=stream), llm_request, stream
+            ):
+                yield llm_response
+
+    Scheduled.__name__ = Scheduled.__qualname__ = f"Scheduled{llm_class.__name__}"
+    return Scheduled
+
+
+def schedule_gemini(scheduler: ModelCallScheduler | None = None) -> None:
+    """
+    Send every call to a Gemini model name through ``scheduler``.
+
+    Agents declare their model by name and ADK resolves the name through
+    ``LLMRegistry`` on each call, so registering a scheduled ``Gemini`` covers
+    ``root_agent``, its sub-agents and the pipeline alike. Calling this again
+    with the same scheduler changes nothing.
+
+    :param scheduler: Scheduler to use (default: ``model_call_scheduler``)
+    """
+    scheduler = scheduler or model_call_scheduler
+    current = LLMRegistry.resolve(GEMINI_MODEL)
+    if getattr(current, "scheduler", None) is scheduler:
+        return
+    LLMRegistry.register(scheduled(Gemini, scheduler))
+    LLMRegistry.resolve.cache_clear()
@@ -0,0 +1,483 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, InMemorySessionService, Session
+from google.adk.sessions.base_session_service import (
+    GetSessionConfig,
+    ListEventsResponse,
+    ListSessionsResponse,
+)
+from google.adk.sessions.state import State
+
+SessionKey = tuple[str, str, str]
+
+DEFAULT_SESSION_DB = os.path.join(tempfile.gettempdir(), "legal-flow-ai-sessions.db")
+
+# The sessions primary key doubles as the index for lookups by user.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, id)
+);
+CREATE TABLE IF NOT EXISTS events (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    event TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_by_session
+    ON events (app_name, user_id, session_id);
+CREATE TABLE IF NOT EXISTS app_states (
+    app_name TEXT PRIMARY KEY,
+    state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS user_states (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id)
+);
+"""
+
+
+class BoundedSessionService(InMemorySessionService):
+    """
+    An in-memory session service whose memory use is bounded.
+
+    Sessions are kept in least-recently-used order. Sessions idle for longer
+    than ``idle_ttl`` seconds are evicted, the least recently used ones are
+    evicted once there are more than ``max_sessions``, and each stored session
+    keeps only its ``max_events_per_session`` most recent events. Evicted
+    sessions behave as if they had been deleted.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        idle_ttl: float = 3600.0,
+        max_events_per_session: int = 500,
+    ) -> None:
+        """
+        Initialize the service.
+
+        :param max_sessions: Maximum number of sessions kept
+        :param idle_ttl: Seconds after its last use that a session is evicted
+        :param max_events_per_session: Most recent events kept per session
+        """
+        super().__init__()
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_events_per_session = max_events_per_session
+        self.stats = {"evicted_lru": 0, "evicted_idle": 0, "events_trimmed": 0}
+        # Last use of each session, least recently used first.
+        self._last_used: OrderedDict[SessionKey, float] = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def session_count(self) -> int:
+        return len(self._last_used)
+
+    def resident_bytes(self) -> int:
+        """Approximate memory held by stored sessions, as their JSON size."""
+        with self._lock:
+            return sum(
+                len(session.model_dump_json(exclude_none=True))
+                for user_sessions in self.sessions.values()
+                for sessions in user_sessions.values()
+                for session in sessions.values()
+            )
+
+    def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: dict[str, Any] | None = None,
+        session_id: str | None = None,
+    ) -> Session:
+        with self._lock:
+            self._evict_idle()
+            session = super().create_session(
+                app_name=app_name, user_id=user_id, state=state, session_id=session_id
+            )
+            self._touch((app_name, user_id, session.id))
+            while len(self._last_used) > self.max_sessions:
+                self._evict(next(iter(self._last_used)))
+                self.stats["evicted_lru"] += 1
+            return session
+
+    def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: GetSessionConfig | None = None,
+    ) -> Session | None:
+        with self._lock:
+            self._evict_idle()
+            session = super().get_session(
+                app_name=app_name, user_id=user_id, session_id=session_id, config=config
+            )
+            if session is not None:
+                self._touch((app_name, user_id, session_id))
+            return session
+
+    def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        with self._lock:
+            self._evict_idle()
+            return super().list_sessions(app_name=app_name, user_id=user_id)
+
+    def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        with self._lock:
+            super().delete_session(
+                app_name=app_name, user_id=user_id, session_id=session_id
+            )
+            self._last_used.pop((app_name, user_id, session_id), None)
+
+    def append_event(self, session: Session, event: Event) -> Event:
+        with self._lock:
+            super().append_event(session=session, event=event)
+            key = (session.app_name, session.user_id, session.id)
+            if key not in self._last_used:
+                return event
+            self._touch(key)
+            stored = self.sessions[session.app_name][session.user_id][session.id]
+            excess = len(stored.events) - self.max_events_per_session
+            if excess > 0:
+                del stored.events[:excess]
+                self.stats["events_trimmed"] += excess
+            return event
+
+    def _touch(self, key: SessionKey) -> None:
+        self._last_used[key] = time.monotonic()
+        self._last_used.move_to_end(key)
+
+    def _evict_idle(self) -> None:
+        """Evict sessions unused for ``idle_ttl`` seconds, oldest first."""
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._last_used:
+            key, last_used = next(iter(self._last_used.items()))
+            if last_used > cutoff:
+                return
+            self._evict(key)
+            self.stats["evicted_idle"] += 1
+
+    def _evict(self, key: SessionKey) -> None:
+        app_name, user_id, session_id = key
+        del self._last_used[key]
+        user_sessions = self.sessions[app_name]
+        user_sessions[user_id].pop(session_id, None)
+        if not user_sessions[user_id]:
+            del user_sessions[user_id]
+
+
+class SqliteSessionService(BaseSessionService):
+    """
+    A session service persisted in a local SQLite database in WAL mode.
+
+    Sessions survive restarts and can be shared by several processes on the
+    same host. Appended events are buffered and written in one transaction
+    when an agent gives its final response, when ``max_pending_events`` are
+    buffered, or before any read, rather than in one transaction per event.
+    App- and user-scoped state is stored separately and merged into sessions
+    on read, as ``InMemorySessionService`` does.
+    """
+
+    def __init__(
+        self, path: str = DEFAULT_SESSION_DB, max_pending_events: int = 64
+    ) -> None:
+        """
+        Open (and create if needed) the session database.
+
+        :param path: Path of the SQLite database file
+        :param max_pending_events: Buffered events that force a write
+        """
+        self.path = path
+        self.max_pending_events = max_pending_events
+        self.stats = {"transactions": 0, "events_written": 0}
+        self._pending: dict[SessionKey, list[Event]] = {}
+        self._pending_sessions: dict[SessionKey, Session] = {}
+        self._pending_count = 0
+        self._lock = threading.RLock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only risks the last transactions on power loss.
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: dict[str, Any] | None = None,
+        session_id: str | None = None,
+    ) -> Session:
+        session_id = (
+            session_id.strip()
+            if session_id and session_id.strip()
+            else str(uuid.uuid4())
+        )
+        session = Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=state or {},
+            last_update_time=time.time(),
+        )
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO sessions VALUES (?, ?, ?, ?, ?)",
+                (
+                    app_name,
+                    user_id,
+                    session_id,
+                    json.dumps(session.state),
+                    session.last_update_time,
+                ),
+            )
+            self.stats["transactions"] += 1
+            return self._merge_state(session)
+
+    def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: GetSessionConfig | None = None,
+    ) -> Session | None:
+        with self._lock:
+            self.flush()
+            row = self._db.execute(
+                "SELECT state, update_time FROM sessions"
+                " WHERE app_name = ? AND user_id = ? AND id = ?",
+                (app_name, user_id, session_id),
+            ).fetchone()
+            if row is None:
+                return None
+            events = self._load_events(
+                app_name,
+                user_id,
+                session_id,
+                limit=config.num_recent_events if config else None,
+            )
+            session = Session(
+                app_name=app_name,
+                user_id=user_id,
+                id=session_id,
+                state=json.loads(row[0]),
+                events=events,
+                last_update_time=row[1],
+            )
+            if config and config.after_timestamp:
+                session.events = [
+                    event
+                    for event in session.events
+                    if event.timestamp >= config.after_timestamp
+                ]
+            return self._merge_state(session)
+
+    def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        with self._lock:
+            self.flush()
+            rows = self._db.execute(
+                "SELECT id, update_time FROM sessions"
+                " WHERE app_name = ? AND user_id = ?",
+                (app_name, user_id),
+            ).fetchall()
+        return ListSessionsResponse(
+            sessions=[
+                Session(
+                    app_name=app_name,
+                    user_id=user_id,
+                    id=session_id,
+                    last_update_time=update_time,
+                )
+                for session_id, update_time in rows
+            ]
+        )
+
+    def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        key = (app_name, user_id, session_id)
+        with self._lock, self._db:
+            self._pending_count -= len(self._pending.pop(key, []))
+            self._pending_sessions.pop(key, None)
+            self._db.execute(
+                "DELETE FROM events"
+                " WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                key,
+            )
+            self._db.execute(
+                "DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?",
+                key,
+            )
+            self.stats["transactions"] += 1
+
+    def list_events(
+        self, *, app_name: str, user_id: str, session_id: str
+    ) -> ListEventsResponse:
+        with self._lock:
+            self.flush()
+            return ListEventsResponse(
+                events=self._load_events(app_name, user_id, session_id)
+            )
+
+    def append_event(self, session: Session, event: Event) -> Event:
+        super().append_event(session=session, event=event)
+        if event.partial:
+            return event
+        session.last_update_time = event.timestamp
+        key = (session.app_name, session.user_id, session.id)
+        with self._lock:
+            self._pending.setdefault(key, []).append(event)
+            self._pending_sessions[key] = session
+            self._pending_count += 1
+            if self._pending_count >= self.max_pending_events or (
+                event.author != "user" and event.is_final_response()
+            ):
+                self.flush()
+        return event
+
+    def flush(self) -> None:
+        """Write all buffered events in a single transaction."""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            sessions, self._pending_sessions = self._pending_sessions, {}
+            self._pending_count = 0
+            written = 0
+            with self._db:
+                for key, events in pending.items():
+                    if self._write_events(key, sessions[key], events):
+                        written += len(events)
+            self.stats["transactions"] += 1
+            self.stats["events_written"] += written
+
+    def close(self) -> None:
+        """Write buffered events and close the database."""
+        with self._lock:
+            self.flush()
+            self._db.close()
+
+    def _write_events(
+        self, key: SessionKey, session: Session, events: list[Event]
+    ) -> bool:
+        """
+        Store a session's buffered events and its latest state.
+
+        :return: False if the session no longer exists
+        """
+        app_name, user_id, session_id = key
+        session_state = {
+            k: v
+            for k, v in session.state.items()
+            if not k.startswith((State.APP_PREFIX, State.USER_PREFIX))
+        }
+        updated = self._db.execute(
+            "UPDATE sessions SET state = ?, update_time = ?"
+            " WHERE app_name = ? AND user_id = ? AND id = ?",
+            (json.dumps(session_state), session.last_update_time, *key),
+        )
+        if not updated.rowcount:
+            return False
+        self._db.executemany(
+            "INSERT INTO events VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    app_name,
+                    user_id,
+                    session_id,
+                    event.timestamp,
+                    event.model_dump_json(exclude_none=True),
+                )
+                for event in events
+            ],
+        )
+
+        app_delta: dict[str, Any] = {}
+        user_delta: dict[str, Any] = {}
+        for event in events:
+            if not event.actions or not event.actions.state_delta:
+                continue
+            for k, v in event.actions.state_delta.items():
+                if k.startswith(State.APP_PREFIX):
+                    app_delta[k.removeprefix(State.APP_PREFIX)] = v
+                elif k.startswith(State.USER_PREFIX):
+                    user_delta[k.removeprefix(State.USER_PREFIX)] = v
+        if app_delta:
+            state = {**self._load_app_state(app_name), **app_delta}
+            self._db.execute(
+                "INSERT OR REPLACE INTO app_states VALUES (?, ?)",
+                (app_name, json.dumps(state)),
+            )
+        if user_delta:
+            state = {**self._load_user_state(app_name, user_id), **user_delta}
+            self._db.execute(
+                "INSERT OR REPLACE INTO user_states VALUES (?, ?, ?)",
+                (app_name, user_id, json.dumps(state)),
+            )
+        return True
+
+    def _load_events(
+        self, app_name: str, user_id: str, session_id: str, limit: int | None = None
+    ) -> list[Event]:
+        """Returns the (``limit`` most recent) events of a session in order."""
+        rows = self._db.execute(
+            "SELECT event FROM events"
+            " WHERE app_name = ? AND user_id = ? AND session_id = ?"
+            " ORDER BY rowid DESC LIMIT ?",
+            (app_name, user_id, session_id, limit or -1),
+        ).fetchall()
+        return [Event.model_validate_json(row[0]) for row in reversed(rows)]
+
+    def _load_app_state(self, app_name: str) -> dict[str, Any]:
+        row = self._db.execute(
+            "SELECT state FROM app_states WHERE app_name = ?", (app_name,)
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def _load_user_state(self, app_name: str, user_id: str) -> dict[str, Any]:
+        row = self._db.execute(
+            "SELECT state FROM user_states WHERE app_name = ? AND user_id = ?",
+            (app_name, user_id),
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def _merge_state(self, session: Session) -> Session:
+        """Adds the app- and user-scoped state to a session's state."""
+        for k, v in self._load_app_state(session.app_name).items():
+            session.state[State.APP_PREFIX + k] = v
+        for k, v in self._load_user_state(session.app_name, session.user_id).items():
+            session.state[State.USER_PREFIX + k] = v
+        return session
@@ -0,0 +1,191 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# ruff: noqa: RUF001
+
+import re
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+
+_KANJI_DIGITS = {
+    "〇": 0,
+    "零": 0,
+    "一": 1,
+    "二": 2,
+    "三": 3,
+    "四": 4,
+    "五": 5,
+    "六": 6,
+    "七": 7,
+    "八": 8,
+    "九": 9,
+}
+_KANJI_UNITS = {"十": 10, "百": 100, "千": 1000}
+
+_NUMERAL = r"[〇零一二三四五六七八九十百千0-9０-９]+"
+_SEPARATOR = r"(?:[ 　]+|$)"
+
+ARTICLE_RE = re.compile(rf"^(第{_NUMERAL}条(?:の{_NUMERAL})*){_SEPARATOR}")
+PARAGRAPH_RE = re.compile(rf"^([0-9０-９]+){_SEPARATOR}")
+ITEM_RE = re.compile(rf"^([〇一二三四五六七八九十百千]+(?:の{_NUMERAL})*){_SEPARATOR}")
+CAPTION_RE = re.compile(r"^[（(][^）)]+[）)]$")
+DIVISION_RE = re.compile(rf"^第{_NUMERAL}[編章節款目]{_SEPARATOR}")
+SUPPLEMENTARY_RE = re.compile(r"^附[ 　]*則(?:[ 　]*[（(][^）)]*[）)])?(?:[ 　]+抄)?$")
+
+
+def parse_number(numeral: str) -> int:
+    """Converts a kanji or (full-width) arabic numeral such as 三十五 to an int.
+
+    Args:
+        numeral: The numeral, without the surrounding 第/条 characters.
+
+    Returns:
+        The integer value.
+    """
+    numeral = numeral.translate(str.maketrans("０１２３４５６７８９", "0123456789"))
+    if numeral.isdigit():
+        return int(numeral)
+
+    total = 0
+    current = 0
+    for char in numeral:
+        if char in _KANJI_DIGITS:
+            current = current * 10 + _KANJI_DIGITS[char]
+        elif char in _KANJI_UNITS:
+            total += (current or 1) * _KANJI_UNITS[char]
+            current = 0
+        else:
+            raise ValueError(f"Not a numeral: {numeral}")
+    return total + current
+
+
+@dataclass
+class Item:
+    """A 号 within a paragraph, e.g. 一　申請者の氏名."""
+
+    number: str
+    text: str
+
+
+@dataclass
+class Paragraph:
+    """A 項 of an article. The first paragraph carries no number in the text."""
+
+    number: int
+    text: str
+    items: list[Item] = field(default_factory=list)
+
+
+@dataclass
+class Article:
+    """A single 条 (or a supplementary provision) with its paragraphs."""
+
+    number: str | None
+    caption: str | None = None
+    supplementary: bool = False
+    paragraphs: list[Paragraph] = field(default_factory=list)
+    lines: list[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        """The article as it appeared in the source, including its caption."""
+        lines = [self.caption, *self.lines] if self.caption else self.lines
+        return "\n".join(lines)
+
+
+def iter_articles(source: str | Iterable[str]) -> Iterator[Article]:
+    """Splits a statute into articles, yielding each one as soon as it ends.
+
+    Lines are consumed lazily, so a large law read from a file or a network
+    stream produces its first article before the rest has been read. Text
+    before the first 第N条 heading, such as a single pasted sentence, is
+    yielded as an article without a number; text under 附則 without its own
+    article headings is yielded as a supplementary provision numbered 附則.
+
+    Args:
+        source: The statute text, or an iterable of its lines.
+
+    Yields:
+        The articles in document order.
+    """
+    lines = source.splitlines() if isinstance(source, str) else source
+    current: Article | None = None
+    pending_caption: str | None = None
+    supplementary = False
+
+    for raw_line in lines:
+        line = raw_line.strip()
+        if not line:
+            continue
+
+        if DIVISION_RE.match(line):
+            continue
+
+        if SUPPLEMENTARY_RE.match(line):
+            if current is not None and current.lines:
+                yield current
+            supplementary = True
+            current = Article(number="附則", supplementary=True)
+            pending_caption = None
+            continue
+
+        if CAPTION_RE.match(line):
+            pending_caption = line
+            continue
+
+        article_match = ARTICLE_RE.match(line)
+        if article_match:
+            if current is not None and current.lines:
+                yield current
+            body = line[article_match.end() :].strip()
+            current = Article(
+                number=article_match.group(1),
+                caption=pending_caption,
+                supplementary=supplementary,
+                paragraphs=[Paragraph(number=1, text=body)],
+                lines=[line],
+            )
+            pending_caption = None
+            continue
+
+        if current is None:
+            current = Article(number=None)
+        if pending_caption is not None:
+            current.lines.append(pending_caption)
+            pending_caption = None
+        current.lines.append(line)
+
+        paragraph_match = PARAGRAPH_RE.match(line)
+        item_match = ITEM_RE.match(line)
+        if paragraph_match:
+            current.paragraphs.append(
+                Paragraph(
+                    number=parse_number(paragraph_match.group(1)),
+                    text=line[paragraph_match.end() :].strip(),
+                )
+            )
+        elif item_match and current.paragraphs:
+            current.paragraphs[-1].items.append(
+                Item(
+                    number=item_match.group(1),
+                    text=line[item_match.end() :].strip(),
+                )
+            )
+        elif current.paragraphs:
+            current.paragraphs[-1].text += line
+        else:
+            current.paragraphs.append(Paragraph(number=1, text=line))
+
+    if current is not None and current.lines:
+        yield current
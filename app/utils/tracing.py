@@ -12,16 +12,163 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
+import gzip
+import hashlib
 import json
 import logging
-from collections.abc import Sequence
-from typing import Any
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+from concurrent import futures
+from typing import TYPE_CHECKING, Any
 
-import google.cloud.storage as storage
-from google.cloud import logging as google_cloud_logging
-from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter
+from opentelemetry.exporter.cloud_trace import (
+    CloudTraceSpanExporter,
+    _create_default_client,
+)
+from opentelemetry.sdk import util
 from opentelemetry.sdk.trace import ReadableSpan
 from opentelemetry.sdk.trace.export import SpanExportResult
+from opentelemetry.trace import SpanContext, format_span_id, format_trace_id
+
+from app.utils.log_writer import BatchedLogWriter
+
+if TYPE_CHECKING:
+    import google.cloud.storage as storage
+    from google.cloud import logging as google_cloud_logging
+    from google.cloud.trace_v2 import TraceServiceClient
+
+# Cloud Logging rejects entries above 256 KB; keep attributes safely below it.
+MAX_ATTRIBUTES_BYTES = 255 * 1024
+
+LOG_LABELS = {
+    "type": "agent_telemetry",
+    "service_name": "legal-flow-ai",
+}
+
+
+_NEEDS_ESCAPE = re.compile(r'[^\x20-\x7e]|["\\]')
+
+
+def json_size(value: Any) -> int:
+    """
+    Compute the length in bytes of ``json.dumps(value)`` without building the
+    serialized document.
+
+    Containers are summed from their members, so the size of a large
+    attributes dict can be computed once and then adjusted incrementally as
+    values are replaced.
+
+    :param value: A JSON-compatible value
+    :return: The size of its default ``json.dumps`` serialization
+    """
+    if isinstance(value, str):
+        if not _NEEDS_ESCAPE.search(value):
+            return len(value) + 2
+        return len(json.encoder.encode_basestring_ascii(value))
+    if value is None or value is True:
+        return 4
+    if value is False:
+        return 5
+    if isinstance(value, int | float):
+        return len(json.dumps(value))
+    if isinstance(value, dict):
+        if not value:
+            return 2
+        return sum(
+            json_size(str(k)) + 2 + json_size(v) for k, v in value.items()
+        ) + 2 * len(value)
+    if isinstance(value, list | tuple):
+        if not value:
+            return 2
+        return sum(json_size(v) for v in value) + 2 * len(value)
+    return len(json.dumps(value))
+
+
+def _format_context(context: SpanContext) -> dict[str, str]:
+    return {
+        "trace_id": f"0x{format_trace_id(context.trace_id)}",
+        "span_id": f"0x{format_span_id(context.span_id)}",
+        "trace_state": repr(context.trace_state),
+    }
+
+
+def _attributes(attributes: Mapping[str, Any] | None) -> dict[str, Any] | None:
+    """Copies span attributes, with sequence values as lists like ``to_json``.
+
+    OTel stores sequence attributes as tuples, which ``json_format.ParseDict``
+    on Cloud Logging's gRPC path rejects.
+    """
+    if attributes is None:
+        return None
+    return {
+        key: list(value)
+        if isinstance(value, Sequence) and not isinstance(value, str)
+        else value
+        for key, value in attributes.items()
+    }
+
+
+def span_to_dict(span: ReadableSpan) -> dict[str, Any]:
+    """
+    Convert a span to the same structure as ``json.loads(span.to_json())``
+    without serializing and parsing it.
+
+    :param span: The span to convert
+    :return: A JSON-compatible dictionary describing the span
+    """
+    status = {"status_code": str(span.status.status_code.name)}
+    if span.status.description:
+        status["description"] = span.status.description
+
+    return {
+        "name": span.name,
+        "context": _format_context(span.context) if span.context else None,
+        "kind": str(span.kind),
+        "parent_id": f"0x{format_span_id(span.parent.span_id)}"
+        if span.parent is not None
+        else None,
+        "start_time": util.ns_to_iso_str(span.start_time) if span.start_time else None,
+        "end_time": util.ns_to_iso_str(span.end_time) if span.end_time else None,
+        "status": status,
+        "attributes": _attributes(span.attributes),
+        "events": [
+            {
+                "name": event.name,
+                "timestamp": util.ns_to_iso_str(event.timestamp),
+                "attributes": _attributes(event.attributes),
+            }
+            for event in span.events
+        ],
+        "links": [
+            {
+                "context": _format_context(link.context),
+                "attributes": _attributes(link.attributes),
+            }
+            for link in span.links
+        ],
+        "resource": {
+            "attributes": _attributes(span.resource.attributes),
+            "schema_url": span.resource.schema_url,
+        },
+    }
+
+
+class _LazyTraceClient:
+    """Creates the Cloud Trace client on first use instead of at construction."""
+
+    def __init__(self) -> None:
+        self._client: TraceServiceClient | None = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        with self._lock:
+            if self._client is None:
+                self._client = _create_default_client()
+        return getattr(self._client, name)
 
 
 class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
@@ -35,30 +182,108 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
 
     def __init__(
         self,
-        logging_client: google_cloud_logging.Client | None = None,
-        storage_client: storage.Client | None = None,
+        logging_client: "google_cloud_logging.Client | None" = None,
+        storage_client: "storage.Client | None" = None,
         bucket_name: str | None = None,
         debug: bool = False,
+        max_batch_size: int = 100,
+        flush_interval: float = 5.0,
+        max_queue_size: int = 2048,
+        max_uploaded_digests: int = 10000,
+        bucket_check_ttl: float = 300.0,
+        upload_workers: int = 4,
+        compression_level: int = 6,
         **kwargs: Any,
     ) -> None:
         """
         Initialize the exporter with Google Cloud clients and configuration.
 
+        Clients that are not given are created on first use, so constructing
+        the exporter does not look up credentials or open connections.
+
         :param logging_client: Google Cloud Logging client
         :param storage_client: Google Cloud Storage client
         :param bucket_name: Name of the GCS bucket to store large payloads
         :param debug: Enable debug mode for additional logging
+        :param max_batch_size: Maximum number of log entries written per request
+        :param flush_interval: Maximum seconds an entry waits before being written
+        :param max_queue_size: Entries buffered before new ones are dropped
+        :param max_uploaded_digests: Payload digests remembered for deduplication
+        :param bucket_check_ttl: Seconds a bucket existence check is reused
+        :param upload_workers: Threads uploading payloads to GCS
+        :param compression_level: gzip level used for uploaded payloads
         :param kwargs: Additional arguments to pass to the parent class
         """
+        kwargs.setdefault("client", _LazyTraceClient())
         super().__init__(**kwargs)
         self.debug = debug
-        self.logging_client = logging_client or google_cloud_logging.Client(
-            project=self.project_id
-        )
-        self.logger = self.logging_client.logger(__name__)
-        self.storage_client = storage_client or storage.Client(project=self.project_id)
+        if logging_client is not None:
+            self.logging_client = logging_client
+        if storage_client is not None:
+            self.storage_client = storage_client
         self.bucket_name = bucket_name or f"{self.project_id}-legal-flow-ai-logs-data"
-        self.bucket = self.storage_client.bucket(self.bucket_name)
+
+        # Digests of payloads already uploaded by this process, in LRU order.
+        self.max_uploaded_digests = max_uploaded_digests
+        self._uploaded_digests: OrderedDict[str, None] = OrderedDict()
+        self._uploaded_lock = threading.Lock()
+
+        # Payload uploads run in the background; the bucket check is cached.
+        self.bucket_check_ttl = bucket_check_ttl
+        self.compression_level = compression_level
+        self._bucket_found = False
+        self._bucket_checked_at: float | None = None
+        self._upload_executor = futures.ThreadPoolExecutor(
+            max_workers=upload_workers, thread_name_prefix="span-upload"
+        )
+        self._pending_uploads: set[futures.Future] = set()
+
+        # Log entries are written in batches by a background thread so that
+        # export() never waits on a Cloud Logging round trip.
+        self._log_writer = BatchedLogWriter(
+            lambda: self.logger,
+            labels=LOG_LABELS,
+            max_batch_size=max_batch_size,
+            flush_interval=flush_interval,
+            max_queue_size=max_queue_size,
+            name="span-log-writer",
+        )
+        self._upload_stats = {
+            "payloads_uploaded": 0,
+            "payloads_deduplicated": 0,
+            "uploads_failed": 0,
+            "bytes_uploaded": 0,
+            "bytes_saved_by_compression": 0,
+            "upload_seconds_total": 0.0,
+            "upload_seconds_max": 0.0,
+        }
+        self._stats_lock = threading.Lock()
+
+    @functools.cached_property
+    def logging_client(self) -> "google_cloud_logging.Client":
+        from google.cloud import logging as google_cloud_logging
+
+        return google_cloud_logging.Client(project=self.project_id)
+
+    @functools.cached_property
+    def logger(self) -> "google_cloud_logging.Logger":
+        return self.logging_client.logger(__name__)
+
+    @functools.cached_property
+    def storage_client(self) -> "storage.Client":
+        import google.cloud.storage as storage
+
+        return storage.Client(project=self.project_id)
+
+    @functools.cached_property
+    def bucket(self) -> "storage.Bucket":
+        return self.storage_client.bucket(self.bucket_name)
+
+    @property
+    def stats(self) -> dict[str, float]:
+        """Counters for log entries written and payloads uploaded."""
+        with self._stats_lock:
+            return {**self._log_writer.stats, **self._upload_stats}
 
     def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
         """
@@ -71,7 +296,7 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
             span_context = span.get_span_context()
             trace_id = format(span_context.trace_id, "x")
             span_id = format(span_context.span_id, "x")
-            span_dict = json.loads(span.to_json())
+            span_dict = span_to_dict(span)
 
             span_dict["trace"] = f"projects/{self.project_id}/traces/{trace_id}"
             span_dict["span_id"] = span_id
@@ -83,67 +308,172 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
             if self.debug:
                 print(span_dict)
 
-            # Log the span data to Google Cloud Logging
-            self.logger.log_struct(
-                span_dict,
-                labels={
-                    "type": "agent_telemetry",
-                    "service_name": "legal-flow-ai",
-                },
-                severity="INFO",
-            )
+            # Queue the span data for a batched write to Google Cloud Logging
+            self._log_writer.write(span_dict)
         # Export spans to Google Cloud Trace using the parent class method
         return super().export(spans)
 
-    def store_in_gcs(self, content: str, span_id: str) -> str:
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
         """
-        Initiate storing large content in Google Cloud Storage/
+        Wait for pending payload uploads, then write all queued log entries
+        and wait until they are committed.
+
+        :param timeout_millis: Maximum time to wait
+        :return: Whether the flush completed within the timeout
+        """
+        deadline = time.monotonic() + timeout_millis / 1000
+        with self._uploaded_lock:
+            pending = list(self._pending_uploads)
+        _, not_done = futures.wait(pending, timeout=timeout_millis / 1000)
+        if not_done:
+            return False
+
+        return self._log_writer.flush(max(0, deadline - time.monotonic()))
+
+    def shutdown(self) -> None:
+        """Flush queued log entries and uploads and stop the background workers."""
+        self._upload_executor.shutdown(wait=True)
+        self._log_writer.close()
+        super().shutdown()
+
+    def _count(self, name: str, value: float = 1) -> None:
+        with self._stats_lock:
+            self._upload_stats[name] += value
+
+    def store_in_gcs(self, content: str) -> str:
+        """
+        Store large content in Google Cloud Storage under its SHA-256 digest.
+
+        Identical content (e.g. the same system prompt attached to many spans)
+        is uploaded only once per process. The blob name is known before the
+        upload, so the gzip-compressed upload runs on a thread pool and this
+        method returns without waiting for it.
 
         :param content: The content to store
-        :param span_id: The ID of the span
-        :return: The  GCS URI of the stored content
+        :return: The GCS URI of the stored content
         """
-        if not self.storage_client.bucket(self.bucket_name).exists():
+        digest = hashlib.sha256(content.encode()).hexdigest()
+        blob_name = f"spans/sha256/{digest}.json"
+        gcs_uri = f"gs://{self.bucket_name}/{blob_name}"
+        with self._uploaded_lock:
+            if digest in self._uploaded_digests:
+                self._uploaded_digests.move_to_end(digest)
+                self._count("payloads_deduplicated")
+                return gcs_uri
+
+        if not self._bucket_exists():
             logging.warning(
                 f"Bucket {self.bucket_name} not found. "
                 "Unable to store span attributes in GCS."
             )
             return "GCS bucket not found"
 
-        blob_name = f"spans/{span_id}.json"
-        blob = self.bucket.blob(blob_name)
+        with self._uploaded_lock:
+            self._uploaded_digests[digest] = None
+            while len(self._uploaded_digests) > self.max_uploaded_digests:
+                self._uploaded_digests.popitem(last=False)
+            future = self._upload_executor.submit(
+                self._upload_blob, blob_name, digest, content
+            )
+            self._pending_uploads.add(future)
+        future.add_done_callback(self._upload_done)
+        return gcs_uri
+
+    def _upload_done(self, future: futures.Future) -> None:
+        with self._uploaded_lock:
+            self._pending_uploads.discard(future)
+
+    def _bucket_exists(self) -> bool:
+        """
+        Check that the payload bucket exists, caching the answer for
+        ``bucket_check_ttl`` seconds to avoid a metadata request per upload.
+
+        :return: Whether the bucket exists
+        """
+        now = time.monotonic()
+        if self._bucket_checked_at is None or (
+            now - self._bucket_checked_at > self.bucket_check_ttl
+        ):
+            self._bucket_found = self.storage_client.bucket(self.bucket_name).exists()
+            self._bucket_checked_at = now
+        return self._bucket_found
+
+    def _upload_blob(self, blob_name: str, digest: str, content: str) -> None:
+        """
+        Upload gzip-compressed content, recording latency and bytes saved.
 
-        blob.upload_from_string(content, "application/json")
-        return f"gs://{self.bucket_name}/{blob_name}"
+        :param blob_name: Name of the blob to write
+        :param digest: SHA-256 digest of the content
+        :param content: The content to store
+        """
+        data = content.encode()
+        compressed = gzip.compress(data, compresslevel=self.compression_level)
+        start = time.perf_counter()
+        try:
+            blob = self.bucket.blob(blob_name)
+            blob.content_encoding = "gzip"
+            blob.upload_from_string(compressed, "application/json")
+        except Exception:
+            logging.exception(f"Failed to upload span payload {blob_name}")
+            self._count("uploads_failed")
+            # Forget the digest so that the next span carrying it retries.
+            with self._uploaded_lock:
+                self._uploaded_digests.pop(digest, None)
+            return
+        latency = time.perf_counter() - start
+        self._count("payloads_uploaded")
+        self._count("bytes_uploaded", len(compressed))
+        self._count("bytes_saved_by_compression", len(data) - len(compressed))
+        self._count("upload_seconds_total", latency)
+        with self._stats_lock:
+            self._upload_stats["upload_seconds_max"] = max(
+                self._upload_stats["upload_seconds_max"], latency
+            )
 
     def _process_large_attributes(self, span_dict: dict, span_id: str) -> dict:
         """
-        Process large attribute values by storing them in GCS if they exceed the size
-        limit of Google Cloud Logging.
+        Process large attribute values by storing them in GCS if the attributes
+        exceed the size limit of Google Cloud Logging.
+
+        Only the largest values are offloaded, one blob per value, until the
+        remaining attributes fit; smaller values stay inline. Offloaded values
+        are replaced by their GCS URI and listed under ``uri_payload``.
 
         :param span_dict: The span data dictionary
-        :param trace_id: The trace ID
         :param span_id: The span ID
         :return: The updated span dictionary
         """
         attributes = span_dict["attributes"]
-        if len(json.dumps(attributes).encode()) > 255 * 1024:  # 250 KB
-            # Separate large payload from other attributes
-            attributes_payload = dict(attributes.items())
-            attributes_retain = dict(attributes.items())
-
-            # Store large payload in GCS
-            gcs_uri = self.store_in_gcs(json.dumps(attributes_payload), span_id)
-            attributes_retain["uri_payload"] = gcs_uri
-            attributes_retain["url_payload"] = (
-                f"https://storage.mtls.cloud.google.com/"
-                f"{self.bucket_name}/spans/{span_id}.json"
-            )
+        if not attributes:
+            return span_dict
+        sizes = {key: json_size(value) for key, value in attributes.items()}
+        # Same layout as json_size() of the dict, reusing the value sizes.
+        total_size = sum(json_size(key) + 2 + size + 2 for key, size in sizes.items())
+        if total_size <= MAX_ATTRIBUTES_BYTES:
+            return span_dict
 
-            span_dict["attributes"] = attributes_retain
-            logging.info(
-                "Length of payload span above 250 KB, storing attributes in GCS "
-                "to avoid large log entry errors"
+        attributes_retain = dict(attributes.items())
+        uri_payload = {}
+        url_payload = {}
+        for key in sorted(sizes, key=sizes.__getitem__, reverse=True):
+            if total_size <= MAX_ATTRIBUTES_BYTES:
+                break
+            # The value is serialized only now that it is known to be offloaded.
+            gcs_uri = self.store_in_gcs(json.dumps(attributes[key]))
+            attributes_retain[key] = gcs_uri
+            uri_payload[key] = gcs_uri
+            url_payload[key] = gcs_uri.replace(
+                "gs://", "https://storage.mtls.cloud.google.com/", 1
             )
+            total_size -= sizes[key] - json_size(gcs_uri)
+
+        attributes_retain["uri_payload"] = uri_payload
+        attributes_retain["url_payload"] = url_payload
+        span_dict["attributes"] = attributes_retain
+        logging.info(
+            f"Length of payload span {span_id} above 250 KB, storing "
+            f"{len(uri_payload)} attribute value(s) in GCS to avoid large log "
+            "entry errors"
+        )
 
         return span_dict
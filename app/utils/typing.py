@@ -29,3 +29,79 @@ class Feedback(BaseModel):
     log_type: Literal["feedback"] = "feedback"
     service_name: Literal["legal-flow-ai"] = "legal-flow-ai"
     user_id: str = ""
+
+
+class GlossaryTerm(BaseModel):
+    """A term defined by the statute and its plain-language meaning."""
+
+    term: str
+    definition: str
+
+
+class SimplifiedText(BaseModel):
+    """Plain-language rendering of one article."""
+
+    paragraphs: list[str]
+    glossary: list[GlossaryTerm]
+
+
+class WorkflowStep(BaseModel):
+    """One node of a workflow diagram."""
+
+    id: str
+    label: str
+    actor: str = ""
+    kind: Literal["action", "decision"] = "action"
+
+
+class WorkflowEdge(BaseModel):
+    """A transition between two workflow steps."""
+
+    source: str
+    target: str
+    label: str = ""
+
+
+class WorkflowDiagram(BaseModel):
+    """The business workflow described by one article."""
+
+    actors: list[str] = []
+    steps: list[WorkflowStep] = []
+    edges: list[WorkflowEdge] = []
+    mermaid_code: str
+    image_url: str
+
+
+class UnitSimplification(BaseModel):
+    """Plain-language rendering of one 項 or 号 of an article."""
+
+    unit_id: str
+    paragraphs: list[str]
+    glossary: list[GlossaryTerm] = []
+
+
+class UnitSimplifications(BaseModel):
+    """Renderings of the units sent for incremental re-analysis."""
+
+    units: list[UnitSimplification]
+
+
+class UnitWorkflow(BaseModel):
+    """The workflow fragment described by one 項 or 号 of an article."""
+
+    unit_id: str
+    actors: list[str] = []
+    mermaid_code: str = ""
+
+
+class UnitWorkflows(BaseModel):
+    """Workflow fragments of the units sent for incremental re-analysis."""
+
+    units: list[UnitWorkflow]
+
+
+class LegalFlowResult(BaseModel):
+    """Structured result of analyzing one article."""
+
+    simplified: SimplifiedText | None = None
+    diagram: WorkflowDiagram | None = None
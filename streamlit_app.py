@@ -4,70 +4,241 @@ Streamlit Web UI for Legal Flow AI
 法令文書解析のためのWebインターフェース
 """
 
+import asyncio
+import functools
+import os
+import threading
+import time
+from collections.abc import AsyncGenerator, Iterator
+from typing import Any
+
 import streamlit as st
-import json
-from typing import Dict, Any
-import base64
 
 # ADK関連のimport
+from google.adk.agents import BaseAgent
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
+from google.adk.sessions import BaseSessionService
 from google.genai import types
 
 from app.agent import root_agent
+from app.pipeline import (
+    OrchestrationReport,
+    collect_result,
+    count_model_calls,
+    pipeline_agent,
+)
+from app.sub_agents.simplification.agent import simplification_agent
+from app.sub_agents.workflow_diagram.agent import workflow_diagram_agent
+from app.utils.cache import AnalysisCache, agent_fingerprint
+from app.utils.mermaid import MermaidSyntaxError, repair_flowchart
+from app.utils.mermaid_render import render_mermaid_svg
+from app.utils.sessions import BoundedSessionService, SqliteSessionService
+from app.utils.statute import Article, iter_articles
+from app.utils.typing import LegalFlowResult
+
+
+@functools.cache
+def _event_loop() -> asyncio.AbstractEventLoop:
+    """プロセス内の全ブラウザセッションで共有する、常駐スレッドのイベントループ
+
+    実行ごとにループを作り直さないため、Runnerやセッションサービスが持つ
+    非同期のクライアントや接続を実行をまたいで使い回せる。
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(
+        target=loop.run_forever, name="adk-event-loop", daemon=True
+    ).start()
+    return loop
+
+
+async def _next(agen: AsyncGenerator[Any, None]) -> Any:
+    return await agen.__anext__()
+
+
+def _iterate_async(agen: AsyncGenerator[Any, None]) -> Iterator[Any]:
+    """非同期ジェネレーターを共有のイベントループで実行し、同期的に1件ずつ取り出す"""
+    loop = _event_loop()
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(_next(agen), loop).result()
+            except StopAsyncIteration:
+                break
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+
+def build_runner(
+    agent: BaseAgent, session_service: BaseSessionService | None = None
+) -> Runner:
+    """エージェントを実行するRunnerを作成する
+
+    Runnerとセッションサービスはスレッドセーフで、利用者はセッションIDで分離されるため、
+    1つのRunnerを複数のブラウザセッションで共有できる。
+    """
+    # LEGAL_FLOW_SESSION_DB を指定するとセッションをSQLiteに保存し、再起動後も残す
+    # 指定がなければメモリ上に保持し、古いセッションは件数と放置時間で破棄
+    session_db = os.environ.get("LEGAL_FLOW_SESSION_DB")
+    if session_service is None and session_db:
+        session_service = SqliteSessionService(session_db)
+    return Runner(
+        agent=agent,
+        session_service=session_service
+        or BoundedSessionService(
+            max_sessions=256, idle_ttl=1800, max_events_per_session=100
+        ),
+        app_name="legal_flow_ui",
+    )
 
 
 class LegalFlowUI:
-    def __init__(self):
-        self.session_service = InMemorySessionService()
-        self.runner = Runner(
-            agent=root_agent, 
-            session_service=self.session_service, 
-            app_name="legal_flow_ui"
+    def __init__(
+        self,
+        cache: AnalysisCache | None = None,
+        pipeline: bool = False,
+        session_service: BaseSessionService | None = None,
+        runner: Runner | None = None,
+    ):
+        # pipeline=True ではルーティング用のLLM呼び出しなしでサブエージェントを直接実行
+        self.runner = runner or build_runner(
+            pipeline_agent if pipeline else root_agent, session_service
         )
-    
-    def process_legal_text(self, legal_text: str, user_id: str = "default_user") -> str:
-        """法令条文を処理して結果を返す"""
+        self.session_service = self.runner.session_service
+        # 同じ条文の再解析を避けるため、条文とエージェント構成をキーに結果をキャッシュ
+        self.cache = cache or AnalysisCache(
+            version=agent_fingerprint(self.runner.agent)
+        )
+        self.last_report: OrchestrationReport | None = None
+        self.last_result: dict[str, Any] | None = None
+
+    def stream_legal_text(
+        self, legal_text: str, user_id: str = "default_user"
+    ) -> Iterator[tuple[str, str]]:
+        """法令条文を処理し、(エージェント名, テキスト断片) を生成された順に返す
+
+        完了後の結果は last_result に、モデル呼び出し数と処理時間は last_report に格納される。
+        """
+        self.last_report = None
+        self.last_result = None
+        cached = self.cache.get(legal_text, namespace="legal_flow_ui")
+        if cached is not None:
+            self.last_result = cached
+            cached_texts = cached.get("text_by_author") or {"": cached["result"]}
+            for author, text in cached_texts.items():
+                yield author, text
+            return
+
         session = self.session_service.create_session(
-            user_id=user_id, 
-            app_name="legal_flow_ui"
+            user_id=user_id, app_name="legal_flow_ui"
         )
-        
+
         message = types.Content(
-            role="user", 
-            parts=[types.Part.from_text(text=legal_text)]
+            role="user", parts=[types.Part.from_text(text=legal_text)]
         )
-        
-        # エージェントの実行
-        events = list(self.runner.run(
-            new_message=message,
-            user_id=user_id,
-            session_id=session.id
-        ))
-        
-        # 結果の収集
+
+        # エージェントの実行（SSEで部分的なテキストを逐次受け取る）
+        start = time.perf_counter()
+        events = []
+        streaming_authors = set()
+        for event in _iterate_async(
+            self.runner.run_async(
+                new_message=message,
+                user_id=user_id,
+                session_id=session.id,
+                run_config=RunConfig(streaming_mode=StreamingMode.SSE),
+            )
+        ):
+            events.append(event)
+            if not (event.content and event.content.parts):
+                continue
+            text = "".join(part.text for part in event.content.parts if part.text)
+            if not text:
+                continue
+            if event.partial:
+                streaming_authors.add(event.author)
+                yield event.author, text
+            elif event.author in streaming_authors:
+                # 部分テキストの集約イベントは表示済みなので改行のみ
+                streaming_authors.discard(event.author)
+                yield event.author, "\n"
+            else:
+                yield event.author, text + "\n"
+        self.last_report = OrchestrationReport(
+            wall_time_s=time.perf_counter() - start,
+            model_calls=count_model_calls(events),
+        )
+
+        # 結果の収集（部分イベントは集約イベントと重複するため除外）
         result_text = ""
+        text_by_author: dict[str, str] = {}
         for event in events:
+            if event.partial:
+                continue
             if event.content and event.content.parts:
                 for part in event.content.parts:
                     if part.text:
                         result_text += part.text + "\n"
-        
-        return result_text
+                        text_by_author[event.author] = (
+                            text_by_author.get(event.author, "") + part.text + "\n"
+                        )
+
+        # 平易な文章とフロー図はテキストから抜き出さず、スキーマ検証済みの構造化結果を使う
+        self.last_result = {
+            "result": result_text,
+            "structured": collect_result(events).model_dump(),
+            "text_by_author": text_by_author,
+        }
+        if result_text:
+            self.cache.put(legal_text, self.last_result, namespace="legal_flow_ui")
+
+    @property
+    def last_structured(self) -> LegalFlowResult:
+        """直近の解析の構造化結果（平易な文章の段落とフロー図）"""
+        return LegalFlowResult.model_validate(
+            (self.last_result or {}).get("structured") or {}
+        )
+
+    def process_legal_text(self, legal_text: str, user_id: str = "default_user") -> str:
+        """法令条文を処理して結果を返す"""
+        for _ in self.stream_legal_text(legal_text, user_id):
+            pass
+        return (self.last_result or {}).get("result", "")
+
+    def process_legal_articles(
+        self, legal_text: str, user_id: str = "default_user"
+    ) -> Iterator[tuple[Article, str]]:
+        """法令を条ごとに分割し、解析が終わった条から順に結果を返す"""
+        for article in iter_articles(legal_text):
+            yield article, self.process_legal_text(article.text, user_id)
+
+
+@st.cache_resource
+def get_shared_runner(pipeline: bool) -> Runner:
+    """プロセス内の全ブラウザセッションで共有するRunner"""
+    return build_runner(pipeline_agent if pipeline else root_agent)
+
+
+@st.cache_resource
+def get_shared_cache(pipeline: bool) -> AnalysisCache:
+    """プロセス内の全ブラウザセッションで共有する解析結果キャッシュ"""
+    return AnalysisCache(
+        version=agent_fingerprint(pipeline_agent if pipeline else root_agent)
+    )
 
 
-def main():
+def main() -> None:
     st.set_page_config(
         page_title="Legal Flow AI",
         page_icon="⚖️",
         layout="wide",
-        initial_sidebar_state="expanded"
+        initial_sidebar_state="expanded",
     )
-    
+
     # メインタイトル
     st.title("⚖️ Legal Flow AI")
     st.markdown("法令条文を平易な文章と業務フロー図に変換します")
-    
+
     # サイドバー
     with st.sidebar:
         st.header("📋 使い方")
@@ -76,106 +247,198 @@ def main():
         2. 「解析実行」ボタンをクリック
         3. 平易な文章と業務フロー図が生成されます
         """)
-        
+
         st.header("🔧 設定")
         user_id = st.text_input("ユーザーID", value="default_user")
-        
+        pipeline_mode = st.checkbox(
+            "パイプラインモード",
+            value=False,
+            help="ルーティング用のLLM呼び出しを省き、サブエージェントを直接実行します",
+        )
+
         st.header("ℹ️ システム情報")
         st.info("Agent Development Kit (ADK) を使用")
-    
+
     # メインコンテンツ
     col1, col2 = st.columns([1, 1])
-    
+
     with col1:
         st.header("📝 法令条文入力")
         legal_text = st.text_area(
             "法令条文を入力してください",
             height=300,
             placeholder="例: 申請者は総務大臣に申請し、認証業務を行う者が認定する。",
-            help="解析したい法令条文を貼り付けてください"
+            help="解析したい法令条文を貼り付けてください",
         )
-        
+
         # サンプルテキスト
         if st.button("📄 サンプルテキストを使用"):
             sample_text = """第三条　認証業務を行おうとする者は、総務大臣の認定を受けなければならない。
 ２　前項の認定を受けようとする者は、総務省令で定めるところにより、次に掲げる事項を記載した申請書を総務大臣に提出しなければならない。
 ３　総務大臣は、第一項の認定の申請が次の各号のいずれにも適合していると認めるときは、その認定をするものとする。"""
-            st.session_state['legal_text'] = sample_text
+            st.session_state["legal_text"] = sample_text
             st.rerun()
-        
-        if 'legal_text' in st.session_state:
-            legal_text = st.session_state['legal_text']
-        
+
+        if "legal_text" in st.session_state:
+            legal_text = st.session_state["legal_text"]
+
         # 解析ボタン
-        if st.button("🚀 解析実行", type="primary", disabled=not legal_text.strip()):
-            with st.spinner("解析中..."):
-                try:
-                    # Legal Flow UIインスタンスを作成
-                    if 'legal_flow_ui' not in st.session_state:
-                        st.session_state['legal_flow_ui'] = LegalFlowUI()
-                    
-                    # 解析実行
-                    result = st.session_state['legal_flow_ui'].process_legal_text(
-                        legal_text, user_id
-                    )
-                    
-                    st.session_state['analysis_result'] = result
-                    st.success("解析が完了しました！")
-                
-                except Exception as e:
-                    st.error(f"エラーが発生しました: {str(e)}")
-    
+        run_analysis = st.button(
+            "🚀 解析実行", type="primary", disabled=not legal_text.strip()
+        )
+
+        if "analysis_report" in st.session_state:
+            model_calls, wall_time_s = st.session_state["analysis_report"]
+            st.caption(
+                f"モデル呼び出し: {model_calls} 回 / 処理時間: {wall_time_s:.1f} 秒"
+            )
+
     with col2:
         st.header("📊 解析結果")
-        
-        if 'analysis_result' in st.session_state:
-            result = st.session_state['analysis_result']
-            
+
+        if run_analysis:
+            # 解析中はエージェントごとの部分テキストを該当タブに逐次表示
+            tab1, tab2, tab3 = st.tabs(["📋 全体結果", "📝 平易な文章", "🔄 フロー図"])
+            with tab1:
+                full_area = st.empty()
+            with tab2:
+                simplified_area = st.empty()
+            with tab3:
+                diagram_area = st.empty()
+
+            try:
+                # Runnerとキャッシュは全セッションで共有し、解析結果だけをセッションごとに保持
+                legal_flow_ui = LegalFlowUI(
+                    cache=get_shared_cache(pipeline_mode),
+                    runner=get_shared_runner(pipeline_mode),
+                )
+
+                # 解析実行（条ごとに解析し、生成されたテキストから順に表示）
+                full_text = ""
+                simplified_text = ""
+                diagram_text = ""
+                results = []
+                simplified_results = []
+                diagrams = []
+                model_calls = 0
+                wall_time_s = 0.0
+                with st.spinner("解析中..."):
+                    for article in iter_articles(legal_text):
+                        heading = (
+                            f"\n#### {article.number}\n\n" if article.number else ""
+                        )
+                        full_text += heading
+                        diagram_text += heading
+                        streamed_text = simplified_text + heading
+                        for author, chunk in legal_flow_ui.stream_legal_text(
+                            article.text, user_id
+                        ):
+                            full_text += chunk
+                            full_area.markdown(full_text)
+                            if author == simplification_agent.name:
+                                streamed_text += chunk
+                                simplified_area.markdown(streamed_text)
+                            elif author == workflow_diagram_agent.name:
+                                diagram_text += chunk
+                                diagram_area.markdown(diagram_text)
+
+                        # 条の解析が終わったら、表示を構造化結果の段落に置き換える
+                        structured = legal_flow_ui.last_structured
+                        paragraphs = (
+                            structured.simplified.paragraphs
+                            if structured.simplified
+                            else []
+                        )
+                        simplified_text += heading + "\n\n".join(paragraphs) + "\n"
+                        simplified_area.markdown(simplified_text)
+
+                        results.append(
+                            (legal_flow_ui.last_result or {}).get("result", "")
+                        )
+                        simplified_results.append(heading + "\n\n".join(paragraphs))
+                        if structured.diagram:
+                            diagrams.append(
+                                (article.number, structured.diagram.model_dump())
+                            )
+                        report = legal_flow_ui.last_report
+                        if report is not None:
+                            model_calls += report.total_model_calls
+                            wall_time_s += report.wall_time_s
+
+                st.session_state["analysis_result"] = "\n".join(results)
+                st.session_state["simplified_result"] = "\n".join(simplified_results)
+                st.session_state["diagrams"] = diagrams
+                st.session_state["analysis_report"] = (model_calls, wall_time_s)
+                st.rerun()
+
+            except Exception as e:
+                st.error(f"エラーが発生しました: {str(e)}")
+
+        elif "analysis_result" in st.session_state:
+            result = st.session_state["analysis_result"]
+
             # タブで結果を分割表示
             tab1, tab2, tab3 = st.tabs(["📋 全体結果", "📝 平易な文章", "🔄 フロー図"])
-            
+
             with tab1:
                 st.markdown("### 完全な解析結果")
                 st.text_area("", value=result, height=400, disabled=True)
-                
+
                 # ダウンロードボタン
                 st.download_button(
                     label="📥 結果をダウンロード",
                     data=result,
                     file_name="legal_analysis_result.txt",
-                    mime="text/plain"
+                    mime="text/plain",
                 )
-            
+
             with tab2:
                 st.markdown("### 平易な文章")
-                # 平易な文章部分を抽出して表示（実装により調整）
-                simplified_text = result  # TODO: 結果から平易な文章部分を抽出
+                # simplification_agent が生成したテキストのみを表示
+                simplified_text = st.session_state.get("simplified_result") or result
                 st.markdown(simplified_text)
-            
+
             with tab3:
                 st.markdown("### 業務フロー図")
-                # Mermaid図の表示
-                if "```mermaid" in result:
-                    # Mermaid記法の抽出
-                    mermaid_start = result.find("```mermaid") + 10
-                    mermaid_end = result.find("```", mermaid_start)
-                    if mermaid_end > mermaid_start:
-                        mermaid_code = result[mermaid_start:mermaid_end].strip()
-                        st.code(mermaid_code, language="mermaid")
-                        
-                        # Mermaid Live Editorへのリンク
-                        encoded = base64.b64encode(mermaid_code.encode('utf-8')).decode('utf-8')
-                        mermaid_url = f"https://mermaid.live/edit#{encoded}"
-                        st.markdown(f"[🔗 Mermaidエディターで開く]({mermaid_url})")
-                else:
+                # 条ごとの構造化結果からフロー図を表示（テキストの再解析はしない）
+                diagrams = st.session_state.get("diagrams") or []
+                for index, (number, diagram) in enumerate(diagrams):
+                    if number:
+                        st.markdown(f"#### {number}")
+                    if diagram["actors"]:
+                        st.caption("関係者: " + "、".join(diagram["actors"]))
+                    mermaid_code = diagram["mermaid_code"]
+                    # 外部サイトを使わずにその場でSVGに描画（同じ図はキャッシュから返す）
+                    try:
+                        # よくある記法の誤りはモデルに聞き直さずその場で修復する
+                        mermaid_code = repair_flowchart(mermaid_code).code
+                        svg = render_mermaid_svg(mermaid_code)
+                    except MermaidSyntaxError as e:
+                        st.warning(f"フロー図を描画できませんでした: {e}")
+                    else:
+                        st.image(svg)
+                        st.download_button(
+                            label="📥 フロー図をダウンロード (SVG)",
+                            data=svg,
+                            file_name=f"legal_flow_diagram_{index + 1}.svg",
+                            mime="image/svg+xml",
+                            key=f"diagram_download_{index}",
+                        )
+                    st.code(mermaid_code, language="mermaid")
+
+                    # Mermaid Live Editorへのリンク
+                    st.markdown(f"[🔗 Mermaidエディターで開く]({diagram['image_url']})")
+                if not diagrams:
                     st.info("フロー図が見つかりませんでした")
         else:
             st.info("法令条文を入力して「解析実行」ボタンをクリックしてください")
-    
+
     # フッター
     st.markdown("---")
-    st.markdown("**Legal Flow AI** - Agent Development Kit (ADK) による法令文書解析システム")
+    st.markdown(
+        "**Legal Flow AI** - Agent Development Kit (ADK) による法令文書解析システム"
+    )
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
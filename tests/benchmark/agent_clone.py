@@ -0,0 +1,106 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Micro-benchmark of AgentEngineApp.clone for growing agent trees.
+
+Compares the previous clone, which deep-copied the whole agent tree, with the
+current one that shares it, on trees with the root agent's prompt and tools
+and an increasing number of sub-agents using the simplification prompt.
+
+    uv run python -m tests.benchmark.agent_clone
+"""
+
+import argparse
+import copy
+import functools
+import time
+import tracemalloc
+from collections.abc import Callable
+
+from google.adk.agents import Agent
+
+from app.agent import get_weather
+from app.agent_engine_app import AgentEngineApp
+from app.prompt import ROOT_PROMPT
+from app.sub_agents.simplification.prompt import SIMPLIFICATION_AGENT_PROMPT
+
+
+def make_agent(sub_agents: int) -> Agent:
+    """Builds a root agent with ``sub_agents`` LLM sub-agents."""
+    return Agent(
+        name="legal_flow_agent",
+        model="gemini-2.0-flash",
+        instruction=ROOT_PROMPT,
+        tools=[get_weather],
+        sub_agents=[
+            Agent(
+                name=f"sub_agent_{i}",
+                model="gemini-2.0-flash",
+                instruction=SIMPLIFICATION_AGENT_PROMPT,
+                tools=[get_weather],
+            )
+            for i in range(sub_agents)
+        ],
+    )
+
+
+def legacy_clone(app: AgentEngineApp) -> AgentEngineApp:
+    """The clone used before the agent tree was shared."""
+    return AgentEngineApp(
+        agent=copy.deepcopy(app._tmpl_attrs["agent"]),
+        env_vars=app._tmpl_attrs["env_vars"],
+    )
+
+
+def measure(clone: Callable[[], AgentEngineApp], repeat: int) -> tuple[float, float]:
+    """Returns (best seconds per clone, KiB allocated by one clone)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        clone()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    cloned = clone()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del cloned
+    return best, allocated / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sub-agents", type=int, nargs="+", default=[2, 8, 32, 128])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(
+        f"{'sub-agents':>10}{'deepcopy ms':>14}{'shared ms':>12}"
+        f"{'deepcopy KiB':>15}{'shared KiB':>13}"
+    )
+    for sub_agents in args.sub_agents:
+        app = AgentEngineApp(agent=make_agent(sub_agents))
+        before_s, before_kib = measure(
+            functools.partial(legacy_clone, app), args.repeat
+        )
+        after_s, after_kib = measure(app.clone, args.repeat)
+        print(
+            f"{sub_agents:>10}{before_s * 1000:>14.2f}{after_s * 1000:>12.3f}"
+            f"{before_kib:>15.1f}{after_kib:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Cold-start profile of the Agent Engine application.
+
+Imports ``app.agent_engine_app`` in a fresh interpreter with
+``python -X importtime`` and summarizes the slowest top-level packages, then
+times ``AgentEngineApp.set_up`` and counts the credential lookups and Google
+Cloud clients it triggers (all of which should now happen on first use).
+
+    uv run python -m tests.benchmark.cold_start
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)")
+
+
+def profile_imports(module: str) -> tuple[float, dict[str, float]]:
+    """
+    Import ``module`` in a subprocess with ``-X importtime``.
+
+    :return: Total import seconds and self seconds per top-level package
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total_us = 0
+    by_package: dict[str, float] = defaultdict(float)
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        by_package[".".join(name.split(".")[:2])] += int(self_us) / 1e6
+        # Top-level imports are indented by a single space.
+        if len(indent) == 1:
+            total_us += int(cumulative_us)
+    return total_us / 1e6, by_package
+
+
+def profile_set_up() -> dict[str, float]:
+    """Times ``AgentEngineApp.set_up`` and counts eager credential lookups."""
+    import google.auth
+
+    calls = {"credential_lookups": 0}
+    default = google.auth.default
+
+    def counting_default(*args, **kwargs):
+        calls["credential_lookups"] += 1
+        return default(*args, **kwargs)
+
+    google.auth.default = counting_default
+    try:
+        from app.agent import root_agent
+        from app.agent_engine_app import AgentEngineApp
+
+        app = AgentEngineApp(agent=root_agent)
+        start = time.perf_counter()
+        app.set_up()
+        elapsed = time.perf_counter() - start
+    finally:
+        google.auth.default = default
+    return {"set_up_s": elapsed, **calls}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="app.agent_engine_app")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    total, by_package = profile_imports(args.module)
+    print(f"import {args.module}: {total:.3f}s")
+    print(f"{'package':<40}{'self s':>10}")
+    for package, seconds in sorted(
+        by_package.items(), key=lambda item: item[1], reverse=True
+    )[: args.top]:
+        print(f"{package:<40}{seconds:>10.3f}")
+
+    set_up = profile_set_up()
+    print(f"\nset_up: {set_up['set_up_s']:.3f}s")
+    print(f"credential lookups during set_up: {set_up['credential_lookups']}")
+
+
+if __name__ == "__main__":
+    main()
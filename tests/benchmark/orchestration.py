@@ -0,0 +1,178 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+End-to-end benchmark of agent orchestration against a scripted fake model.
+
+Runs the real root agent and pipeline, with Gemini resolved to ``FakeLlm``
+replaying transfers, tool calls and answers, through a bare Runner,
+LegalFlowUI and AgentEngineApp.stream_query. Reports the time spent outside
+model calls, events and memory per request, and throughput under concurrency.
+
+    uv run python -m tests.benchmark.orchestration
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+from collections.abc import Callable
+from concurrent import futures
+
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from app.agent import root_agent
+from app.agent_engine_app import AgentEngineApp
+from app.pipeline import pipeline_agent
+from app.utils.cache import AnalysisCache
+from app.utils.fake_llm import use_fake_llm
+from streamlit_app import LegalFlowUI
+
+ARTICLE = "第三条　認証業務を行おうとする者は、総務大臣の認定を受けなければならない。"
+
+# Runs one analysis of a distinct article and returns its event count.
+Target = Callable[[int], int]
+
+
+def runner_target(agent) -> Target:
+    runner = InMemoryRunner(agent, app_name="benchmark")
+
+    async def run(index: int) -> int:
+        session = runner.session_service.create_session(
+            app_name="benchmark", user_id=f"user-{index}"
+        )
+        message = types.Content(
+            role="user", parts=[types.Part.from_text(text=f"{ARTICLE} ({index})")]
+        )
+        return len(
+            [
+                event
+                async for event in runner.run_async(
+                    user_id=session.user_id, session_id=session.id, new_message=message
+                )
+            ]
+        )
+
+    return lambda index: asyncio.run(run(index))
+
+
+def ui_target() -> Target:
+    ui = LegalFlowUI(cache=AnalysisCache(cache_dir=None))
+
+    def run(index: int) -> int:
+        # Each Streamlit script run builds its own UI around the shared runner.
+        view = LegalFlowUI(cache=ui.cache, runner=ui.runner)
+        return sum(
+            1 for _ in view.stream_legal_text(f"{ARTICLE} ({index})", f"user-{index}")
+        )
+
+    return run
+
+
+def stream_query_target() -> Target:
+    app = AgentEngineApp(agent=root_agent)
+    # Keep the stub model's answers out of the on-disk cache of real runs.
+    app.set_up(cache=AnalysisCache(cache_dir=None))
+
+    def run(index: int) -> int:
+        return sum(
+            1
+            for _ in app.stream_query(
+                message=f"{ARTICLE} ({index})", user_id=f"user-{index}"
+            )
+        )
+
+    return run
+
+
+def measure(
+    target: Target, requests: int, levels: list[int], model_calls: int, latency: float
+) -> dict[str, float]:
+    """
+    Measure one target.
+
+    :param target: Runs one analysis and returns its event count
+    :param requests: Requests sent per measurement
+    :param levels: Concurrent request counts to measure throughput at
+    :param model_calls: Sequential model calls per request
+    :param latency: Seconds each model call waits
+    :return: Time per request outside model calls, events and retained memory
+        per request, and requests per second at each level
+    """
+    target(-1)  # Warm up imports and lazily created clients.
+    offset = 0
+
+    def run_all(concurrency: int) -> list[int]:
+        nonlocal offset
+        indexes = range(offset, offset + requests)
+        offset += requests
+        with futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(target, indexes))
+
+    start = time.perf_counter()
+    events = run_all(1)
+    per_request_s = (time.perf_counter() - start) / requests
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    run_all(1)
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    result = {
+        "overhead_ms": (per_request_s - model_calls * latency) * 1000,
+        "events": sum(events) / requests,
+        "kib/session": retained / requests / 1024,
+    }
+    for concurrency in levels:
+        start = time.perf_counter()
+        run_all(concurrency)
+        result[f"rps@{concurrency}"] = requests / (time.perf_counter() - start)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    # Model calls each request waits for in turn: three routing calls, one
+    # simplification call and two diagram calls when routed; the pipeline runs
+    # the single simplification call alongside the two diagram calls.
+    targets: dict[str, tuple[Callable[[], Target], int]] = {
+        "runner (routed)": (lambda: runner_target(root_agent), 6),
+        "runner (pipeline)": (lambda: runner_target(pipeline_agent), 2),
+        "LegalFlowUI": (ui_target, 6),
+        "stream_query": (stream_query_target, 6),
+    }
+    columns = ["overhead_ms", "events", "kib/session"] + [
+        f"rps@{level}" for level in args.levels
+    ]
+    print(f"{'target':<20}" + "".join(f"{column:>13}" for column in columns))
+    with use_fake_llm(latency=args.latency):
+        for name, (build, model_calls) in targets.items():
+            result = measure(
+                build(), args.requests, args.levels, model_calls, args.latency
+            )
+            print(
+                f"{name:<20}"
+                + "".join(f"{result[column]:>13.1f}" for column in columns)
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Micro-benchmark of session create/append/get throughput.
+
+Compares InMemorySessionService with SqliteSessionService, both with its
+per-response batching and with a write per event, on turns shaped like a
+routed analysis (user message, transfer call and response, sub-agent answer).
+
+    uv run python -m tests.benchmark.session_store
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from collections.abc import Callable
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, InMemorySessionService
+from google.genai import types
+
+from app.utils.sessions import SqliteSessionService
+
+APP_NAME = "benchmark"
+ARTICLE = "第三条　認証業務を行おうとする者は、総務大臣の認定を受けなければならない。"
+
+
+def make_turn() -> list[Event]:
+    """Events appended for one analysis routed to a sub-agent."""
+
+    def text_event(author: str, text: str) -> Event:
+        role = "user" if author == "user" else "model"
+        return Event(
+            author=author,
+            content=types.Content(role=role, parts=[types.Part.from_text(text=text)]),
+        )
+
+    call = types.Part.from_function_call(
+        name="transfer_to_agent", args={"agent_name": "simplification_agent"}
+    )
+    response = types.Part.from_function_response(
+        name="transfer_to_agent", response={"result": None}
+    )
+    return [
+        text_event("user", ARTICLE),
+        Event(
+            author="legal_flow_agent",
+            content=types.Content(role="model", parts=[call]),
+        ),
+        Event(
+            author="legal_flow_agent",
+            content=types.Content(role="user", parts=[response]),
+        ),
+        text_event("simplification_agent", ARTICLE * 4),
+    ]
+
+
+def run(service: BaseSessionService, sessions: int, turns: int) -> dict[str, float]:
+    """Returns operations per second for each phase."""
+    session_ids = []
+    start = time.perf_counter()
+    for i in range(sessions):
+        session = service.create_session(app_name=APP_NAME, user_id=f"user-{i % 10}")
+        session_ids.append((session.user_id, session.id))
+    create_s = time.perf_counter() - start
+
+    appended = 0
+    start = time.perf_counter()
+    for user_id, session_id in session_ids:
+        session = service.get_session(
+            app_name=APP_NAME, user_id=user_id, session_id=session_id
+        )
+        for _ in range(turns):
+            for event in make_turn():
+                service.append_event(session, event)
+                appended += 1
+    append_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for user_id, session_id in session_ids:
+        service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+    get_s = time.perf_counter() - start
+
+    return {
+        "create/s": sessions / create_s,
+        "append/s": appended / append_s,
+        "get/s": sessions / get_s,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        services: dict[str, Callable[[], BaseSessionService]] = {
+            "in-memory": InMemorySessionService,
+            "sqlite (batched)": lambda: SqliteSessionService(
+                os.path.join(tmp, "batched.db")
+            ),
+            "sqlite (per event)": lambda: SqliteSessionService(
+                os.path.join(tmp, "per_event.db"), max_pending_events=1
+            ),
+        }
+        print(f"{'service':<20}{'create/s':>12}{'append/s':>12}{'get/s':>12}")
+        for name, build in services.items():
+            service = build()
+            result = run(service, args.sessions, args.turns)
+            if isinstance(service, SqliteSessionService):
+                service.close()
+            print(
+                f"{name:<20}{result['create/s']:>12.0f}"
+                f"{result['append/s']:>12.0f}{result['get/s']:>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# ruff: noqa: RUF001
+
+"""
+Micro-benchmark of span conversion in CloudTraceLoggingSpanExporter.
+
+Compares the previous ``json.loads(span.to_json())`` + ``json.dumps(attributes)``
+path with ``span_to_dict`` + the incremental size estimate, on synthetic spans
+shaped like the ones ADK emits for LLM calls (system prompt and conversation
+history in the request attribute, roughly one in ten spans above the Cloud
+Logging limit).
+
+    uv run python -m tests.benchmark.span_export
+"""
+
+import argparse
+import json
+import time
+import warnings
+from collections.abc import Callable
+from typing import TYPE_CHECKING, cast
+
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.trace import SpanContext
+
+from app.sub_agents.simplification.prompt import SIMPLIFICATION_AGENT_PROMPT
+from app.utils.tracing import (
+    MAX_ATTRIBUTES_BYTES,
+    CloudTraceLoggingSpanExporter,
+    span_to_dict,
+)
+
+if TYPE_CHECKING:
+    from google.cloud import logging as google_cloud_logging
+
+ARTICLE = (
+    "第三条　認証業務を行おうとする者は、総務大臣の認定を受けなければならない。\n"
+    "２　前項の認定を受けようとする者は、総務省令で定めるところにより、"
+    "次に掲げる事項を記載した申請書を総務大臣に提出しなければならない。\n"
+)
+
+
+class _NullBlob:
+    def upload_from_string(self, data: str, content_type: str | None = None) -> None:
+        pass
+
+
+class _NullBucket:
+    def exists(self) -> bool:
+        return True
+
+    def blob(self, name: str) -> _NullBlob:
+        return _NullBlob()
+
+
+class _NullStorageClient:
+    def bucket(self, name: str) -> _NullBucket:
+        return _NullBucket()
+
+
+class _NullLoggingClient:
+    def logger(self, name: str) -> object:
+        return object()
+
+
+def make_spans(count: int, history_turns: int) -> list[ReadableSpan]:
+    """Builds spans with ADK-like LLM request/response attributes."""
+    spans = []
+    for i in range(count):
+        turns = history_turns * (40 if i % 10 == 0 else 1)
+        llm_request = {
+            "model": "gemini-2.0-flash",
+            "config": {"system_instruction": SIMPLIFICATION_AGENT_PROMPT},
+            "contents": [
+                {"role": "user", "parts": [{"text": ARTICLE}]} for _ in range(turns)
+            ],
+        }
+        spans.append(
+            ReadableSpan(
+                name="call_llm",
+                context=SpanContext(trace_id=1, span_id=i + 1, is_remote=False),
+                attributes={
+                    "gen_ai.system": "gcp.vertex.agent",
+                    "gen_ai.request.model": "gemini-2.0-flash",
+                    "gcp.vertex.agent.invocation_id": f"e-{i}",
+                    "gcp.vertex.agent.llm_request": json.dumps(llm_request),
+                    "gcp.vertex.agent.llm_response": json.dumps(
+                        {"content": {"parts": [{"text": ARTICLE * 4}]}}
+                    ),
+                },
+            )
+        )
+    return spans
+
+
+def legacy_convert(span: ReadableSpan) -> dict:
+    """The conversion and size check used before span_to_dict."""
+    span_dict = json.loads(span.to_json())
+    attributes = span_dict["attributes"]
+    if len(json.dumps(attributes).encode()) > MAX_ATTRIBUTES_BYTES:
+        json.dumps(attributes)
+    return span_dict
+
+
+def run(
+    spans: list[ReadableSpan], convert: Callable[[ReadableSpan], dict], repeat: int
+) -> float:
+    """Returns spans converted per second, best of ``repeat`` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for span in spans:
+            convert(span)
+        best = min(best, time.perf_counter() - start)
+    return len(spans) / best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--spans", type=int, default=500)
+    parser.add_argument("--history-turns", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        exporter = CloudTraceLoggingSpanExporter(
+            project_id="benchmark",
+            client=object(),
+            logging_client=cast("google_cloud_logging.Client", _NullLoggingClient()),
+            storage_client=_NullStorageClient(),
+        )
+
+    def current_convert(span: ReadableSpan) -> dict:
+        return exporter._process_large_attributes(span_to_dict(span), "0")
+
+    spans = make_spans(args.spans, args.history_turns)
+    before = run(spans, legacy_convert, args.repeat)
+    after = run(spans, current_convert, args.repeat)
+    exporter.shutdown()
+
+    print(f"{'path':<34}{'spans/s':>12}")
+    print(f"{'to_json + loads + dumps (before)':<34}{before:>12.0f}")
+    print(f"{'span_to_dict + json_size (after)':<34}{after:>12.0f}")
+    print(f"speedup: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -68,6 +68,10 @@ def test_agent_feedback(agent_app: AgentEngineApp) -> None:
 
     # Should not raise any exceptions
     agent_app.register_feedback(feedback_data)
+    assert agent_app.flush_feedback()
+    stats = agent_app.get_feedback_stats()
+    assert stats["entries_sent"] >= 1
+    assert stats["queue_depth"] == 0
 
     # Test invalid feedback
     with pytest.raises(ValueError):
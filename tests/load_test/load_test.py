@@ -16,8 +16,10 @@ import json
 import logging
 import os
 import time
+import uuid
 
-from locust import HttpUser, between, task
+from locust import HttpUser, LoadTestShape, between, task
+from statutes import pick_payload
 
 # Configure logging
 logging.basicConfig(
@@ -25,42 +27,73 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Initialize Vertex AI and load agent config
-with open("deployment_metadata.json") as f:
-    remote_agent_engine_id = json.load(f)["remote_agent_engine_id"]
+# LOAD_TEST_HOST targets a local server (python -m app.local_server) instead
+# of the deployed Agent Engine.
+local_host = os.environ.get("LOAD_TEST_HOST")
+if local_host:
+    base_url = local_host
+    url_path = (
+        "/v1beta1/projects/local/locations/local/reasoningEngines/local:streamQuery"
+    )
+else:
+    # Initialize Vertex AI and load agent config
+    with open("deployment_metadata.json") as f:
+        remote_agent_engine_id = json.load(f)["remote_agent_engine_id"]
 
-parts = remote_agent_engine_id.split("/")
-project_id = parts[1]
-location = parts[3]
-engine_id = parts[5]
+    parts = remote_agent_engine_id.split("/")
+    project_id = parts[1]
+    location = parts[3]
+    engine_id = parts[5]
 
-# Convert remote agent engine ID to streaming URL.
-base_url = f"https://{location}-aiplatform.googleapis.com"
-url_path = f"/v1beta1/projects/{project_id}/locations/{location}/reasoningEngines/{engine_id}:streamQuery"
+    # Convert remote agent engine ID to streaming URL.
+    base_url = f"https://{location}-aiplatform.googleapis.com"
+    url_path = f"/v1beta1/projects/{project_id}/locations/{location}/reasoningEngines/{engine_id}:streamQuery"
+    logger.info("Using remote agent engine ID: %s", remote_agent_engine_id)
 
-logger.info("Using remote agent engine ID: %s", remote_agent_engine_id)
 logger.info("Using base URL: %s", base_url)
 logger.info("Using URL path: %s", url_path)
 
+# Repeated payloads are answered from the analysis cache; by default every
+# request is made unique so that the model path is measured.
+REPEAT_PAYLOADS = os.environ.get("LOAD_TEST_REPEAT_PAYLOADS") == "1"
+# LOAD_TEST_PROFILE selects a ramp shape below; unset, -u/-r/-t apply.
+PROFILE = os.environ.get("LOAD_TEST_PROFILE")
+
 
 class ChatStreamUser(HttpUser):
-    """Simulates a user interacting with the chat stream API."""
+    """Simulates a user submitting statutes to the chat stream API."""
 
     wait_time = between(1, 3)  # Wait 1-3 seconds between tasks
     host = base_url  # Set the base host URL for Locust
 
+    def record(
+        self, name: str, response_time_s: float, length: int, response, error=None
+    ) -> None:
+        self.environment.events.request.fire(
+            request_type="POST",
+            name=name,
+            response_time=response_time_s * 1000,  # Convert to milliseconds
+            response_length=length,
+            response=response,
+            context={},
+            exception=error,
+        )
+
     @task
     def chat_stream(self) -> None:
-        """Simulates a chat stream interaction."""
+        """Streams the analysis of a statute and times each event.
+
+        Besides the total time, records the time to the first event and, per
+        event, the gap since the previous one with the event's size in bytes.
+        """
         headers = {"Content-Type": "application/json"}
-        headers["Authorization"] = f"Bearer {os.environ['_AUTH_TOKEN']}"
+        if not local_host:
+            headers["Authorization"] = f"Bearer {os.environ['_AUTH_TOKEN']}"
 
-        data = {
-            "input": {
-                "message": "What's the weather in San Francisco?",
-                "user_id": "test",
-            }
-        }
+        size, message = pick_payload()
+        if not REPEAT_PAYLOADS:
+            message = f"{message}\n（照会番号 {uuid.uuid4().hex[:8]}）"  # noqa: RUF001
+        data = {"input": {"message": message, "user_id": f"test-{uuid.uuid4()}"}}
 
         start_time = time.time()
         with self.client.post(
@@ -68,25 +101,81 @@ class ChatStreamUser(HttpUser):
             headers=headers,
             json=data,
             catch_response=True,
-            name="/stream_messages first message",
+            name=f"/stream_messages first message [{size}]",
             stream=True,
             params={"alt": "sse"},
         ) as response:
-            if response.status_code == 200:
-                events = []
-                for line in response.iter_lines():
-                    if line:
-                        event = json.loads(line)
-                        events.append(event)
-                end_time = time.time()
-                total_time = end_time - start_time
-                self.environment.events.request.fire(
-                    request_type="POST",
-                    name="/stream_messages end",
-                    response_time=total_time * 1000,  # Convert to milliseconds
-                    response_length=len(json.dumps(events)),
-                    response=response,
-                    context={},
-                )
-            else:
+            if response.status_code != 200:
                 response.failure(f"Unexpected status code: {response.status_code}")
+                return
+            events = 0
+            total_bytes = 0
+            previous = start_time
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                now = time.time()
+                event = json.loads(line)
+                if events == 0:
+                    self.record(
+                        f"/stream_messages first event [{size}]",
+                        now - start_time,
+                        len(line),
+                        response,
+                    )
+                else:
+                    self.record(
+                        f"/stream_messages event gap [{size}]",
+                        now - previous,
+                        len(line),
+                        response,
+                    )
+                if "error" in event:
+                    response.failure(f"Error event: {event['error']}")
+                    return
+                previous = now
+                events += 1
+                total_bytes += len(line)
+            self.record(
+                f"/stream_messages end [{size}]",
+                time.time() - start_time,
+                total_bytes,
+                response,
+                None if events else Exception("No events received"),
+            )
+
+
+class StepLoadShape(LoadTestShape):
+    """Adds LOAD_TEST_STEP_USERS users every LOAD_TEST_STEP_SECONDS seconds."""
+
+    abstract = PROFILE != "step"
+    step_users = int(os.environ.get("LOAD_TEST_STEP_USERS", "5"))
+    step_seconds = float(os.environ.get("LOAD_TEST_STEP_SECONDS", "30"))
+    steps = int(os.environ.get("LOAD_TEST_STEPS", "4"))
+
+    def tick(self) -> tuple[int, float] | None:
+        step = int(self.get_run_time() // self.step_seconds)
+        if step >= self.steps:
+            return None
+        return (step + 1) * self.step_users, self.step_users
+
+
+class SpikeLoadShape(LoadTestShape):
+    """Holds a baseline, jumps to a spike at once, then drops back."""
+
+    abstract = PROFILE != "spike"
+    base_users = int(os.environ.get("LOAD_TEST_BASE_USERS", "2"))
+    spike_users = int(os.environ.get("LOAD_TEST_SPIKE_USERS", "20"))
+    # Seconds of baseline before and after the spike, and of the spike itself.
+    base_seconds = float(os.environ.get("LOAD_TEST_BASE_SECONDS", "30"))
+    spike_seconds = float(os.environ.get("LOAD_TEST_SPIKE_SECONDS", "20"))
+
+    def tick(self) -> tuple[int, float] | None:
+        run_time = self.get_run_time()
+        if run_time < self.base_seconds:
+            return self.base_users, self.base_users
+        if run_time < self.base_seconds + self.spike_seconds:
+            return self.spike_users, self.spike_users
+        if run_time < 2 * self.base_seconds + self.spike_seconds:
+            return self.base_users, self.spike_users
+        return None
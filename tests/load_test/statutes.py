@@ -0,0 +1,71 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# ruff: noqa: RUF001
+
+"""Statute payloads of varying size for the load tests."""
+
+import random
+
+SHORT = "第三条　認証業務を行おうとする者は、総務大臣の認定を受けなければならない。"
+
+MEDIUM = """（認定の申請）
+第五条　前条の認定を受けようとする者は、総務省令で定めるところにより、次に掲げる事項を記載した申請書その他総務省令で定める書類を総務大臣に提出しなければならない。
+一　氏名又は名称及び住所並びに法人にあっては、その代表者の氏名
+二　申請に係る業務の用に供する設備の概要
+三　申請に係る業務の実施の方法
+２　前項の申請をする者は、実費を勘案して政令で定める額の手数料を納付しなければならない。
+３　総務大臣は、第一項の申請があったときは、遅滞なく、その申請に係る業務の実施の方法が第六条第一項各号に適合するかどうかについて調査を行うものとする。"""
+
+LONG = "\n".join(
+    [
+        """第一章　総則
+（目的）
+第一条　この法律は、電子署名に関し、電磁的記録の真正な成立の推定、特定認証業務に関する認定の制度その他必要な事項を定めることにより、電子署名の円滑な利用の確保による情報の電磁的方式による流通及び情報処理の促進を図り、もって国民生活の向上及び国民経済の健全な発展に寄与することを目的とする。""",
+        """（定義）
+第二条　この法律において「電子署名」とは、電磁的記録に記録することができる情報について行われる措置であって、次の要件のいずれにも該当するものをいう。
+一　当該情報が当該措置を行った者の作成に係るものであることを示すためのものであること。
+二　当該情報について改変が行われていないかどうかを確認することができるものであること。
+２　この法律において「認証業務」とは、自らが行う電子署名についてその業務を利用する者その他の者の求めに応じ、当該利用者が電子署名を行ったものであることを確認するために用いられる事項が当該利用者に係るものであることを証明する業務をいう。
+３　この法律において「特定認証業務」とは、電子署名のうち、その方式に応じて本人だけが行うことができるものとして主務省令で定める基準に適合するものについて行われる認証業務をいう。""",
+        SHORT,
+        """（認定）
+第四条　特定認証業務を行おうとする者は、主務大臣の認定を受けることができる。
+２　前項の認定を受けようとする者は、主務省令で定めるところにより、次の事項を記載した申請書その他主務省令で定める書類を主務大臣に提出しなければならない。
+一　氏名又は名称及び住所並びに法人にあっては、その代表者の氏名
+二　申請に係る業務の用に供する設備の概要
+三　申請に係る業務の実施の方法
+３　前項の申請をする者は、実費を勘案して政令で定める額の手数料を納付しなければならない。""",
+        MEDIUM,
+        """（認定の基準）
+第六条　主務大臣は、第四条第一項の認定の申請が次の各号のいずれにも適合していると認めるときでなければ、その認定をしてはならない。
+一　申請に係る業務の用に供する設備が主務省令で定める基準に適合するものであること。
+二　申請に係る業務における利用者の真偽の確認が主務省令で定める方法により行われるものであること。
+三　前号に掲げるもののほか、申請に係る業務が主務省令で定める基準に適合する方法により行われるものであること。
+２　主務大臣は、前項の規定により認定をするときは、あらかじめ、同項第一号及び第二号の基準への適合性について調査をしなければならない。""",
+        """（更新）
+第七条　第四条第一項の認定は、一年を下らない政令で定める期間ごとにその更新を受けなければ、その期間の経過によって、その効力を失う。
+２　前三条の規定は、前項の認定の更新について準用する。""",
+    ]
+)
+
+# Mostly single articles, with occasional whole chapters.
+PAYLOADS = {"short": SHORT, "medium": MEDIUM, "long": LONG}
+WEIGHTS = {"short": 6, "medium": 3, "long": 1}
+
+
+def pick_payload() -> tuple[str, str]:
+    """Returns a ``(size, text)`` pair drawn with ``WEIGHTS``."""
+    (size,) = random.choices(list(WEIGHTS), weights=list(WEIGHTS.values()))
+    return size, PAYLOADS[size]
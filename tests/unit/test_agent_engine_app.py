@@ -0,0 +1,79 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests for AgentEngineApp that do not need Google Cloud.
+"""
+
+import google.auth
+import pytest
+from google.auth.credentials import AnonymousCredentials
+from vertexai.preview.reasoning_engines import AdkApp
+
+from app import agent_engine_app
+from app.agent import root_agent
+from app.agent_engine_app import AgentEngineApp
+from app.utils.cache import AnalysisCache
+
+
+@pytest.fixture(autouse=True)
+def offline_credentials(monkeypatch):
+    """AdkApp resolves the project from ADC; answer without a metadata server."""
+    monkeypatch.setattr(
+        google.auth, "default", lambda *args, **kwargs: (AnonymousCredentials(), "test")
+    )
+
+
+def test_clone_shares_agent_definition():
+    """Clones reuse the agent tree instead of deep-copying it."""
+    app = AgentEngineApp(agent=root_agent, env_vars={"NUM_WORKERS": "2"})
+    clone = app.clone()
+
+    assert clone._tmpl_attrs["agent"] is root_agent
+    assert [agent.parent_agent for agent in root_agent.sub_agents] == [
+        root_agent,
+        root_agent,
+    ]
+
+
+def test_clones_do_not_share_mutable_state():
+    """Per-instance state set on one clone is invisible to the others."""
+    app = AgentEngineApp(agent=root_agent, env_vars={"NUM_WORKERS": "2"})
+    first = app.clone()
+    second = app.clone()
+
+    first._tmpl_attrs["runner"] = object()
+    first._tmpl_attrs["env_vars"]["WORKER_CONCURRENCY"] = "8"
+
+    assert "runner" not in second._tmpl_attrs
+    assert "runner" not in app._tmpl_attrs
+    assert second._tmpl_attrs["env_vars"] == {"NUM_WORKERS": "2"}
+    assert app._tmpl_attrs["env_vars"] == {"NUM_WORKERS": "2"}
+
+
+def test_repeated_set_up_keeps_one_exit_hook(monkeypatch):
+    """set_up replaces the feedback writer and closes the one it registered."""
+    hooks = []
+    monkeypatch.setattr(AdkApp, "set_up", lambda self: None)
+    monkeypatch.setattr(agent_engine_app.atexit, "register", hooks.append)
+    monkeypatch.setattr(agent_engine_app.atexit, "unregister", hooks.remove)
+    app = AgentEngineApp(agent=root_agent)
+
+    app.set_up(telemetry=False, cache=AnalysisCache(cache_dir=None))
+    first = app.feedback_writer
+    app.set_up(telemetry=False, cache=AnalysisCache(cache_dir=None))
+
+    assert hooks == [app.feedback_writer.close]
+    assert first.closed
+    app.feedback_writer.close()
@@ -0,0 +1,128 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests for per-agent model call accounting.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from google.adk.agents import Agent
+from google.adk.models import LlmRequest, LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+
+from app.utils.agent_metrics import (
+    AgentMetrics,
+    ModelCall,
+    ModelCallRecorder,
+    instrument_agent,
+)
+from app.utils.fake_llm import FakeLlm
+
+
+def test_summary_reports_percentiles_per_agent():
+    """Latency percentiles and totals are computed separately for each agent."""
+    metrics = AgentMetrics()
+    for i in range(1, 101):
+        metrics.record(ModelCall("simplification_agent", 10, 5, latency_s=i))
+    metrics.record(ModelCall("workflow_diagram_agent", latency_s=3.0, transfers=1))
+
+    summary = metrics.summary()
+
+    simplification = summary["simplification_agent"]
+    assert simplification["calls"] == 100
+    assert simplification["input_tokens"] == 1000
+    assert (
+        simplification["latency_p50_s"],
+        simplification["latency_p95_s"],
+        simplification["latency_p99_s"],
+    ) == (50, 95, 99)
+    assert summary["workflow_diagram_agent"]["transfers"] == 1
+
+
+def test_recorder_sets_span_attributes_for_streamed_call():
+    """A streamed call is recorded once, with its first token and transfers."""
+    metrics = AgentMetrics()
+    recorder = ModelCallRecorder(metrics)
+    context = SimpleNamespace(invocation_id="inv", agent_name="legal_flow_agent")
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+
+    request = LlmRequest(
+        contents=[types.Content(role="user", parts=[types.Part(text="第三条")])],
+        config=types.GenerateContentConfig(system_instruction="解析してください"),
+    )
+    with provider.get_tracer(__name__).start_as_current_span("call_llm"):
+        recorder.before_model(context, request)
+        recorder.after_model(
+            context,
+            LlmResponse(content=types.ModelContent("平易"), partial=True),
+        )
+        recorder.after_model(context, LlmResponse(content=types.ModelContent("平易")))
+        recorder.after_model(
+            context,
+            LlmResponse(
+                content=types.ModelContent(
+                    types.Part.from_function_call(
+                        name="transfer_to_agent",
+                        args={"agent_name": "workflow_diagram_agent"},
+                    )
+                )
+            ),
+        )
+
+    [call] = metrics.calls("legal_flow_agent")
+    assert call.transfers == 1
+    assert call.tokens_estimated
+    assert call.input_tokens > 0 and call.output_tokens > 0
+    assert 0 < call.time_to_first_token_s <= call.latency_s
+    attributes = exporter.get_finished_spans()[0].attributes
+    assert attributes["gen_ai.agent.name"] == "legal_flow_agent"
+    assert attributes["gen_ai.usage.output_tokens"] == call.output_tokens
+    assert attributes["legal_flow.transfers"] == 1
+
+
+def test_instrumented_agent_records_each_model_call():
+    """A Runner over an instrumented agent records every model call once."""
+    metrics = AgentMetrics()
+    agent = Agent(name="simplification_agent", model=FakeLlm(latency=0.05))
+    instrument_agent(agent, metrics)
+    instrument_agent(agent, metrics)
+    sessions = InMemorySessionService()
+    runner = Runner(agent=agent, session_service=sessions, app_name="test")
+
+    async def run(text: str) -> None:
+        session = sessions.create_session(app_name="test", user_id="u")
+        message = types.Content(role="user", parts=[types.Part.from_text(text=text)])
+        async for _ in runner.run_async(
+            user_id="u", session_id=session.id, new_message=message
+        ):
+            pass
+
+    asyncio.run(run("第三条"))
+    asyncio.run(run("第四条"))
+
+    summary = metrics.summary()["simplification_agent"]
+    assert summary["calls"] == 2
+    assert summary["latency_p50_s"] >= 0.05
+    assert summary["output_tokens"] > 0
@@ -0,0 +1,134 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# ruff: noqa: RUF001
+
+"""
+Unit tests for the memory-mapped article index and the reference resolver.
+"""
+
+from types import SimpleNamespace
+
+from google.adk.agents import Agent
+from google.adk.models import LlmRequest
+from google.genai import types
+
+from app.utils.article_index import (
+    ARTICLE_INDEX_ENV,
+    ArticleIndex,
+    ReferenceExpander,
+    resolve_references,
+    write_index,
+)
+from app.utils.cache import agent_fingerprint
+
+LAW = """第一章　総則
+（目的）
+第一条　この法律は、電子署名に関し、必要な事項を定めることを目的とする。
+第二条　この法律において「電子署名」とは、次の各号に掲げる措置をいう。
+一　当該措置を行った者の作成に係るものであることを示すためのもの
+二　改変が行われていないかどうかを確認することができるもの
+２　この法律において「認証業務」とは、電子署名について証明する業務をいう。
+第三条の二　認定の更新を受けなければならない。
+附　則
+第一条　この法律は、平成十三年四月一日から施行する。
+"""
+
+ARTICLE = """第四条　特定認証業務を行おうとする者は、主務大臣の認定を受けることができる。
+２　前項の認定は、前条及び第二条第一項第二号に規定する措置について行う。
+３　法第三条の規定は、前項の認定について準用する。
+"""
+
+
+def test_index_lookups(tmp_path):
+    """Articles, 項 and 号 are found in the mapped file; 附則 is left out."""
+    path = str(tmp_path / "law.idx")
+    assert write_index(LAW, path) == 9
+
+    index = ArticleIndex.open(path)
+    try:
+        assert index.lookup((1, 0, 0, 0, 0)).startswith("（目的）\n第一条")
+        assert index.lookup((2, 0, 1, 2, 0)).startswith("改変が行われて")
+        assert index.lookup((2, 0, 1, 0, 0)).endswith(
+            "\n二　改変が行われていないかどうかを確認することができるもの"
+        )
+        assert (
+            index.lookup((3, 2, 0, 0, 0))
+            == "第三条の二　認定の更新を受けなければならない。"
+        )
+        assert index.lookup((3, 0, 0, 0, 0)) is None
+        assert index.neighbor((3, 2), -1) == (2, 0)
+        assert index.neighbor((2, 0), 1) == (3, 2)
+        assert index.neighbor((4, 0), -1) == (3, 2)
+        assert index.neighbor((1, 0), -1) is None
+    finally:
+        index.close()
+
+
+def test_resolve_only_references_outside_the_article():
+    """前条 and 第二条第一項第二号 are expanded; 前項 and other laws are not."""
+    references = resolve_references(ARTICLE, ArticleIndex.from_text(LAW))
+
+    assert [reference.label for reference in references] == [
+        "第3条の2",
+        "第2条第1項第2号",
+    ]
+    assert references[1].text.startswith("改変が行われて")
+
+
+def test_expander_adds_references_to_the_request_only(monkeypatch):
+    """The user message in the request gains a part; the session's is unchanged."""
+    message = types.Content(role="user", parts=[types.Part.from_text(text=ARTICLE)])
+    request = LlmRequest(
+        contents=[
+            message,
+            types.Content(
+                role="user", parts=[types.Part.from_text(text="For context: 転送")]
+            ),
+        ],
+        config=types.GenerateContentConfig(),
+    )
+    expander = ReferenceExpander(ArticleIndex.from_text(LAW))
+
+    expander.before_model(SimpleNamespace(state={}), request)
+
+    assert len(message.parts) == 1
+    added = request.contents[0].parts[1].text
+    assert "[第3条の2] 第三条の二" in added
+    assert request.contents[1].parts[0].text == "For context: 転送"
+
+    monkeypatch.delenv(ARTICLE_INDEX_ENV, raising=False)
+    unchanged = LlmRequest(contents=[message], config=types.GenerateContentConfig())
+    ReferenceExpander().before_model(SimpleNamespace(state={}), unchanged)
+    assert unchanged.contents == [message]
+
+
+def test_agent_fingerprint_depends_on_the_index():
+    """Results cached with one index are not reused with another."""
+
+    def fingerprint(expander: ReferenceExpander) -> str:
+        return agent_fingerprint(
+            Agent(
+                name="simplification_agent", before_model_callback=expander.before_model
+            )
+        )
+
+    law = fingerprint(ReferenceExpander(ArticleIndex.from_text(LAW)))
+    amended = fingerprint(
+        ReferenceExpander(ArticleIndex.from_text(LAW.replace("更新", "有効期間の更新")))
+    )
+
+    assert law == fingerprint(ReferenceExpander(ArticleIndex.from_text(LAW)))
+    assert law != amended
+    assert agent_fingerprint(Agent(name="simplification_agent")) not in (law, amended)
@@ -0,0 +1,155 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests for the batch analysis CLI.
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app.batch import BatchAnalyzer, load_checkpoint, read_items
+
+
+class FakeSessionService:
+    def __init__(self):
+        self.sessions = {}
+
+    def create_session(self, *, app_name, user_id):
+        session = SimpleNamespace(id=str(len(self.sessions)))
+        self.sessions[session.id] = session
+        return session
+
+    def delete_session(self, *, app_name, user_id, session_id):
+        del self.sessions[session_id]
+
+
+class FakeRunner:
+    app_name = "test"
+
+    def __init__(self, fail_on=()):
+        self.fail_on = fail_on
+        self.active = 0
+        self.max_active = 0
+
+    async def run_async(self, *, user_id, session_id, new_message):
+        text = new_message.parts[0].text
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        if text in self.fail_on:
+            raise RuntimeError("quota exceeded")
+        yield SimpleNamespace(
+            author="simplification_agent",
+            partial=False,
+            actions=None,
+            content=SimpleNamespace(
+                role="model", parts=[SimpleNamespace(text=f"平易: {text}")]
+            ),
+        )
+
+
+def write_input(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps({"id": f"a{i}", "text": f"第{i}条"}) + "\n")
+
+
+def read_output(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_batch_respects_concurrency_and_writes_results(tmp_path):
+    """Every article is analyzed once, never more than `concurrency` at a time."""
+    write_input(tmp_path / "in.jsonl", 10)
+    runner, sessions = FakeRunner(), FakeSessionService()
+    analyzer = BatchAnalyzer(runner, sessions, concurrency=3)
+
+    summary = asyncio.run(
+        analyzer.run(
+            str(tmp_path / "in.jsonl"),
+            str(tmp_path / "out.jsonl"),
+            str(tmp_path / "ckpt"),
+        )
+    )
+
+    records = read_output(tmp_path / "out.jsonl")
+    assert summary["completed"] == 10
+    assert runner.max_active <= 3
+    assert sorted(r["id"] for r in records) == sorted(f"a{i}" for i in range(10))
+    assert records[0]["simplified"]["paragraphs"][0].startswith("平易: ")
+    assert records[0]["diagram"] is None
+    assert records[0]["model_calls"] == {"simplification_agent": 1}
+    assert sessions.sessions == {}
+
+
+def test_batch_resumes_from_checkpoint(tmp_path):
+    """Failed items are retried on the next run, replacing their error records."""
+    write_input(tmp_path / "in.jsonl", 4)
+    paths = [str(tmp_path / name) for name in ("in.jsonl", "out.jsonl", "ckpt")]
+
+    first = asyncio.run(
+        BatchAnalyzer(FakeRunner(fail_on={"第2条"}), FakeSessionService()).run(*paths)
+    )
+    assert first["failed"] == 1
+    assert load_checkpoint(paths[2]) == {"a0", "a1", "a3"}
+
+    second = asyncio.run(BatchAnalyzer(FakeRunner(), FakeSessionService()).run(*paths))
+    assert second["skipped"] == 3
+    assert second["completed"] == 1
+    assert load_checkpoint(paths[2]) == {"a0", "a1", "a2", "a3"}
+    records = read_output(paths[1])
+    assert sorted(r["id"] for r in records) == ["a0", "a1", "a2", "a3"]
+    assert not any("error" in r for r in records)
+
+
+def test_split_items_keep_their_ids_when_articles_are_inserted(tmp_path):
+    law = "\n".join(
+        [
+            "第一条　目的を定める。",
+            "第二条　定義を定める。",
+            "附則",
+            "第一条　この法律は、公布の日から施行する。",
+            "附則",
+            "この法律は、公布の日から施行する。",
+            "附則",
+            "この法律は、令和七年四月一日から施行する。",
+        ]
+    )
+    amended = law.replace("第二条", "第一条の二　趣旨を定める。\n第二条")
+    path = tmp_path / "laws.jsonl"
+
+    ids = []
+    for text in (law, amended):
+        path.write_text(json.dumps({"id": "act", "text": text}) + "\n")
+        ids.append([item["id"] for item in read_items(str(path), split_articles=True)])
+
+    assert ids[0] == [
+        "act#第一条",
+        "act#第二条",
+        "act#附則第一条",
+        "act#附則",
+        "act#附則(2)",
+    ]
+    assert ids[1] == [
+        "act#第一条",
+        "act#第一条の二",
+        "act#第二条",
+        "act#附則第一条",
+        "act#附則",
+        "act#附則(2)",
+    ]
@@ -0,0 +1,135 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests for the analysis result cache.
+"""
+
+import os
+from types import SimpleNamespace
+
+from app.utils.cache import AnalysisCache, agent_fingerprint, normalize_legal_text
+from app.utils.fake_llm import use_fake_llm
+
+ARTICLE = "第三条　認証業務を行おうとする者は、総務大臣の認定を受けなければならない。"
+
+
+def test_normalize_legal_text_folds_width_and_whitespace():
+    """Full-width digits/spaces and repeated whitespace normalize away."""
+    assert normalize_legal_text("  ２　前項の\n\n認定 ") == "2 前項の 認定"  # noqa: RUF001
+
+
+def test_memory_hit_after_put(tmp_path):
+    """A stored analysis is returned for the same (normalized) article."""
+    cache = AnalysisCache(cache_dir=str(tmp_path))
+    value = {"simplified_text": "平易な文章", "mermaid_code": "flowchart TD"}
+    cache.put(ARTICLE, value)
+
+    assert cache.get(ARTICLE + "\n") == value
+    assert cache.stats["memory_hits"] == 1
+
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    """Entries written by one instance are read back from disk by another."""
+    AnalysisCache(cache_dir=str(tmp_path)).put(ARTICLE, {"result": "ok"})
+
+    cache = AnalysisCache(cache_dir=str(tmp_path))
+    assert cache.get(ARTICLE) == {"result": "ok"}
+    assert cache.stats["disk_hits"] == 1
+
+
+def test_disk_tier_stores_sets_as_lists(tmp_path):
+    """Dumped ADK events with set fields can be written to disk."""
+    AnalysisCache(cache_dir=str(tmp_path)).put(ARTICLE, {"ids": {"b", "a"}})
+
+    assert AnalysisCache(cache_dir=str(tmp_path)).get(ARTICLE) == {"ids": ["a", "b"]}
+
+
+def test_unserializable_entries_stay_in_memory(tmp_path):
+    """A value JSON cannot encode is cached in memory but not written to disk."""
+    cache = AnalysisCache(cache_dir=str(tmp_path))
+    value = {"events": [object()]}
+    cache.put(ARTICLE, value)
+
+    assert cache.get(ARTICLE) is value
+    assert AnalysisCache(cache_dir=str(tmp_path)).get(ARTICLE) is None
+
+
+def test_version_and_namespace_change_key(tmp_path):
+    """Different agent versions or entry points never share entries."""
+    cache = AnalysisCache(version="v1", cache_dir=str(tmp_path))
+    cache.put(ARTICLE, {"result": "v1"})
+
+    assert AnalysisCache(version="v2", cache_dir=str(tmp_path)).get(ARTICLE) is None
+    assert cache.get(ARTICLE, namespace="stream_query") is None
+
+
+def test_memory_lru_eviction():
+    """The least recently used entry is dropped once the memory tier is full."""
+    cache = AnalysisCache(cache_dir=None, max_memory_entries=2)
+    cache.put("a", {"v": 1})
+    cache.put("b", {"v": 2})
+    cache.get("a")
+    cache.put("c", {"v": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"v": 1}
+
+
+def test_disk_size_eviction(tmp_path):
+    """The on-disk tier is trimmed back under its byte budget."""
+    cache = AnalysisCache(
+        cache_dir=str(tmp_path), max_memory_entries=1, max_disk_bytes=300
+    )
+    for i in range(10):
+        cache.put(f"article {i}", {"result": "x" * 100})
+
+    total = sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(tmp_path)
+        for name in files
+    )
+    assert total <= 300
+    assert cache.get("article 9") == {"result": "x" * 100}
+
+
+def test_agent_fingerprint_tracks_prompt_changes():
+    """Editing a sub-agent prompt changes the root fingerprint."""
+    sub_agent = SimpleNamespace(name="sub", model="m", instruction="a", tools=[])
+    root = SimpleNamespace(
+        name="root", model="m", instruction="r", sub_agents=[sub_agent]
+    )
+    before = agent_fingerprint(root)
+    sub_agent.instruction = "b"
+
+    assert agent_fingerprint(root) != before
+
+
+def test_agent_fingerprint_tracks_the_model_class():
+    """A stub model registered under a Gemini name gets its own fingerprint."""
+    agent = SimpleNamespace(name="root", model="gemini-2.0-flash", instruction="r")
+    real = agent_fingerprint(agent)
+    with use_fake_llm():
+        fake = agent_fingerprint(agent)
+
+    assert fake != real
+    assert agent_fingerprint(agent) == real
+
+
+def test_disk_size_counts_a_first_entry_once(tmp_path):
+    """The first write after opening the cache does not count its file twice."""
+    cache = AnalysisCache(cache_dir=str(tmp_path))
+    cache.put(ARTICLE, {"result": "ok"})
+
+    assert cache._disk_bytes == sum(size for _, size, _ in cache._disk_entries())
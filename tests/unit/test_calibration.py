@@ -0,0 +1,36 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests for the worker parallelism recommendation.
+"""
+
+from app.calibration import recommend
+
+
+def test_concurrency_stops_at_throughput_knee():
+    """The chosen concurrency is the last level that still paid off."""
+    throughput = {1: 1.0, 2: 1.9, 4: 3.6, 8: 3.8, 16: 3.9}
+    settings = recommend(
+        throughput, rss_mb_per_worker=200, memory_limit_mb=4096, cpus=4
+    )
+
+    assert settings == {"num_workers": 4, "worker_concurrency": 4}
+
+
+def test_workers_are_bounded_by_memory():
+    """Workers never exceed what fits in the instance memory budget."""
+    settings = recommend({1: 1.0}, rss_mb_per_worker=900, memory_limit_mb=2048, cpus=8)
+
+    assert settings == {"num_workers": 1, "worker_concurrency": 1}
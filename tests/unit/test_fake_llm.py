@@ -0,0 +1,65 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests for the scripted stand-in model.
+"""
+
+import asyncio
+
+from google.adk.models import LLMRegistry
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from app.agent import root_agent
+from app.pipeline import collect_result, count_model_calls
+from app.utils.fake_llm import FakeLlm, use_fake_llm
+
+
+def run(agent) -> list:
+    runner = InMemoryRunner(agent, app_name="test")
+    session = runner.session_service.create_session(app_name="test", user_id="user")
+    message = types.Content(role="user", parts=[types.Part.from_text(text="第三条")])
+
+    async def collect() -> list:
+        return [
+            event
+            async for event in runner.run_async(
+                user_id="user", session_id=session.id, new_message=message
+            )
+        ]
+
+    return asyncio.run(collect())
+
+
+def test_root_agent_runs_offline_on_scripted_turns():
+    """The real agent tree transfers, calls its tool and returns structured results."""
+    with use_fake_llm():
+        events = run(root_agent)
+
+    assert count_model_calls(events) == {
+        "legal_flow_agent": 3,
+        "simplification_agent": 1,
+        "workflow_diagram_agent": 2,
+    }
+    result = collect_result(events)
+    assert result.simplified.paragraphs
+    assert result.diagram.actors == ["申請者", "総務大臣"]
+
+
+def test_gemini_resolves_to_gemini_again_after_use():
+    """Leaving the context restores the real model for Gemini names."""
+    with use_fake_llm():
+        assert issubclass(LLMRegistry.resolve("gemini-2.0-flash"), FakeLlm)
+    assert not issubclass(LLMRegistry.resolve("gemini-2.0-flash"), FakeLlm)
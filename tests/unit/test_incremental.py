@@ -0,0 +1,185 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# ruff: noqa: RUF001
+
+"""
+Unit tests for incremental re-analysis of amended articles.
+"""
+
+import asyncio
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+
+from app.incremental import (
+    IncrementalAnalyzer,
+    build_incremental_agent,
+    diff_units,
+    split_units,
+)
+from app.utils import article_index
+from app.utils.article_index import (
+    ArticleIndex,
+    format_references,
+    reference_expander,
+)
+from app.utils.cache import AnalysisCache
+from app.utils.fake_llm import SAMPLE_MERMAID, FakeTurn, use_fake_llm
+
+ARTICLE = """（認定）
+第六条　認証業務を行おうとする者は、総務大臣の認定を受けることができる。
+２　前項の認定を受けようとする者は、次に掲げる事項を記載した申請書を提出しなければならない。
+一　氏名又は名称
+二　住所
+"""
+AMENDED = ARTICLE.replace("二　住所", "二　住所及び連絡先")
+
+
+def unit_script(unit_ids: list[str]) -> dict[str, list[FakeTurn]]:
+    """Answers for every unit; the analyzer only keeps those it asked for."""
+    return {
+        "simplification_agent": [
+            FakeTurn(
+                structured={
+                    "units": [
+                        {
+                            "unit_id": unit_id,
+                            "paragraphs": [f"{unit_id}の平易な文章です。"],
+                            "glossary": [{"term": "認定", "definition": "許可"}],
+                        }
+                        for unit_id in unit_ids
+                    ]
+                }
+            )
+        ],
+        "workflow_diagram_agent": [
+            FakeTurn(
+                structured={
+                    "units": [
+                        {
+                            "unit_id": unit_id,
+                            "actors": ["申請者", "総務大臣"],
+                            "mermaid_code": SAMPLE_MERMAID if unit_id != "u3" else "",
+                        }
+                        for unit_id in unit_ids
+                    ]
+                }
+            )
+        ],
+    }
+
+
+def test_split_and_diff_units():
+    """Each 項 body and 号 is a unit; an amended 号 is the only change."""
+    units = split_units(ARTICLE)
+
+    assert [unit.label for unit in units] == [
+        "第六条（認定）第1項",
+        "第六条（認定）第2項",
+        "第六条（認定）第2項第一号",
+        "第六条（認定）第2項第二号",
+    ]
+    assert units[3].context.startswith("前項の認定")
+
+    diff = diff_units([unit.key for unit in units], split_units(AMENDED))
+
+    assert [unit.id for unit in diff.unchanged] == ["u1", "u2", "u3"]
+    assert [unit.text for unit in diff.changed] == ["住所及び連絡先"]
+    assert diff.removed == 1
+
+
+def test_only_amended_units_are_sent_again():
+    """Re-analysis sends only the changed 号 and merges all unit diagrams."""
+    sessions = InMemorySessionService()
+    runner = Runner(
+        agent=build_incremental_agent(), session_service=sessions, app_name="test"
+    )
+    analyzer = IncrementalAnalyzer(runner, sessions, AnalysisCache(cache_dir=None))
+
+    with use_fake_llm(script=unit_script(["u1", "u2", "u3", "u4"])):
+        first, first_report = asyncio.run(analyzer.analyze("act#6", ARTICLE))
+        amended, report = asyncio.run(analyzer.analyze("act#6", AMENDED))
+        _, unchanged_report = asyncio.run(analyzer.analyze("act#6", AMENDED))
+
+    assert (first_report.analyzed, first_report.reused) == (4, 0)
+    assert first_report.model_calls == {
+        "simplification_agent": 1,
+        "workflow_diagram_agent": 1,
+    }
+    assert (report.analyzed, report.reused, report.changed, report.removed) == (
+        1,
+        3,
+        1,
+        1,
+    )
+    assert unchanged_report.analyzed == 0 and unchanged_report.model_calls == {}
+
+    assert amended.simplified.paragraphs == first.simplified.paragraphs
+    assert [term.term for term in amended.simplified.glossary] == ["認定"]
+    # Three units carry the sample diagram; the item without one is skipped.
+    assert len(amended.diagram.steps) == 12
+    assert amended.diagram.steps[0].id == "u1_A"
+    assert {"source": "u2_D", "target": "u4_A", "label": ""} in [
+        edge.model_dump() for edge in amended.diagram.edges
+    ]
+    assert analyzer.summary()["analyzed_ratio"] == round(5 / 12, 3)
+
+
+def test_items_are_analyzed_again_under_an_amended_paragraph():
+    """Unchanged 号 are re-sent when the 柱書 they complete is amended."""
+    sessions = InMemorySessionService()
+    runner = Runner(
+        agent=build_incremental_agent(), session_service=sessions, app_name="test"
+    )
+    analyzer = IncrementalAnalyzer(runner, sessions, AnalysisCache(cache_dir=None))
+    amended = ARTICLE.replace("申請書を提出", "申請書を電子情報処理組織により提出")
+
+    with use_fake_llm(script=unit_script(["u1", "u2", "u3", "u4"])):
+        asyncio.run(analyzer.analyze("act#6", ARTICLE))
+        _, report = asyncio.run(analyzer.analyze("act#6", amended))
+        _, moved_report = asyncio.run(
+            analyzer.analyze("act#7", amended.replace("第六条", "第七条"))
+        )
+
+    assert (report.analyzed, report.reused, report.changed) == (3, 1, 1)
+    assert moved_report.analyzed == 4
+
+
+def test_units_are_sent_with_the_provisions_they_refer_to(monkeypatch):
+    """An amended 号 citing 前条 gets its text, as in a full analysis."""
+    law = "第五条　認定の有効期間は、五年とする。\n" + ARTICLE
+    sent = []
+
+    def record(references):
+        sent.append([reference.label for reference in references])
+        return format_references(references)
+
+    monkeypatch.setattr(
+        reference_expander, "get_index", lambda: ArticleIndex.from_text(law)
+    )
+    monkeypatch.setattr(article_index, "format_references", record)
+    sessions = InMemorySessionService()
+    runner = Runner(
+        agent=build_incremental_agent(), session_service=sessions, app_name="test"
+    )
+    analyzer = IncrementalAnalyzer(runner, sessions, AnalysisCache(cache_dir=None))
+
+    with use_fake_llm(script=unit_script(["u1", "u2", "u3", "u4"])):
+        asyncio.run(analyzer.analyze("act#6", ARTICLE))
+        asyncio.run(
+            analyzer.analyze("act#6", AMENDED.replace("住所及び連絡先", "前条の期間"))
+        )
+
+    assert sent == [["第5条"]]
@@ -0,0 +1,61 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Concurrency test of the Streamlit UI sharing one Runner, using a stub model.
+"""
+
+import time
+from concurrent import futures
+
+from google.adk.agents import Agent
+from google.adk.sessions import InMemorySessionService
+
+from app.utils.cache import AnalysisCache
+from app.utils.fake_llm import FakeLlm
+from streamlit_app import LegalFlowUI, build_runner
+
+CALLERS = 16
+MODEL_LATENCY = 0.2
+
+
+def test_shared_runner_isolates_concurrent_callers():
+    """Simultaneous callers share one Runner but never see each other's sessions."""
+    agent = Agent(name="simplification_agent", model=FakeLlm(latency=MODEL_LATENCY))
+    session_service = InMemorySessionService()
+    runner = build_runner(agent, session_service)
+
+    def browser_session(index: int) -> LegalFlowUI:
+        # Each Streamlit script run builds its own UI around the shared runner.
+        ui = LegalFlowUI(cache=AnalysisCache(cache_dir=None), runner=runner)
+        ui.process_legal_text(f"第{index}条　申請者は申請する。", f"user-{index}")
+        return ui
+
+    start = time.perf_counter()
+    with futures.ThreadPoolExecutor(max_workers=CALLERS) as pool:
+        uis = list(pool.map(browser_session, range(CALLERS)))
+    elapsed = time.perf_counter() - start
+
+    for index, ui in enumerate(uis):
+        assert ui.last_structured.simplified.paragraphs == ["平易な文章です。"]
+        sessions = session_service.list_sessions(
+            app_name=runner.app_name, user_id=f"user-{index}"
+        ).sessions
+        assert len(sessions) == 1
+        session = session_service.get_session(
+            app_name=runner.app_name, user_id=f"user-{index}", session_id=sessions[0].id
+        )
+        assert session.events[0].content.parts[0].text.startswith(f"第{index}条")
+    # The stub model calls overlap instead of running one after another.
+    assert elapsed < CALLERS * MODEL_LATENCY / 2
@@ -0,0 +1,89 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests for the local Agent Engine REST stand-in.
+"""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from app.local_server import AgentEngineServer
+
+ENGINE_URL = "/v1beta1/projects/p/locations/us-central1/reasoningEngines/123"
+
+
+class EchoApp:
+    """Streams the message back word by word, like a set-up AgentEngineApp."""
+
+    def stream_query(self, *, message: str, user_id: str, session_id=None):
+        for word in message.split():
+            yield {"author": user_id, "text": word, "long_running_tool_ids": set()}
+
+    def get_diagram_stats(self) -> dict[str, int]:
+        return {"valid": 1}
+
+    def register_operations(self):
+        return {"": ["get_diagram_stats"], "stream": ["stream_query"]}
+
+
+@pytest.fixture
+def base_url():
+    server = AgentEngineServer(("127.0.0.1", 0), EchoApp())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def post(url: str, body: dict) -> tuple[int, bytes]:
+    request = urllib.request.Request(
+        url, data=json.dumps(body).encode(), headers={"Authorization": "Bearer x"}
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def test_stream_query_streams_one_json_event_per_line(base_url):
+    """Events arrive as JSON lines, with sets serialized as lists."""
+    status, body = post(
+        f"{base_url}{ENGINE_URL}:streamQuery?alt=sse",
+        {"input": {"message": "申請 審査", "user_id": "u"}},
+    )
+
+    assert status == 200
+    events = [json.loads(line) for line in body.splitlines() if line]
+    assert [event["text"] for event in events] == ["申請", "審査"]
+    assert events[0]["long_running_tool_ids"] == []
+
+
+def test_query_calls_registered_operations_only(base_url):
+    """Unary operations are dispatched by class_method; others are rejected."""
+    status, body = post(
+        f"{base_url}{ENGINE_URL}:query", {"class_method": "get_diagram_stats"}
+    )
+    assert (status, json.loads(body)) == (200, {"output": {"valid": 1}})
+
+    status, _ = post(f"{base_url}{ENGINE_URL}:query", {"class_method": "__init__"})
+    assert status == 400
+    status, _ = post(f"{base_url}/v1/unknown", {})
+    assert status == 404
@@ -0,0 +1,131 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests for the batched background log writer.
+"""
+
+import threading
+import time
+
+from app.utils.log_writer import BatchedLogWriter
+
+
+class FakeBatch:
+    def __init__(self, logger):
+        self.logger = logger
+        self.entries = []
+
+    def log_struct(self, info, **kwargs):
+        self.entries.append(info)
+
+    def commit(self):
+        self.logger.release.wait()
+        self.logger.batches.append(self.entries)
+
+
+class FakeLogger:
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+def test_flush_writes_queued_entries_in_batches():
+    """Queued entries are committed in batches of at most max_batch_size."""
+    logger = FakeLogger()
+    writer = BatchedLogWriter(logger, max_batch_size=2, flush_interval=60)
+    for i in range(5):
+        assert writer.write({"score": i})
+
+    assert writer.flush()
+    assert [len(batch) for batch in logger.batches] == [2, 2, 1]
+    assert writer.stats["entries_sent"] == 5
+    assert writer.queue_depth == 0
+    writer.close()
+
+
+def test_full_queue_applies_backpressure_then_drops():
+    """A full queue blocks writers up to the timeout, then counts a drop."""
+    logger = FakeLogger()
+    logger.release.clear()
+    writer = BatchedLogWriter(logger, max_batch_size=1, max_queue_size=1)
+    writer.write({"score": 1})
+    # Wait until the writer thread holds the first entry in a blocked commit.
+    while writer.queue_depth:
+        time.sleep(0.001)
+    assert writer.write({"score": 2})
+
+    assert not writer.write({"score": 3}, timeout=0.05)
+    assert writer.queue_depth == 1
+    assert writer.stats["entries_dropped"] == 1
+
+    logger.release.set()
+    writer.close()
+    assert writer.stats["entries_sent"] == 2
+
+
+def test_close_flushes_and_stops():
+    """Closing writes pending entries and stops the background thread."""
+    logger = FakeLogger()
+    writer = BatchedLogWriter(logger, flush_interval=60)
+    writer.write({"score": 1})
+    writer.close()
+
+    assert logger.batches == [[{"score": 1}]]
+    assert writer.closed
+
+
+def test_batches_respect_the_byte_budget():
+    """Entries are split across requests by size; oversized ones are dropped."""
+    logger = FakeLogger()
+    writer = BatchedLogWriter(
+        logger, flush_interval=60, max_batch_bytes=50, max_entry_bytes=30
+    )
+    for text in ["a" * 10, "b" * 10, "c" * 10, "d" * 40]:
+        writer.write({"text": text})
+
+    assert not writer.flush()
+    assert [[entry["text"][0] for entry in batch] for batch in logger.batches] == [
+        ["a", "b"],
+        ["c"],
+    ]
+    assert writer.stats["entries_dropped"] == 1
+    assert writer.flush()
+    writer.close()
+
+
+def test_flush_reports_failed_writes():
+    """A logger that cannot be created fails the flush but not the writer."""
+    logger = FakeLogger()
+    attempts = []
+
+    def create_logger():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("no credentials")
+        return logger
+
+    writer = BatchedLogWriter(create_logger, flush_interval=60)
+    writer.write({"score": 1})
+    assert not writer.flush()
+    assert writer.stats["entries_dropped"] == 1
+
+    writer.write({"score": 2})
+    assert writer.flush()
+    assert logger.batches == [[{"score": 2}]]
+    writer.close()
@@ -0,0 +1,193 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests for Mermaid flowchart parsing and local SVG rendering.
+"""
+
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from app.utils.mermaid import (
+    Edge,
+    MermaidSyntaxError,
+    format_flowchart,
+    merge_flowcharts,
+    parse_flowchart,
+    repair_flowchart,
+)
+from app.utils.mermaid_render import render_mermaid_svg
+
+DIAGRAM = """flowchart TD
+    A[申請者] -->|申請書を提出| B{総務大臣<br>審査}
+    B -- 適合 --> C([認定])
+    B -.->|不適合| D["却下 (理由通知)"]
+    D ==> A
+    C --> E & F
+    %% コメント
+    style A fill:#f9f
+"""
+
+
+def test_parse_flowchart_nodes_and_edges():
+    """Shapes, both edge label forms, chains and & are understood."""
+    chart = parse_flowchart(DIAGRAM)
+
+    assert chart.direction == "TD"
+    assert chart.nodes["B"].label == "総務大臣\n審査"
+    assert chart.nodes["B"].shape == "diamond"
+    assert chart.nodes["C"].shape == "stadium"
+    assert chart.nodes["D"].label == "却下 (理由通知)"
+    assert chart.edges[:3] == [
+        Edge("A", "B", "申請書を提出"),
+        Edge("B", "C", "適合"),
+        Edge("B", "D", "不適合", style="dotted"),
+    ]
+    assert chart.edges[3].style == "thick"
+    assert [(e.source, e.target) for e in chart.edges[4:]] == [("C", "E"), ("C", "F")]
+
+
+@pytest.mark.parametrize(
+    "code, line",
+    [
+        ("sequenceDiagram\n    A->>B: 申請", 1),
+        ("flowchart TD\n    A[申請者 --> B", 2),
+        ("flowchart TD\n    A --> B\n    B -> C", 3),
+    ],
+)
+def test_parse_flowchart_reports_line(code, line):
+    """Unsupported syntax is reported with its line number."""
+    with pytest.raises(MermaidSyntaxError) as error:
+        parse_flowchart(code)
+    assert error.value.line == line
+
+
+def test_render_svg_draws_every_node_and_edge():
+    """The SVG is well-formed and contains each label and edge once."""
+    svg = render_mermaid_svg(DIAGRAM)
+    root = ET.fromstring(svg)
+    ns = {"svg": "http://www.w3.org/2000/svg"}
+    text = "".join(root.itertext())
+
+    for label in ["申請者", "却下 (理由通知)", "適合", "不適合", "申請書を提出"]:
+        assert label in text
+    assert len(root.findall("svg:path", ns)) == 6
+    assert len(root.findall("svg:polygon", ns)) == 1
+
+
+def test_render_svg_handles_cycles_and_directions():
+    """Cyclic and left-to-right diagrams are laid out without errors."""
+    svg = render_mermaid_svg("graph LR\n    A --> B --> C --> A\n    C --> C")
+    width = float(ET.fromstring(svg).get("width"))
+    height = float(ET.fromstring(svg).get("height"))
+
+    assert width > height
+
+
+def test_render_svg_is_cached():
+    """Rendering the same code again is served from the cache."""
+    render_mermaid_svg.cache_clear()
+    first = render_mermaid_svg(DIAGRAM)
+    second = render_mermaid_svg(DIAGRAM)
+
+    assert first is second
+    assert render_mermaid_svg.cache_info().hits == 1
+
+
+def test_repair_flowchart_keeps_valid_code():
+    """Valid diagrams are returned unchanged without repairs."""
+    result = repair_flowchart(DIAGRAM)
+
+    assert result.code == DIAGRAM
+    assert result.repairs == []
+
+
+@pytest.mark.parametrize(
+    "code,label",
+    [
+        ("flowchart TD\n    A[申請]-->B[承認]", ""),
+        ("flowchart TD\n    A[申請]-->|OK|B[承認]", "OK"),
+        ("flowchart TD\n    A([申請])==>B{審査}-.->C[承認]", ""),
+    ],
+)
+def test_repair_flowchart_keeps_compact_edges(code, label):
+    """Edges without surrounding spaces are not taken into node labels."""
+    result = repair_flowchart(code)
+
+    assert result.code == code
+    assert result.repairs == []
+    assert result.chart.nodes["A"].label == "申請"
+    assert result.chart.edges[0] == Edge(
+        "A", "B", label, style=result.chart.edges[0].style
+    )
+
+
+def test_repair_flowchart_closes_node_before_compact_edge():
+    """An unclosed label ends at the next edge even without spaces."""
+    result = repair_flowchart("flowchart TD\n    A[申請-->B[承認]")
+
+    assert result.chart.nodes["A"].label == "申請"
+    assert result.chart.nodes["B"].label == "承認"
+    assert result.chart.edges == [Edge("A", "B")]
+
+
+def test_repair_flowchart_fixes_common_defects():
+    """Quoting, unclosed brackets, reused ids and subgraphs are fixed locally."""
+    code = """```mermaid
+graph TD
+  A[申請書(様式第一)を提出] --> B[審査
+  B -> C{基準に適合?}
+  C -->|はい| D[認定]
+  C -->|いいえ| A[補正を求める]
+  A --> end
+  subgraph 認定後
+    D --> E[認定証の交付]
+```"""
+    result = repair_flowchart(code)
+    chart = result.chart
+
+    assert chart.nodes["A"].label == "申請書(様式第一)を提出"
+    assert '"申請書(様式第一)を提出"' in result.code
+    assert chart.nodes["B"].label == "審査"
+    assert chart.nodes["A_2"].label == "補正を求める"
+    assert ("A_2", "end_2") in [(e.source, e.target) for e in chart.edges]
+    assert result.code.splitlines()[0] == "graph TD"
+    assert result.code.splitlines()[-1] == "end"
+    assert len(result.repairs) == 7
+    assert repair_flowchart(result.code).repairs == []
+
+
+def test_repair_flowchart_rejects_unrecoverable_code():
+    """Other diagram types and nodes without ids go back to the model."""
+    with pytest.raises(MermaidSyntaxError):
+        repair_flowchart("sequenceDiagram\n    A->>B: 申請")
+    with pytest.raises(MermaidSyntaxError) as error:
+        repair_flowchart("flowchart TD\n    [申請] --> B")
+    assert error.value.line == 2
+
+
+def test_merged_flowcharts_round_trip():
+    """Fragments are prefixed, chained in order and written back losslessly."""
+    chart = parse_flowchart(DIAGRAM)
+    assert parse_flowchart(format_flowchart(chart)) == chart
+
+    merged = merge_flowcharts(
+        [("u1", chart), ("u2", parse_flowchart("flowchart TD")), ("u3", chart)]
+    )
+
+    assert len(merged.nodes) == 2 * len(chart.nodes)
+    assert merged.nodes["u3_D"].label == "却下 (理由通知)"
+    assert Edge("u1_F", "u3_A", style="dotted") in merged.edges
+    assert parse_flowchart(format_flowchart(merged)) == merged
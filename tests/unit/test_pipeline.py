@@ -0,0 +1,169 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests for the deterministic pipeline orchestration.
+"""
+
+import asyncio
+import json
+
+from google.adk.agents import ParallelAgent, SequentialAgent
+from google.adk.events import Event, EventActions
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from app.pipeline import (
+    RESULT_KEY,
+    build_pipeline_agent,
+    collect_result,
+    count_model_calls,
+)
+from app.sub_agents.simplification.prompt import (
+    SIMPLIFICATION_AGENT_PROMPT,
+    SIMPLIFICATION_TASK_PROMPT,
+)
+from app.sub_agents.workflow_diagram.agent import (
+    WORKFLOW_DIAGRAM_KEY,
+    generate_diagram_with_image,
+)
+from app.sub_agents.workflow_diagram.prompt import WORKFLOW_DIAGRAM_TASK_PROMPT
+from app.utils.fake_llm import FakeLlm
+from app.utils.typing import SimplifiedText
+
+
+def test_parallel_pipeline_structure():
+    """Both sub-agents run side by side, followed by the assembler."""
+    pipeline = build_pipeline_agent(parallel=True)
+    analysis, assembler = pipeline.sub_agents
+
+    assert isinstance(pipeline, SequentialAgent)
+    assert isinstance(analysis, ParallelAgent)
+    assert [agent.name for agent in analysis.sub_agents] == [
+        "simplification_agent",
+        "workflow_diagram_agent",
+    ]
+    assert assembler.name == "legal_flow_assembler"
+
+
+def test_sequential_pipeline_structure():
+    """The diagram step can run after simplification instead."""
+    analysis = build_pipeline_agent(parallel=False).sub_agents[0]
+    assert isinstance(analysis, SequentialAgent)
+
+
+def test_pipeline_steps_cannot_transfer():
+    """Pipeline steps use the task prompts without transfer checklists."""
+    simplification_step, workflow_diagram_step = (
+        build_pipeline_agent().sub_agents[0].sub_agents
+    )
+
+    assert simplification_step.instruction.startswith(SIMPLIFICATION_TASK_PROMPT)
+    assert simplification_step.output_schema is SimplifiedText
+    assert workflow_diagram_step.instruction == WORKFLOW_DIAGRAM_TASK_PROMPT
+    assert "転送" not in SIMPLIFICATION_TASK_PROMPT
+    assert SIMPLIFICATION_AGENT_PROMPT.startswith(SIMPLIFICATION_TASK_PROMPT)
+    for step in (simplification_step, workflow_diagram_step):
+        assert step.disallow_transfer_to_parent
+        assert step.disallow_transfer_to_peers
+
+
+def test_count_model_calls_ignores_partial_and_tool_responses():
+    """Only completed model responses are counted, per agent."""
+
+    def event(author: str, role: str, partial: bool = False) -> Event:
+        return Event(
+            author=author,
+            partial=partial,
+            content=types.Content(role=role, parts=[types.Part.from_text(text="x")]),
+        )
+
+    events = [
+        event("legal_flow_agent", "model"),
+        event("simplification_agent", "model", partial=True),
+        event("simplification_agent", "model"),
+        event("workflow_diagram_agent", "model"),
+        event("workflow_diagram_agent", "user"),
+        event("workflow_diagram_agent", "model"),
+    ]
+
+    assert count_model_calls(events) == {
+        "legal_flow_agent": 1,
+        "simplification_agent": 1,
+        "workflow_diagram_agent": 2,
+    }
+
+
+def test_pipeline_result_is_structured():
+    """The assembler emits the schema-validated simplification as structured data."""
+    pipeline = build_pipeline_agent()
+    simplification_step, workflow_diagram_step = pipeline.sub_agents[0].sub_agents
+    simplification_step.model = FakeLlm(
+        text=json.dumps(
+            {"paragraphs": ["認定が必要です。", "申請書を出します。"], "glossary": []},
+            ensure_ascii=False,
+        )
+    )
+    workflow_diagram_step.model = FakeLlm(text="フロー図です。")
+    sessions = InMemorySessionService()
+    runner = Runner(agent=pipeline, session_service=sessions, app_name="test")
+    session = sessions.create_session(app_name="test", user_id="u")
+
+    async def run() -> list[Event]:
+        message = types.Content(
+            role="user", parts=[types.Part.from_text(text="第三条")]
+        )
+        return [
+            event
+            async for event in runner.run_async(
+                user_id="u", session_id=session.id, new_message=message
+            )
+        ]
+
+    result = collect_result(asyncio.run(run()))
+
+    assert result.simplified.paragraphs == ["認定が必要です。", "申請書を出します。"]
+    assert result.diagram is None
+    state = sessions.get_session(app_name="test", user_id="u", session_id=session.id)
+    assert state.state[RESULT_KEY] == result.model_dump()
+
+
+def test_collect_result_from_routed_agents():
+    """Without an assembler, the diagram comes from state and text is split."""
+    diagram = generate_diagram_with_image(
+        "flowchart TD\n    A[申請者が申請] --> B{総務大臣が審査}",
+        ["申請者", "総務大臣"],
+    )
+    diagram.pop("status")
+    events = [
+        Event(
+            author="simplification_agent",
+            content=types.Content(
+                role="model",
+                parts=[types.Part.from_text(text="認定が必要です。\n\n申請します。")],
+            ),
+        ),
+        Event(
+            author="workflow_diagram_agent",
+            actions=EventActions(state_delta={WORKFLOW_DIAGRAM_KEY: diagram}),
+        ),
+    ]
+
+    result = collect_result(events)
+
+    assert result.simplified.paragraphs == ["認定が必要です。", "申請します。"]
+    assert [step.actor for step in result.diagram.steps] == ["申請者", "総務大臣"]
+    assert result.diagram.steps[1].kind == "decision"
+    assert result.diagram.edges[0].source == "A"
@@ -0,0 +1,132 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests for the rate-limit-aware model call scheduler, against a fake
+model whose quota injects throttling.
+"""
+
+import asyncio
+from collections.abc import AsyncGenerator
+
+import pytest
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.runners import InMemoryRunner
+from google.genai import errors, types
+
+from app.agent import root_agent
+from app.pipeline import collect_result
+from app.utils.fake_llm import FakeLlm, FakeQuota, use_fake_llm
+from app.utils.rate_limit import (
+    ModelCallScheduler,
+    TokenBucket,
+    model_call_scheduler,
+    scheduled,
+)
+
+
+def call(llm: BaseLlm) -> list[LlmResponse]:
+    request = LlmRequest(
+        contents=[types.UserContent("第三条")], config=types.GenerateContentConfig()
+    )
+
+    async def collect() -> list[LlmResponse]:
+        return [response async for response in llm.generate_content_async(request)]
+
+    return asyncio.run(collect())
+
+
+def test_token_bucket_spaces_calls_beyond_the_burst():
+    """Once the burst is spent, each reservation waits one refill interval more."""
+    bucket = TokenBucket(per_minute=600, burst_seconds=0.5)
+
+    waits = [bucket.reserve() for _ in range(7)]
+
+    assert waits[:5] == [0.0] * 5
+    assert waits[5] == pytest.approx(0.1, abs=0.01)
+    assert waits[6] == pytest.approx(0.2, abs=0.01)
+
+
+def test_throttled_calls_are_retried_with_backoff():
+    """Calls rejected by the quota succeed on retry and are counted."""
+    quota = FakeQuota(fail_every=2)
+    scheduler = ModelCallScheduler(base_delay=0.01)
+    llm = scheduled(FakeLlm, scheduler)(quota=quota)
+
+    responses = [call(llm) for _ in range(4)]
+
+    assert all(r[0].content.parts[0].text == "平易な文章です。" for r in responses)
+    assert quota.rejected == scheduler.stats["retries"] > 0
+    assert scheduler.summary()["failed"] == 0
+
+
+def test_gives_up_after_max_retries():
+    """A quota that never recovers surfaces the API error."""
+    scheduler = ModelCallScheduler(max_retries=2, base_delay=0.01)
+    quota = FakeQuota(fail_every=1, code=503)
+    llm = scheduled(FakeLlm, scheduler)(quota=quota)
+
+    with pytest.raises(errors.ServerError):
+        call(llm)
+    assert quota.calls == 3
+    assert scheduler.stats["failed"] == 1
+
+
+class SlowFirstLlm(FakeLlm):
+    """Answers the first call slowly and later ones quickly."""
+
+    calls: int = 0
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        self.calls += 1
+        await asyncio.sleep(1.0 if self.calls == 1 else 0.0)
+        yield LlmResponse(content=types.ModelContent(f"call {self.calls}"))
+
+
+def test_slow_call_is_hedged():
+    """A call unanswered after hedge_after is resent and the faster answer wins."""
+    scheduler = ModelCallScheduler(hedge_after=0.05)
+    llm = scheduled(SlowFirstLlm, scheduler)()
+
+    responses = call(llm)
+
+    assert responses[0].content.parts[0].text == "call 2"
+    assert scheduler.stats["hedged"] == scheduler.stats["hedge_wins"] == 1
+
+
+def test_root_agent_calls_are_scheduled():
+    """Gemini calls of the whole agent tree are retried by the shared scheduler."""
+    runner = InMemoryRunner(root_agent, app_name="test")
+    session = runner.session_service.create_session(app_name="test", user_id="user")
+    retries = model_call_scheduler.stats["retries"]
+
+    async def run() -> list:
+        return [
+            event
+            async for event in runner.run_async(
+                user_id="user",
+                session_id=session.id,
+                new_message=types.UserContent("第三条"),
+            )
+        ]
+
+    quota = FakeQuota(fail_every=3)
+    with use_fake_llm(quota=quota):
+        events = asyncio.run(run())
+
+    assert collect_result(events).diagram is not None
+    assert quota.rejected > 0
+    assert model_call_scheduler.stats["retries"] - retries == quota.rejected
@@ -0,0 +1,138 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests for the memory-bounded session service.
+"""
+
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from app.utils.sessions import BoundedSessionService, SqliteSessionService
+
+APP = "legal_flow"
+USER = "user"
+
+
+def make_event(
+    text: str, author: str = "user", state_delta: dict | None = None
+) -> Event:
+    return Event(
+        author=author,
+        content=types.Content(
+            role="user" if author == "user" else "model",
+            parts=[types.Part.from_text(text=text)],
+        ),
+        actions=EventActions(state_delta=state_delta or {}),
+    )
+
+
+def test_least_recently_used_session_is_evicted():
+    """Beyond max_sessions, the session used longest ago is dropped."""
+    service = BoundedSessionService(max_sessions=2)
+    first = service.create_session(app_name=APP, user_id=USER)
+    second = service.create_session(app_name=APP, user_id=USER)
+    service.get_session(app_name=APP, user_id=USER, session_id=first.id)
+    service.create_session(app_name=APP, user_id=USER)
+
+    assert service.get_session(app_name=APP, user_id=USER, session_id=first.id)
+    assert service.get_session(app_name=APP, user_id=USER, session_id=second.id) is None
+    assert service.session_count == 2
+    assert service.stats["evicted_lru"] == 1
+
+
+def test_idle_sessions_expire():
+    """Sessions unused for idle_ttl seconds are evicted."""
+    service = BoundedSessionService(idle_ttl=0)
+    session = service.create_session(app_name=APP, user_id=USER)
+
+    assert (
+        service.get_session(app_name=APP, user_id=USER, session_id=session.id) is None
+    )
+    assert service.session_count == 0
+    assert service.stats["evicted_idle"] == 1
+
+
+def test_events_are_capped_per_session():
+    """Only the most recent events of a session are kept."""
+    service = BoundedSessionService(max_events_per_session=3)
+    session = service.create_session(app_name=APP, user_id=USER)
+    for i in range(5):
+        service.append_event(session, make_event(f"第{i}条"))
+
+    stored = service.get_session(app_name=APP, user_id=USER, session_id=session.id)
+    assert [event.content.parts[0].text for event in stored.events] == [
+        "第2条",
+        "第3条",
+        "第4条",
+    ]
+    assert service.stats["events_trimmed"] == 2
+    assert service.resident_bytes() > 0
+
+
+def test_deleted_sessions_are_forgotten():
+    """Deleting a session releases its slot."""
+    service = BoundedSessionService(max_sessions=1)
+    session = service.create_session(app_name=APP, user_id=USER)
+    service.delete_session(app_name=APP, user_id=USER, session_id=session.id)
+    service.create_session(app_name=APP, user_id=USER)
+
+    assert service.session_count == 1
+    assert service.stats["evicted_lru"] == 0
+
+
+def test_sqlite_sessions_survive_restart(tmp_path):
+    """Sessions and their events are read back by a new service instance."""
+    path = str(tmp_path / "sessions.db")
+    service = SqliteSessionService(path)
+    session = service.create_session(app_name=APP, user_id=USER, state={"k": 1})
+    service.append_event(session, make_event("第一条"))
+    service.append_event(
+        session,
+        make_event(
+            "平易な文章", author="simplification_agent", state_delta={"user:lang": "ja"}
+        ),
+    )
+    service.close()
+
+    reopened = SqliteSessionService(path)
+    stored = reopened.get_session(app_name=APP, user_id=USER, session_id=session.id)
+    assert [event.content.parts[0].text for event in stored.events] == [
+        "第一条",
+        "平易な文章",
+    ]
+    assert stored.state == {"k": 1, "user:lang": "ja"}
+    assert [
+        s.id for s in reopened.list_sessions(app_name=APP, user_id=USER).sessions
+    ] == [session.id]
+    reopened.close()
+
+
+def test_sqlite_appends_are_batched_per_response(tmp_path):
+    """Events are written together when the agent gives its final response."""
+    service = SqliteSessionService(str(tmp_path / "sessions.db"))
+    session = service.create_session(app_name=APP, user_id=USER)
+    transactions = service.stats["transactions"]
+    service.append_event(session, make_event("第一条"))
+    service.append_event(
+        session, make_event("平易な文章", author="simplification_agent")
+    )
+
+    assert service.stats["transactions"] == transactions + 1
+    assert service.stats["events_written"] == 2
+    service.delete_session(app_name=APP, user_id=USER, session_id=session.id)
+    assert (
+        service.get_session(app_name=APP, user_id=USER, session_id=session.id) is None
+    )
+    service.close()
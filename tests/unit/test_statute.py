@@ -0,0 +1,78 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# ruff: noqa: RUF001
+
+"""
+Unit tests for the streaming statute splitter.
+"""
+
+import pytest
+
+from app.utils.statute import iter_articles, parse_number
+
+LAW = """第一章　総則
+（目的）
+第一条　この法律は、電子署名に関し、必要な事項を定めることを目的とする。
+第二条　この法律において「電子署名」とは、次の各号に掲げる措置をいう。
+一　当該措置を行った者の作成に係るものであることを示すためのもの
+二　改変が行われていないかどうかを確認することができるもの
+２　この法律において「認証業務」とは、電子署名について証明する業務をいう。
+第三条の二　認定の更新を受けなければならない。
+附　則
+この法律は、平成十三年四月一日から施行する。
+"""
+
+
+@pytest.mark.parametrize(
+    "numeral,expected",
+    [("三", 3), ("十", 10), ("三十五", 35), ("百二", 102), ("２", 2), ("12", 12)],
+)
+def test_parse_number(numeral, expected):
+    """Kanji and full-width numerals are converted to integers."""
+    assert parse_number(numeral) == expected
+
+
+def test_iter_articles_structure():
+    """Articles, captions, paragraphs, items and 附則 are recognized."""
+    articles = list(iter_articles(LAW))
+
+    assert [a.number for a in articles] == ["第一条", "第二条", "第三条の二", "附則"]
+    assert articles[0].caption == "（目的）"
+    assert articles[0].text.startswith("（目的）\n第一条")
+    assert [p.number for p in articles[1].paragraphs] == [1, 2]
+    assert [i.number for i in articles[1].paragraphs[0].items] == ["一", "二"]
+    assert articles[3].supplementary
+    assert "施行する" in articles[3].text
+
+
+def test_iter_articles_is_lazy():
+    """The first article is yielded before later lines are consumed."""
+    consumed = []
+
+    def lines():
+        for line in LAW.splitlines():
+            consumed.append(line)
+            yield line
+
+    first = next(iter_articles(lines()))
+    assert first.number == "第一条"
+    assert len(consumed) < len(LAW.splitlines())
+
+
+def test_iter_articles_plain_sentence():
+    """Text without article headings is yielded as one unnumbered article."""
+    (article,) = iter_articles("申請者は総務大臣に申請する。")
+    assert article.number is None
+    assert article.text == "申請者は総務大臣に申請する。"
@@ -0,0 +1,291 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Unit tests for the Cloud Trace / Cloud Logging span exporter, using local fakes
+instead of Google Cloud clients.
+"""
+
+import gzip
+import json
+import time
+
+import pytest
+from google.protobuf import struct_pb2
+from google.protobuf.json_format import ParseDict
+from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter
+from opentelemetry.sdk.trace import ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExportResult
+from opentelemetry.trace import SpanContext
+
+from app.utils.tracing import CloudTraceLoggingSpanExporter, json_size, span_to_dict
+
+
+class FakeBatch:
+    def __init__(self, logger):
+        self.logger = logger
+        self.entries = []
+
+    def log_struct(self, info, **kwargs):
+        self.entries.append(info)
+
+    def commit(self):
+        if self.logger.fail:
+            raise RuntimeError("logging unavailable")
+        self.logger.batches.append(self.entries)
+
+
+class FakeLogger:
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def log_struct(self, info, **kwargs):
+        self.batches.append([info])
+
+
+class FakeLoggingClient:
+    def __init__(self):
+        self.fake_logger = FakeLogger()
+
+    def logger(self, name):
+        return self.fake_logger
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.content_encoding = None
+
+    def upload_from_string(self, data, content_type=None):
+        if self.bucket.fail_uploads:
+            raise RuntimeError("upload failed")
+        self.bucket.blobs[self.name] = data
+        self.bucket.encodings[self.name] = self.content_encoding
+
+
+class FakeBucket:
+    def __init__(self):
+        self.blobs = {}
+        self.encodings = {}
+        self.exists_calls = 0
+        self.fail_uploads = False
+
+    def exists(self):
+        self.exists_calls += 1
+        return True
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+
+class FakeStorageClient:
+    def __init__(self):
+        self.fake_bucket = FakeBucket()
+
+    def bucket(self, name):
+        return self.fake_bucket
+
+
+@pytest.fixture(autouse=True)
+def skip_cloud_trace(monkeypatch):
+    """Replace the Cloud Trace upload done by the parent exporter."""
+    monkeypatch.setattr(
+        CloudTraceSpanExporter, "export", lambda self, spans: SpanExportResult.SUCCESS
+    )
+
+
+def make_exporter(**kwargs) -> CloudTraceLoggingSpanExporter:
+    return CloudTraceLoggingSpanExporter(
+        project_id="test-project",
+        client=object(),
+        logging_client=FakeLoggingClient(),
+        storage_client=FakeStorageClient(),
+        **kwargs,
+    )
+
+
+def make_span(index: int, attributes: dict | None = None) -> ReadableSpan:
+    return ReadableSpan(
+        name=f"span-{index}",
+        context=SpanContext(trace_id=1, span_id=index + 1, is_remote=False),
+        attributes=attributes or {"index": index},
+    )
+
+
+def test_export_batches_log_writes():
+    """Spans are written in batches of at most max_batch_size entries."""
+    exporter = make_exporter(max_batch_size=10, flush_interval=60)
+    exporter.export([make_span(i) for i in range(25)])
+    assert exporter.force_flush()
+
+    batches = exporter.logger.batches
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+    assert batches[0][0]["trace"] == "projects/test-project/traces/1"
+    assert exporter.stats["entries_sent"] == 25
+    assert exporter.stats["batches_sent"] == 3
+    assert exporter.stats["entries_dropped"] == 0
+    exporter.shutdown()
+
+
+def test_flush_interval_writes_partial_batch():
+    """A partial batch is written once its oldest entry reaches the interval."""
+    exporter = make_exporter(max_batch_size=100, flush_interval=0.01)
+    exporter.export([make_span(0)])
+    deadline = time.monotonic() + 2
+    while exporter.stats["entries_sent"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert exporter.stats["entries_sent"] == 1
+    exporter.shutdown()
+
+
+def test_shutdown_flushes_pending_entries():
+    """Nothing queued is lost when the exporter shuts down."""
+    exporter = make_exporter(max_batch_size=100, flush_interval=60)
+    exporter.export([make_span(i) for i in range(3)])
+    exporter.shutdown()
+
+    assert exporter.stats["entries_sent"] == 3
+    assert exporter._log_writer.closed
+
+
+def test_failed_commit_counts_drops():
+    """Entries of a batch that cannot be written are counted as dropped."""
+    exporter = make_exporter(max_batch_size=100, flush_interval=60)
+    exporter.logger.fail = True
+    exporter.export([make_span(i) for i in range(4)])
+    exporter.force_flush()
+
+    assert exporter.stats["entries_dropped"] == 4
+    assert exporter.stats["entries_sent"] == 0
+    exporter.shutdown()
+
+
+def test_large_values_are_offloaded_and_deduplicated():
+    """Only oversized values go to GCS, and identical payloads upload once."""
+    exporter = make_exporter()
+    system_prompt = "法令条文を平易な文章に訳す" * 20000
+    blobs = exporter.storage_client.fake_bucket.blobs
+
+    first = exporter._process_large_attributes(
+        {"attributes": {"llm_request": system_prompt, "agent": "root"}}, "1"
+    )["attributes"]
+    second = exporter._process_large_attributes(
+        {"attributes": {"llm_request": system_prompt, "agent": "sub"}}, "2"
+    )["attributes"]
+
+    assert first["agent"] == "root"
+    assert first["llm_request"].startswith("gs://")
+    assert first["llm_request"] == second["llm_request"]
+    assert first["uri_payload"] == {"llm_request": first["llm_request"]}
+    assert exporter.force_flush()
+    assert len(blobs) == 1
+    assert exporter.stats["payloads_uploaded"] == 1
+    assert exporter.stats["payloads_deduplicated"] == 1
+    exporter.shutdown()
+
+
+def test_small_attributes_stay_inline():
+    """Spans under the logging limit are left untouched."""
+    exporter = make_exporter()
+    span_dict = {"attributes": {"agent": "root"}}
+
+    assert exporter._process_large_attributes(span_dict, "1") == span_dict
+    assert exporter.storage_client.fake_bucket.blobs == {}
+    exporter.shutdown()
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "plain ascii",
+        'quote " and \\ backslash\n',
+        "第三条　認証業務",
+        "😀 astral",
+        {"a": [1, 2.5, None, True, False], "b": {}, "c": []},
+        {"nested": {"x": ("t", "u")}},
+    ],
+)
+def test_json_size_matches_json_dumps(value):
+    """The size estimate is exact for JSON-compatible attribute values."""
+    assert json_size(value) == len(json.dumps(value).encode())
+
+
+def test_span_to_dict_matches_to_json():
+    """The direct conversion produces what the JSON round trip produced."""
+    span = make_span(3, {"llm_request": "法令", "tokens": 12, "tags": ("a", "b")})
+    span_dict = span_to_dict(span)
+
+    assert span_dict == json.loads(span.to_json())
+    # Cloud Logging's gRPC path rejects tuples inside log payloads.
+    assert span_dict["attributes"]["tags"] == ["a", "b"]
+    ParseDict(span_dict, struct_pb2.Struct())
+
+
+def test_uploads_are_gzipped_and_measured():
+    """Payloads are stored gzip-encoded and compression savings are counted."""
+    exporter = make_exporter()
+    content = json.dumps("第三条" * 50000)
+    gcs_uri = exporter.store_in_gcs(content)
+    assert exporter.force_flush()
+
+    bucket = exporter.storage_client.fake_bucket
+    blob_name = gcs_uri.split("/", 3)[3]
+    assert gzip.decompress(bucket.blobs[blob_name]).decode() == content
+    assert bucket.encodings[blob_name] == "gzip"
+    assert exporter.stats["bytes_saved_by_compression"] > 0
+    assert exporter.stats["upload_seconds_total"] > 0
+    exporter.shutdown()
+
+
+def test_bucket_existence_is_cached():
+    """The bucket is checked once per TTL, not once per upload."""
+    exporter = make_exporter(bucket_check_ttl=60)
+    for i in range(5):
+        exporter.store_in_gcs(f"payload {i}")
+    exporter.shutdown()
+
+    assert exporter.storage_client.fake_bucket.exists_calls == 1
+    assert exporter.stats["payloads_uploaded"] == 5
+
+
+def test_failed_upload_is_retried_later():
+    """A failed upload forgets its digest so the next identical payload retries."""
+    exporter = make_exporter()
+    bucket = exporter.storage_client.fake_bucket
+    bucket.fail_uploads = True
+    exporter.store_in_gcs("payload")
+    exporter.force_flush()
+    bucket.fail_uploads = False
+    exporter.store_in_gcs("payload")
+    exporter.shutdown()
+
+    assert exporter.stats["uploads_failed"] == 1
+    assert exporter.stats["payloads_uploaded"] == 1
+    assert len(bucket.blobs) == 1
+
+
+def test_clients_are_created_on_first_use():
+    """Constructing the exporter creates no Google Cloud clients."""
+    exporter = CloudTraceLoggingSpanExporter(project_id="test-project")
+
+    assert not {"logging_client", "logger", "storage_client", "bucket"} & set(
+        vars(exporter)
+    )
+    exporter.shutdown()
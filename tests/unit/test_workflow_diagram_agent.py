@@ -17,12 +17,14 @@ Unit tests for the workflow diagram agent.
 """
 
 import pytest
+
 from app.sub_agents.workflow_diagram.agent import (
-    workflow_diagram_agent, 
-    generate_mermaid_image_url, 
-    generate_diagram_with_image
+    generate_diagram_with_image,
+    generate_mermaid_image_url,
+    workflow_diagram_agent,
 )
 from app.sub_agents.workflow_diagram.prompt import WORKFLOW_DIAGRAM_AGENT_PROMPT
+from app.utils.mermaid import DIAGRAM_STATS
 
 
 def test_workflow_diagram_agent_configuration():
@@ -73,14 +75,32 @@ def test_generate_mermaid_image_url():
 def test_generate_diagram_with_image():
     """Test that diagram with image generation returns correct structure."""
     mermaid_code = "graph TD\n    A[申請] --> B[承認]"
-    result = generate_diagram_with_image(mermaid_code)
+    result = generate_diagram_with_image(mermaid_code, ["申請者"])
     
-    assert isinstance(result, str)  # 現在の実装では文字列を返す
-    assert result.startswith("https://mermaid.live/edit#")
+    assert result["status"] == "success"
+    assert result["image_url"].startswith("https://mermaid.live/edit#")
+    assert result["mermaid_code"] == mermaid_code
+    assert [step["label"] for step in result["steps"]] == ["申請", "承認"]
 
 
 def test_workflow_diagram_agent_has_tools():
     """Test that workflow diagram agent has the image generation tool."""
     assert len(workflow_diagram_agent.tools) > 0
     tool_names = [tool.__name__ for tool in workflow_diagram_agent.tools]
-    assert "generate_diagram_with_image" in tool_names
\ No newline at end of file
+    assert "generate_diagram_with_image" in tool_names
+
+
+def test_generate_diagram_with_image_repairs_or_reprompts():
+    """Fixable diagrams are repaired locally; others ask the model to retry."""
+    before = dict(DIAGRAM_STATS)
+
+    repaired = generate_diagram_with_image(
+        "graph TD\n    A[申請(様式1)] -> B[承認]", []
+    )
+    error = generate_diagram_with_image("sequenceDiagram\n    A->>B: 申請", [])
+
+    assert repaired["status"] == "success"
+    assert '"申請(様式1)"' in repaired["mermaid_code"]
+    assert error["status"] == "error"
+    assert DIAGRAM_STATS["repaired"] == before["repaired"] + 1
+    assert DIAGRAM_STATS["reprompted"] == before["reprompted"] + 1